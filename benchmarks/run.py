@@ -0,0 +1,368 @@
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from operator import methodcaller
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import click
+import pandas as pd
+from loguru import logger
+
+from benchmarks.synthetic import generate_export
+from src.core.analysis import WhatsAppGroupAnalysis
+from src.core.engine import ENGINES, make_analysis
+from src.core.profiling import count_rows
+from src.core.utils import chat_to_df, cleanup, parse_chat
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+# Export formats the synthetic exports are written in; their timestamp and system-line formats differ
+PLATFORMS = ("ios", "android")
+ANALYSIS_METHODS = (
+    "get_current_users",
+    "get_message_count_in_window",
+    "get_users_with_zero_messages",
+    "get_users_with_joining_date",
+    "get_inactive_users",
+    "score_members",
+)
+
+
+def measure(
+    stage: str,
+    size: int,
+    func: Callable[..., Any],
+    repeat: int = 1,
+    setup: Optional[Callable[[], Any]] = None,
+) -> Dict[str, Any]:
+    """Time a benchmark stage.
+
+    Args:
+        stage: Name of the stage
+        size: Number of messages in the synthetic export
+        func: Callable running the stage; with setup, it is passed the result of setup
+        repeat: Number of runs; the fastest is reported, defaults to 1
+        setup: Optional callable run before every run, untimed, e.g. to build a fresh analysis so
+            that no run is served from the caches of an earlier one
+
+    Returns:
+        Benchmark record with the best time, or the error if the stage failed
+    """
+    record: Dict[str, Any] = {"stage": stage, "size": size}
+    timings = []
+    try:
+        for _ in range(repeat):
+            args = () if setup is None else (setup(),)
+            start = time.perf_counter()
+            result = func(*args)
+            timings.append(time.perf_counter() - start)
+    except Exception as e:  # A failing stage is recorded rather than aborting the whole suite
+        logger.error(f"{stage} failed at {size} messages: {e!r}")
+        record["error"] = repr(e)
+        return record
+    record["seconds"] = min(timings)
+    record["rows"] = count_rows(result)
+    logger.info(f"{stage} at {size} messages: {record['seconds']:.3f}s")
+    return record
+
+
+def load_activity_stats() -> Optional[type]:
+    """Import ActivityStats from the standalone community stats script.
+
+    Returns:
+        The ActivityStats class, or None if the script's dependencies are not installed
+    """
+    sys.path.insert(0, str(ROOT / "whatsapp-moderation"))
+    try:
+        from private_community_stats import ActivityStats
+    except ImportError as e:
+        logger.warning(f"Skipping ActivityStats benchmark: {e}")
+        return None
+    return ActivityStats
+
+
+def bench_web(size: int, export_path: Path) -> Dict[str, Any]:
+    """Benchmark the /analyze endpoint end to end.
+
+    Args:
+        size: Number of messages in the synthetic export
+        export_path: Path of the synthetic export to upload
+
+    Returns:
+        Benchmark record
+    """
+    try:
+        from starlette.testclient import TestClient
+
+        from src.web.main import app
+    except Exception as e:  # The web stack is optional for CLI-only installs
+        logger.warning(f"Skipping /analyze benchmark: {e!r}")
+        return {"stage": "web_analyze", "size": size, "error": repr(e)}
+
+    client = TestClient(app)
+    content = export_path.read_bytes()
+
+    def post() -> None:
+        response = client.post(
+            "/analyze",
+            files={"file": (export_path.name, content, "text/plain")},
+            data={"window_days": "60"},
+        )
+        response.raise_for_status()
+
+    return measure("web_analyze", size, post)
+
+
+def bench_startup(repeat: int) -> Dict[str, Any]:
+    """Benchmark a cold import of the web app in a fresh interpreter.
+
+    Args:
+        repeat: Number of runs; the fastest is reported
+
+    Returns:
+        Benchmark record, with size 0 since startup does not depend on the export
+    """
+    command = [sys.executable, "-c", "import src.web.main"]
+    return measure("web_startup", 0, lambda: subprocess.run(command, cwd=ROOT, check=True), repeat)
+
+
+def same_result(expected: Any, actual: Any) -> bool:
+    """Check that an engine returned the same result as the pandas engine.
+
+    Args:
+        expected: Result of the pandas engine
+        actual: Result of another engine
+
+    Returns:
+        True if the results are equal, frames compared column by column
+    """
+    if isinstance(expected, tuple):
+        return len(expected) == len(actual) and all(map(same_result, expected, actual))
+    if isinstance(expected, pd.DataFrame):
+        try:
+            pd.testing.assert_frame_equal(expected, actual)
+        except AssertionError:
+            return False
+        return True
+    return expected == actual
+
+
+def run_size(
+    size: int,
+    data_dir: Path,
+    repeat: int,
+    stages: Optional[List[str]],
+    engines: Tuple[str, ...] = ("pandas",),
+    export_platform: str = "ios",
+) -> List[Dict[str, Any]]:
+    """Run every benchmark stage on a synthetic export of the given size.
+
+    Args:
+        size: Number of messages
+        data_dir: Directory for the generated export
+        repeat: Number of runs per stage
+        stages: Optional list of stage names to run, defaults to all
+        engines: Query engines to run the analysis methods on; other engines are recorded as
+            "<method>@<engine>" with whether their result matches the pandas engine
+        export_platform: Format of the generated export, "ios" or "android", defaults to "ios"
+
+    Returns:
+        List of benchmark records, each with the export's 'platform'
+    """
+
+    def wanted(stage: str) -> bool:
+        return stages is None or stage in stages
+
+    logger.info(f"Benchmarking a {export_platform} export of {size} messages")
+    export_path = data_dir / f"synthetic_{export_platform}_{size}.txt"
+    if not export_path.exists():
+        generate_export(export_path, n_messages=size, n_members=max(200, size // 200), platform=export_platform)
+
+    records = []
+    raw = parse_chat(export_path)
+    if wanted("parse_chat"):
+        records.append(measure("parse_chat", size, lambda: parse_chat(export_path), repeat))
+    if wanted("cleanup"):
+        records.append(measure("cleanup", size, lambda: cleanup(raw.copy()), repeat))
+
+    df = chat_to_df(export_path)
+    # Alias resolution and sender encoding happen when the analysis is built
+    if wanted("analysis_init"):
+        records.append(measure("analysis_init", size, WhatsAppGroupAnalysis, repeat, setup=df.copy))
+    for method in ANALYSIS_METHODS:
+        if not wanted(method):
+            continue
+        # Each run gets a fresh analysis: methods cache shared work (e.g. join/leave events) on it
+        records.append(
+            measure(method, size, methodcaller(method), repeat, setup=lambda: WhatsAppGroupAnalysis(df.copy()))
+        )
+        for engine in engines:
+            if engine == "pandas":
+                continue
+            record = measure(
+                f"{method}@{engine}",
+                size,
+                methodcaller(method),
+                repeat,
+                setup=lambda engine=engine: make_analysis(df.copy(), engine=engine),
+            )
+            if "error" not in record:
+                expected = getattr(WhatsAppGroupAnalysis(df.copy()), method)()
+                record["matches_pandas"] = same_result(
+                    expected, getattr(make_analysis(df.copy(), engine=engine), method)()
+                )
+                if not record["matches_pandas"]:
+                    logger.error(f"{method} on {engine} differs from pandas at {size} messages")
+            records.append(record)
+    if wanted("calculate_activity_score"):
+
+        def prepare() -> Tuple[WhatsAppGroupAnalysis, pd.DataFrame]:
+            analysis = WhatsAppGroupAnalysis(df.copy())
+            return analysis, analysis.get_inactive_users()
+
+        records.append(
+            measure(
+                "calculate_activity_score",
+                size,
+                lambda prepared: prepared[0].calculate_activity_score(prepared[1]),
+                repeat,
+                setup=prepare,
+            )
+        )
+
+    if wanted("compute_sender_stats"):
+        activity_stats = load_activity_stats()
+        if activity_stats is not None:
+            messages = df[["Sender", "Datetime", "Message"]].copy()
+            records.append(
+                measure("compute_sender_stats", size, lambda: activity_stats(messages.copy()).compute_sender_stats())
+            )
+    if wanted("web_analyze"):
+        records.append(bench_web(size, export_path))
+    for record in records:
+        record["platform"] = export_platform
+    return records
+
+
+def environment() -> Dict[str, str]:
+    """Describe the environment the benchmarks ran in.
+
+    Returns:
+        Dictionary with versions, platform and git commit
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+    }
+
+
+def record_key(record: Dict[str, Any]) -> Tuple[str, int, Optional[str]]:
+    """Identify a benchmark record across runs.
+
+    Args:
+        record: Benchmark record
+
+    Returns:
+        Tuple of (stage, size, platform); records of runs that predate the platform field were iOS
+    """
+    default = "ios" if record["size"] else None
+    return record["stage"], record["size"], record.get("platform", default)
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: Path, threshold: float) -> int:
+    """Compare results with a previous run and report regressions.
+
+    Args:
+        results: Benchmark records of this run
+        baseline_path: JSON file written by a previous run
+        threshold: Slowdown ratio above which a stage counts as a regression
+
+    Returns:
+        Number of regressed stages
+    """
+    baseline = {
+        record_key(record): record.get("seconds") for record in json.loads(baseline_path.read_text())["results"]
+    }
+    regressions = 0
+    for record in results:
+        before = baseline.get(record_key(record))
+        after = record.get("seconds")
+        if not before or after is None:
+            continue
+        ratio = after / before
+        status = "REGRESSION" if ratio > threshold else "ok"
+        regressions += ratio > threshold
+        label = f"{record['stage']:<32} {record.get('platform') or '-':<8} {record['size']:>9}"
+        print(f"{label} {before:9.3f}s -> {after:9.3f}s  x{ratio:5.2f}  {status}")
+    return regressions
+
+
+@click.command()
+@click.option("--sizes", "-s", multiple=True, type=int, help="Message counts to benchmark (repeatable)")
+@click.option("--stage", "stages", multiple=True, help="Only run these stages (repeatable)")
+@click.option("--repeat", "-r", default=1, help="Runs per stage; the fastest is reported")
+@click.option("--data-dir", type=click.Path(file_okay=False, path_type=Path), help="Where to keep generated exports")
+@click.option("--output", "-o", type=click.Path(dir_okay=False, path_type=Path), default=Path("bench_results.json"))
+@click.option("--compare", "baseline", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--threshold", default=1.2, help="Slowdown ratio reported as a regression")
+@click.option(
+    "--platform",
+    "platforms",
+    multiple=True,
+    type=click.Choice(PLATFORMS),
+    help="Export formats to generate and benchmark (repeatable); defaults to both",
+)
+@click.option(
+    "--engine",
+    "engines",
+    multiple=True,
+    type=click.Choice(ENGINES),
+    help="Also run the analysis methods on these engines and check they match pandas (repeatable)",
+)
+def main(
+    sizes: tuple,
+    stages: tuple,
+    repeat: int,
+    data_dir: Optional[Path],
+    output: Path,
+    baseline: Optional[Path],
+    threshold: float,
+    engines: tuple,
+    platforms: tuple,
+):
+    """Benchmark parsing and analysis on synthetic exports and write the results as JSON."""
+    sizes = sizes or DEFAULT_SIZES
+    with TemporaryDirectory() as tmp:
+        directory = data_dir or Path(tmp)
+        directory.mkdir(parents=True, exist_ok=True)
+        results = []
+        if not stages or "web_startup" in stages:
+            results.append(bench_startup(repeat))
+        for size in sizes:
+            for export_platform in platforms or PLATFORMS:
+                results.extend(run_size(size, directory, repeat, list(stages) or None, engines, export_platform))
+
+    output.write_text(json.dumps({"environment": environment(), "results": results}, indent=2))
+    logger.info(f"Benchmark results written to {output}")
+    regressed = bool(baseline and compare(results, baseline, threshold))
+    # An engine that disagrees with pandas fails the run like a regression
+    if regressed or any(record.get("matches_pandas") is False for record in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Union
+
+import click
+from loguru import logger
+
+WORDS = (
+    "the model is training on gpu with new data and we should try a smaller batch size before the "
+    "deadline anyone used this api for embeddings or retrieval latency looks great but cost is high"
+).split()
+DOMAINS = ["github.com", "arxiv.org", "twitter.com", "huggingface.co", "youtu.be", "medium.com"]
+SYSTEM_MESSAGES = [
+    "This message was deleted",
+    "{name} changed the group description",
+    "{name} changed this group's icon",
+    "{name} reset this group's invite link",
+]
+
+
+def format_timestamp(timestamp: datetime, platform: str) -> str:
+    """Format a message timestamp the way the given platform exports it.
+
+    Args:
+        timestamp: Message time
+        platform: "ios" or "android"
+
+    Returns:
+        Line prefix up to and including the separator before the sender
+    """
+    if platform == "ios":
+        return f"[{timestamp:%Y-%m-%d, %H:%M:%S}] "
+    return f"{timestamp:%d/%m/%Y, %H:%M} - "
+
+
+def random_text(rng: random.Random, url_fraction: float) -> str:
+    """Generate a message body.
+
+    Args:
+        rng: Random number generator
+        url_fraction: Probability that the message contains a URL
+
+    Returns:
+        Message text
+    """
+    text = " ".join(rng.choices(WORDS, k=rng.randint(2, 30)))
+    if rng.random() < url_fraction:
+        text += f" https://{rng.choice(DOMAINS)}/{rng.getrandbits(40):x}?utm_source=share"
+    return text
+
+
+def generate_export(
+    path: Union[str, Path],
+    n_messages: int,
+    n_members: int = 500,
+    platform: str = "ios",
+    churn: float = 0.2,
+    multiline_fraction: float = 0.05,
+    url_fraction: float = 0.1,
+    system_fraction: float = 0.01,
+    start: datetime = datetime(2023, 1, 1),
+    days: int = 365,
+    seed: int = 0,
+) -> Path:
+    """Write a synthetic chat export.
+
+    Members join through invite links or are added by an admin, a fraction of them leave or are
+    removed later, and message activity follows a heavy-tailed distribution across members.
+
+    Args:
+        path: Output file path
+        n_messages: Number of regular messages to generate
+        n_members: Number of members who ever join the group, defaults to 500
+        platform: Export format, "ios" or "android", defaults to "ios"
+        churn: Fraction of members who leave or are removed, defaults to 0.2
+        multiline_fraction: Fraction of messages spanning several lines, defaults to 0.05
+        url_fraction: Fraction of messages containing a URL, defaults to 0.1
+        system_fraction: Fraction of lines that are system messages, defaults to 0.01
+        start: Time of the first event, defaults to 2023-01-01
+        days: Length of the export in days, defaults to 365
+        seed: Random seed, defaults to 0
+
+    Returns:
+        Path of the written export
+    """
+    rng = random.Random(seed)
+    path = Path(path)
+    admin = "Group Admin"
+    # Two thirds of the members are not saved contacts and show up as "~<narrow no-break space>Name"
+    members = [f"~\u202fMember {idx}" if idx % 3 else f"Member {idx}" for idx in range(n_members)]
+    span = timedelta(days=days).total_seconds()
+
+    # Membership events: everyone joins during the first half, churned members leave later
+    events = []
+    for member in members:
+        joined = start + timedelta(seconds=rng.random() * span / 2)
+        if rng.random() < 0.5:
+            events.append((joined, member, f"\u200e{member} joined using this group's invite link"))
+        else:
+            events.append((joined, admin, f"{admin} added {member}"))
+        if rng.random() < churn:
+            left = joined + timedelta(seconds=rng.random() * span / 2)
+            if rng.random() < 0.5:
+                events.append((left, member, f"\u200e{member} left"))
+            else:
+                events.append((left, admin, f"{admin} removed {member}"))
+
+    # Heavy-tailed activity: a few members send most of the messages
+    weights = [1.0 / (rank + 1) ** 1.1 for rank in range(n_members)]
+    senders = rng.choices(members, weights=weights, k=n_messages)
+    times = sorted(start + timedelta(seconds=rng.random() * span) for _ in range(n_messages))
+
+    lines: List[tuple] = list(events)
+    for timestamp, sender in zip(times, senders, strict=True):
+        if rng.random() < system_fraction:
+            lines.append((timestamp, sender, rng.choice(SYSTEM_MESSAGES).format(name=sender)))
+            continue
+        text = random_text(rng, url_fraction)
+        if rng.random() < multiline_fraction:
+            text += "\n" + "\n".join(random_text(rng, url_fraction) for _ in range(rng.randint(1, 4)))
+        lines.append((timestamp, sender, text))
+    lines.sort(key=lambda line: line[0])
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(f"{format_timestamp(start, platform)}{admin}: Messages and calls are end-to-end encrypted.\n")
+        for timestamp, sender, text in lines:
+            file.write(f"{format_timestamp(timestamp, platform)}{sender}: {text}\n")
+    logger.info(f"Wrote {len(lines)} events and messages for {n_members} members to {path}")
+    return path
+
+
+@click.command()
+@click.argument("output", type=click.Path(dir_okay=False, path_type=Path))
+@click.option("--messages", "-n", default=10_000, help="Number of messages")
+@click.option("--members", "-m", default=500, help="Number of members")
+@click.option("--platform", type=click.Choice(["ios", "android"]), default="ios", help="Export format")
+@click.option("--churn", default=0.2, help="Fraction of members who leave or are removed")
+@click.option("--seed", default=0, help="Random seed")
+def main(output: Path, messages: int, members: int, platform: str, churn: float, seed: int):
+    """Generate a synthetic WhatsApp chat export."""
+    generate_export(output, n_messages=messages, n_members=members, platform=platform, churn=churn, seed=seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import re
+import sys
 from datetime import datetime
 from pathlib import Path
 from typing import Tuple, Union
@@ -7,6 +8,9 @@ import pandas as pd
 from loguru import logger
 from tqdm import tqdm
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.core.pii import PIIScrubber  # noqa: E402
+
 
 def extract_dataframe(file_path: Union[str, Path]) -> pd.DataFrame:
     """Extract message data from a WhatsApp chat export file.
@@ -104,12 +108,16 @@ def cleanup(df: pd.DataFrame) -> pd.DataFrame:
         df = df[~df["Message"].str.contains(message)]
 
     # Remove PII
-    df["Message"] = df["Message"].apply(remove_pii)
+    df["Message"], _ = PII_SCRUBBER.scrub(df["Message"])
 
     logger.info(f"Cleaned DataFrame has {len(df)} messages")
     return df
 
 
+# Shared with the app, so the notebooks scrub exactly what the analyzer does
+PII_SCRUBBER = PIIScrubber()
+
+
 def remove_pii(text: str) -> str:
     """Remove personally identifiable information from text.
 
@@ -119,15 +127,7 @@ def remove_pii(text: str) -> str:
     Returns:
         Text with PII removed
     """
-    # Remove phone numbers
-    phone_pattern = re.compile(r"@\+?(\d[\d-]{7,}\d)")
-    no_phones = phone_pattern.sub("[PHONE]", text)
-
-    # Remove email addresses
-    email_pattern = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b")
-    no_emails = email_pattern.sub("[EMAIL]", no_phones)
-
-    return no_emails
+    return PII_SCRUBBER.scrub_text(text)
 
 
 class WhatsAppGroupAnalysis:
@@ -1,38 +1,127 @@
 import sys
+import zipfile
+from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Set, Tuple
 
 import click
 import pandas as pd
 from loguru import logger
 
+from src.core.aliases import AliasIndex
 from src.core.analysis import WhatsAppGroupAnalysis
-from src.core.utils import chat_to_df
+from src.core.engine import ENGINES, make_analysis
+from src.core.importer import import_csvs, load_messages
+from src.core.media import media_stats
+from src.core.member_index import MemberIndex
+from src.core.profiling import PROFILER
+from src.core.reconcile import reconcile
+from src.core.removal import RemovalLog, allowed_keys, export_chunks, read_allow_list, removal_candidates
+from src.core.scoring import DECAY_MODELS, EngagementTracker
+from src.core.search import ORDERS, SearchIndex
+from src.core.senders import SenderDictionary
+from src.core.spam import SpamDetector
+from src.core.store import MessageStore
+from src.core.utils import chat_to_df, find_exports
+from src.core.watch import ExportWatcher, watch_exports
 
 
 @click.group()
-def cli():
+@click.option("--profile", is_flag=True, help="Time each pipeline stage and print a breakdown")
+@click.option(
+    "--profile-output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=Path("profile_trace.json"),
+    show_default=True,
+    help="Chrome trace written when --profile is set",
+)
+@click.option(
+    "--engine",
+    type=click.Choice(ENGINES),
+    default="pandas",
+    show_default=True,
+    help="Query engine for the analysis; duckdb runs scans and aggregations multi-threaded",
+)
+@click.pass_context
+def cli(ctx: click.Context, profile: bool, profile_output: Path, engine: str):
     """WhatsApp group chat analysis tool."""
-    pass
+    ctx.obj = {"engine": engine}
+    if profile:
+        PROFILER.enable()
+        ctx.call_on_close(lambda: report_profile(profile_output))
+
+
+def report_profile(profile_output: Path) -> None:
+    """Print the per-stage breakdown and write the Chrome trace.
+
+    Args:
+        profile_output: Path of the trace file
+    """
+    print(PROFILER.report().to_string(index=False))
+    PROFILER.dump(profile_output)
+    PROFILER.disable()
+
+
+def create_analysis(df: pd.DataFrame, **kwargs) -> WhatsAppGroupAnalysis:
+    """Create the analysis of a group on the engine selected with --engine.
+
+    Args:
+        df: DataFrame with the group's messages
+        **kwargs: Passed on to the analysis (senders, aliases)
+
+    Returns:
+        WhatsAppGroupAnalysis
+    """
+    return make_analysis(df, engine=click.get_current_context().obj["engine"], **kwargs)
+
+
+def load_aliases(alias_dir: Optional[Path], input_path: Path, df: pd.DataFrame) -> AliasIndex:
+    """Load the persisted alias index for a group and extend it, or build one in memory.
+
+    Args:
+        alias_dir: Optional directory holding one alias index per group
+        input_path: Path of the group's chat export, whose stem names the index
+        df: DataFrame with the group's messages
+
+    Returns:
+        AliasIndex for the group
+    """
+    alias_path = alias_dir / f"{input_path.stem}.aliases.json" if alias_dir else None
+    return AliasIndex.load_or_build(alias_path, df)
 
 
 @cli.command()
 @click.argument("input_path", type=click.Path(exists=True, path_type=Path))
 @click.option("--output", "-o", type=click.Path(path_type=Path), help="Output file path")
-@click.option("--window-days", "-w", default=60, help="Window in days to consider for inactivity")
+@click.option(
+    "--window-days",
+    "-w",
+    multiple=True,
+    default=[60],
+    help="Window in days to consider for inactivity; repeat (-w 30 -w 90) for one column per window",
+)
 @click.option(
     "--exclude-contacts/--include-contacts",
     default=False,
     help="Exclude contacts (users with ~)",
 )
-def analyze_single(input_path: Path, output: Optional[Path], window_days: int, exclude_contacts: bool):
-    """Analyze a single WhatsApp chat export."""
+@click.option(
+    "--alias-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory where per-group alias indexes are persisted and reused",
+)
+def analyze_single(
+    input_path: Path,
+    output: Optional[Path],
+    window_days: Tuple[int, ...],
+    exclude_contacts: bool,
+    alias_dir: Optional[Path],
+):
+    """Analyze a single WhatsApp chat export (text, or zip with media)."""
     logger.info(f"Analyzing single chat: {input_path}")
     df = chat_to_df(input_path)
-    analysis = WhatsAppGroupAnalysis(df)
-    inactive_users = analysis.get_inactive_users(exclude_contacts=exclude_contacts)
-    message_counts = analysis.get_message_count_in_window(window_days=window_days)
-    result = pd.merge(inactive_users, message_counts, on="User", how="left")
+    analysis = create_analysis(df, aliases=load_aliases(alias_dir, input_path, df))
+    result = analysis.get_inactive_users(exclude_contacts=exclude_contacts, windows=window_days)
     if output:
         result.to_csv(output, sep="|", index=False)
         logger.info(f"Results saved to {output}")
@@ -46,24 +135,56 @@ def analyze_single(input_path: Path, output: Optional[Path], window_days: int, e
     type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
 )
 @click.option("--output", "-o", type=click.Path(path_type=Path), help="Output file path")
-@click.option("--window-days", "-w", default=60, help="Window in days to consider for inactivity")
+@click.option(
+    "--window-days",
+    "-w",
+    multiple=True,
+    default=[60],
+    help="Window in days to consider for inactivity; repeat (-w 30 -w 90) for one column per window",
+)
 @click.option(
     "--exclude-contacts/--include-contacts",
     default=False,
     help="Exclude contacts (users with ~)",
 )
-def analyze_multiple(input_dir: Path, output: Optional[Path], window_days: int, exclude_contacts: bool):
-    """Analyze multiple WhatsApp chat exports in a directory."""
+@click.option(
+    "--alias-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory where per-group alias indexes are persisted and reused",
+)
+@click.option(
+    "--member-index",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Cross-group member index to update with each analyzed group",
+)
+def analyze_multiple(
+    input_dir: Path,
+    output: Optional[Path],
+    window_days: Tuple[int, ...],
+    exclude_contacts: bool,
+    alias_dir: Optional[Path],
+    member_index: Optional[Path],
+):
+    """Analyze multiple WhatsApp chat exports (text or zip) in a directory."""
     logger.info(f"Analyzing multiple chats in directory: {input_dir}")
+    index = MemberIndex.load(member_index) if member_index else None
     all_results = []
-    for file_path in input_dir.glob("*.txt"):
+    # One dictionary across groups so the same person has the same id everywhere
+    senders = SenderDictionary()
+    for file_path in find_exports(input_dir):
         logger.info(f"Processing {file_path}")
-        df = chat_to_df(file_path, group_name=file_path.stem)
-        analysis = WhatsAppGroupAnalysis(df)
-        inactive_users = analysis.get_inactive_users(exclude_contacts=exclude_contacts)
-        message_counts = analysis.get_message_count_in_window(window_days=window_days)
-        result = pd.merge(inactive_users, message_counts, on="User", how="left")
+        df = chat_to_df(file_path, group_name=file_path.stem, senders=senders)
+        analysis = create_analysis(df, senders=senders, aliases=load_aliases(alias_dir, file_path, df))
+        result = analysis.get_inactive_users(exclude_contacts=exclude_contacts, windows=window_days)
+        result.insert(0, "Group", file_path.stem)
         all_results.append(result)
+        if index is not None:
+            index.ingest(file_path.stem, analysis)
+    if index is not None:
+        index.save(member_index)
+    # Widen every frame to the final set of senders so the concatenated 'User' stays categorical
+    for result in all_results:
+        result["User"] = senders.recategorize(result["User"])
     combined_results = pd.concat(all_results, ignore_index=True)
     if output:
         combined_results.to_csv(output, sep="|", index=False)
@@ -81,6 +202,11 @@ def analyze_multiple(input_dir: Path, output: Optional[Path], window_days: int,
     default=False,
     help="Exclude contacts (users with ~)",
 )
+@click.option(
+    "--alias-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory where per-group alias indexes are persisted and reused",
+)
 @click.option("--decay-days", "-d", default=90, help="Number of days for score to decay to zero")
 @click.option(
     "--reference-messages",
@@ -88,24 +214,49 @@ def analyze_multiple(input_dir: Path, output: Optional[Path], window_days: int,
     default=5,
     help="Number of messages that would give a score of 1.0",
 )
+@click.option(
+    "--model",
+    type=click.Choice(DECAY_MODELS),
+    default="exponential",
+    show_default=True,
+    help="Decay model: from the last message (exponential, half-life) or per message (windowed)",
+)
+@click.option("--all-members", is_flag=True, help="Score every current member, not just inactive ones")
+@click.option("--top-k", type=int, help="Only show the K most active members (implies --all-members)")
+@click.option("--bottom-k", type=int, help="Only show the K least active members (implies --all-members)")
 def score_inactive(
     input_path: Path,
     output: Optional[Path],
     window_days: int,
     exclude_contacts: bool,
+    alias_dir: Optional[Path],
     decay_days: int,
     reference_messages: int,
+    model: str,
+    all_members: bool,
+    top_k: Optional[int],
+    bottom_k: Optional[int],
 ):
     """Calculate activity scores for inactive users."""
     logger.info(f"Calculating activity scores for {input_path}")
     df = chat_to_df(input_path)
-    analysis = WhatsAppGroupAnalysis(df)
-    inactive_users = analysis.get_inactive_users(exclude_contacts=exclude_contacts)
-    scored_users = analysis.calculate_activity_score(
-        inactive_users,
-        decay_days=decay_days,
-        reference_messages=reference_messages,
-    )
+    analysis = create_analysis(df, aliases=load_aliases(alias_dir, input_path, df))
+    if all_members or top_k is not None or bottom_k is not None:
+        scored_users = analysis.score_members(
+            model=model,
+            decay_days=decay_days,
+            reference_messages=reference_messages,
+            top_k=top_k if top_k is not None else bottom_k,
+            largest=top_k is not None,
+        )
+    else:
+        inactive_users = analysis.get_inactive_users(exclude_contacts=exclude_contacts)
+        scored_users = analysis.calculate_activity_score(
+            inactive_users,
+            decay_days=decay_days,
+            reference_messages=reference_messages,
+            model=model,
+        )
     if output:
         scored_users.to_csv(output, sep="|", index=False)
         logger.info(f"Results saved to {output}")
@@ -113,5 +264,696 @@ def score_inactive(
         print(scored_users.to_string())
 
 
+@cli.command()
+@click.argument("input_path", type=click.Path(exists=True, path_type=Path))
+@click.option(
+    "--state",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Engagement state of the group; only messages newer than it are ingested, then it is updated",
+)
+@click.option("--output", "-o", type=click.Path(path_type=Path), help="Output file path")
+@click.option("--decay-days", "-d", default=30, help="Decay constant (or half-life) of a message's contribution")
+@click.option("--model", type=click.Choice(["exponential", "half-life"]), default="exponential", show_default=True)
+@click.option(
+    "--alias-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory where per-group alias indexes are persisted and reused",
+)
+@click.option("--top-k", type=int, help="Only show the K most engaged members")
+@click.option("--bottom-k", type=int, help="Only show the K least engaged members")
+def engagement(
+    input_path: Path,
+    state: Optional[Path],
+    output: Optional[Path],
+    decay_days: int,
+    model: str,
+    alias_dir: Optional[Path],
+    top_k: Optional[int],
+    bottom_k: Optional[int],
+):
+    """Score members by the time-decayed sum of all their messages."""
+    logger.info(f"Calculating engagement for {input_path}")
+    df = chat_to_df(input_path)
+    analysis = create_analysis(df, aliases=load_aliases(alias_dir, input_path, df))
+    if state and state.exists():
+        tracker = EngagementTracker.load(state)
+    else:
+        tracker = EngagementTracker(decay_days=decay_days, model=model)
+    scored_members = analysis.score_engagement(
+        tracker, top_k=top_k if top_k is not None else bottom_k, largest=top_k is not None
+    )
+    if state:
+        tracker.save(state)
+    if output:
+        scored_members.to_csv(output, sep="|", index=False)
+        logger.info(f"Results saved to {output}")
+    else:
+        print(scored_members.to_string())
+
+
+@cli.command()
+@click.argument("input_path", type=click.Path(exists=True, path_type=Path))
+@click.option("--as-of", help="List the members on this date (e.g. 2024-03-01)")
+@click.option("--daily", is_flag=True, help="Output the number of members at the end of each day")
+@click.option("--output", "-o", type=click.Path(path_type=Path), help="Output file path")
+@click.option(
+    "--alias-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory where per-group alias indexes are persisted and reused",
+)
+def membership(input_path: Path, as_of: Optional[str], daily: bool, output: Optional[Path], alias_dir: Optional[Path]):
+    """Show who was a member on a date, or the membership size over time."""
+    if bool(as_of) == daily:
+        raise click.UsageError("Pass exactly one of --as-of and --daily")
+    df = chat_to_df(input_path)
+    analysis = create_analysis(df, aliases=load_aliases(alias_dir, input_path, df))
+    result = analysis.get_members_as_of(as_of) if as_of else analysis.get_daily_member_counts()
+    if output:
+        result.to_csv(output, sep="|", index=False)
+        logger.info(f"Results saved to {output}")
+    else:
+        print(result.to_string())
+
+
+@cli.command()
+@click.argument("input_path", type=click.Path(exists=True, path_type=Path))
+@click.option("--gap-minutes", default=5, show_default=True, help="Longest pause between a message and its reply")
+@click.option("--output", "-o", type=click.Path(path_type=Path), help="Output file path for the member metrics")
+@click.option("--edges", type=click.Path(dir_okay=False, path_type=Path), help="Also save the interacting pairs here")
+@click.option(
+    "--alias-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory where per-group alias indexes are persisted and reused",
+)
+def interactions(
+    input_path: Path, gap_minutes: int, output: Optional[Path], edges: Optional[Path], alias_dir: Optional[Path]
+):
+    """Show who talks to whom: centrality and communities of the interaction graph (needs the graph extra)."""
+    df = chat_to_df(input_path)
+    analysis = create_analysis(df, aliases=load_aliases(alias_dir, input_path, df))
+    result = analysis.get_interaction_metrics(gap_minutes=gap_minutes)
+    if edges:
+        analysis.get_interactions(gap_minutes=gap_minutes).to_csv(edges, sep="|", index=False)
+        logger.info(f"Interacting pairs saved to {edges}")
+    if output:
+        result.to_csv(output, sep="|", index=False)
+        logger.info(f"Results saved to {output}")
+    else:
+        print(result.to_string())
+
+
+@cli.command("media-stats")
+@click.argument("input_path", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--freq", type=click.Choice(["W", "M"]), default="M", show_default=True, help="Week or month periods")
+@click.option("--output", "-o", type=click.Path(path_type=Path), help="Output file path")
+def media_stats_report(input_path: Path, freq: str, output: Optional[Path]):
+    """Count attachments per sender and period by media type.
+
+    For a zipped export the report also sums the attachment sizes, read from the archive's index
+    without opening the media.
+    """
+    df = chat_to_df(input_path)
+    result = media_stats(df, freq=freq, archive=input_path if zipfile.is_zipfile(input_path) else None)
+    if output:
+        result.to_csv(output, sep="|", index=False)
+        logger.info(f"Results saved to {output}")
+    else:
+        print(result.to_string())
+
+
+def load_detector(state: Optional[Path], **settings) -> SpamDetector:
+    """Resume a spam detector from its state file, or start one with the given settings."""
+    if state and state.exists():
+        return SpamDetector.load(state)
+    return SpamDetector(**settings)
+
+
+def append_flags(flags: pd.DataFrame, output: Path) -> None:
+    """Append spam flags to a CSV file, writing the header when the file is new."""
+    if flags.empty:
+        return
+    flags.to_csv(output, sep="|", index=False, mode="a", header=not output.exists())
+    logger.info(f"{len(flags)} flags appended to {output}")
+
+
+@cli.command("detect-spam")
+@click.argument("input_paths", nargs=-1, required=True, type=click.Path(exists=True, path_type=Path))
+@click.option("--window-seconds", default=60, show_default=True, help="Length of the flood window")
+@click.option("--flood-limit", default=10, show_default=True, help="Messages within the window that make a flood")
+@click.option("--repeat-limit", default=3, show_default=True, help="Near-duplicate posts that make a repeat")
+@click.option(
+    "--similarity",
+    default=0.7,
+    show_default=True,
+    help="Smallest estimated word overlap (Jaccard) of near-duplicate messages",
+)
+@click.option(
+    "--state",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Detector state to resume from and save to; messages already checked are skipped",
+)
+@click.option("--output", "-o", type=click.Path(dir_okay=False, path_type=Path), help="Output file path")
+def detect_spam(
+    input_paths: Tuple[Path, ...],
+    window_seconds: int,
+    flood_limit: int,
+    repeat_limit: int,
+    similarity: float,
+    state: Optional[Path],
+    output: Optional[Path],
+):
+    """Flag floods, repeated messages and messages cross-posted between groups.
+
+    INPUT_PATHS are chat exports or directories of exports; each export is a group named by its
+    file name. Messages of all groups are checked together, in time order.
+    """
+    exports = [export for path in input_paths for export in (find_exports(path) if path.is_dir() else [path])]
+    df = pd.concat([chat_to_df(export).assign(Group=export.stem) for export in exports], ignore_index=True)
+    detector = load_detector(
+        state,
+        window_seconds=window_seconds,
+        flood_limit=flood_limit,
+        repeat_limit=repeat_limit,
+        similarity=similarity,
+    )
+    flags = detector.process(df)
+    if state:
+        detector.save(state)
+    if output:
+        flags.to_csv(output, sep="|", index=False)
+        logger.info(f"Results saved to {output}")
+    else:
+        print(flags.to_string())
+
+
+@cli.command("removal-candidates")
+@click.argument("input_paths", nargs=-1, required=True, type=click.Path(exists=True, path_type=Path))
+@click.option(
+    "--log",
+    "log_path",
+    required=True,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Removal log to resume from and append to",
+)
+@click.option(
+    "--output-dir",
+    "-o",
+    required=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory of the ranked candidate chunks",
+)
+@click.option("--window-days", "-w", default=60, help="Window in days to consider for inactivity")
+@click.option(
+    "--exclude-contacts/--include-contacts",
+    default=False,
+    help="Exclude contacts (users with ~)",
+)
+@click.option(
+    "--allow-list",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Members never to remove: one name or phone number per line",
+)
+@click.option("--grace-days", default=0, show_default=True, help="Days between flagging a member and removal")
+@click.option("--chunk-size", default=100, show_default=True, help="Candidates per exported chunk")
+@click.option(
+    "--alias-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory where per-group alias indexes are persisted and reused",
+)
+def removal_candidates_report(
+    input_paths: Tuple[Path, ...],
+    log_path: Path,
+    output_dir: Path,
+    window_days: int,
+    exclude_contacts: bool,
+    allow_list: Optional[Path],
+    grace_days: int,
+    chunk_size: int,
+    alias_dir: Optional[Path],
+):
+    """Rank inactive members of chat exports (files or directories) for removal, in chunks.
+
+    Candidates get stable ids and are flagged in the append-only log; members already removed or
+    kept (see removal-mark) and allow-listed members are skipped, so the command can be re-run
+    after every round of removals.
+    """
+    log = RemovalLog(log_path)
+    identifiers = read_allow_list(allow_list) if allow_list else []
+    allowed = set()
+    reports = []
+    senders = SenderDictionary()
+    for input_path in input_paths:
+        for file_path in find_exports(input_path) if input_path.is_dir() else [input_path]:
+            logger.info(f"Processing {file_path}")
+            df = chat_to_df(file_path, senders=senders)
+            analysis = create_analysis(df, senders=senders, aliases=load_aliases(alias_dir, file_path, df))
+            allowed |= allowed_keys(identifiers, analysis.aliases)
+            report = analysis.get_inactive_users(exclude_contacts=exclude_contacts, windows=[window_days])
+            reports.append(report.assign(Group=file_path.stem, User=report["User"].astype(str)))
+    candidates = removal_candidates(pd.concat(reports, ignore_index=True), log, allowed, grace_days)
+    export_chunks(candidates, output_dir, chunk_size)
+
+
+@cli.command("removal-mark")
+@click.argument("ids", nargs=-1)
+@click.option(
+    "--log",
+    "log_path",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Removal log to append to",
+)
+@click.option(
+    "--status", type=click.Choice(["removed", "kept"]), default="removed", show_default=True, help="Action taken"
+)
+@click.option(
+    "--chunk",
+    "chunks",
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Exported chunk whose candidates were all actioned, repeatable",
+)
+def removal_mark(ids: Tuple[str, ...], log_path: Path, status: str, chunks: Tuple[Path, ...]):
+    """Record that candidates (by id, or whole exported chunks) were removed or kept."""
+    ids = list(ids) + [
+        identifier for chunk in chunks for identifier in pd.read_csv(chunk, sep="|", dtype=str)["Candidate_Id"]
+    ]
+    if not ids:
+        raise click.UsageError("Pass candidate ids or --chunk files")
+    RemovalLog(log_path).mark(ids, status)
+
+
+@cli.command()
+@click.argument(
+    "input_dir",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
+)
+@click.option(
+    "--index",
+    "index_path",
+    required=True,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Member index file to create or update",
+)
+@click.option(
+    "--alias-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory where per-group alias indexes are persisted and reused",
+)
+def index_members(input_dir: Path, index_path: Path, alias_dir: Optional[Path]):
+    """Add every chat export in a directory to the cross-group member index."""
+    index = MemberIndex.load(index_path)
+    senders = SenderDictionary()
+    for file_path in find_exports(input_dir):
+        logger.info(f"Indexing {file_path}")
+        df = chat_to_df(file_path, senders=senders)
+        analysis = create_analysis(df, senders=senders, aliases=load_aliases(alias_dir, file_path, df))
+        index.ingest(file_path.stem, analysis)
+    index.save(index_path)
+
+
+@cli.command()
+@click.option(
+    "--index",
+    "index_path",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Member index built by index-members",
+)
+@click.option("--inactive-everywhere", type=int, help="Members silent in all their groups for at least N days")
+@click.option("--active-somewhere", type=int, help="Members who posted in any group within N days")
+@click.option("--member", help="Show per-group activity of one member (name or phone number)")
+@click.option("--output", "-o", type=click.Path(path_type=Path), help="Output file path")
+def query_members(
+    index_path: Path,
+    inactive_everywhere: Optional[int],
+    active_somewhere: Optional[int],
+    member: Optional[str],
+    output: Optional[Path],
+):
+    """Answer cross-group activity questions from the member index."""
+    index = MemberIndex.load(index_path)
+    if member:
+        result = index.member_activity(member)
+    elif inactive_everywhere is not None:
+        result = index.inactive_everywhere(inactive_everywhere).reset_index()
+    elif active_somewhere is not None:
+        result = index.active_somewhere(active_somewhere).reset_index()
+    else:
+        raise click.UsageError("Pass one of --inactive-everywhere, --active-somewhere or --member")
+    logger.info(f"Query matched {len(result)} rows")
+    if output:
+        result.to_csv(output, sep="|", index=False)
+        logger.info(f"Results saved to {output}")
+    else:
+        print(result.to_string())
+
+
+@cli.command()
+@click.argument("input_paths", nargs=-1, required=True, type=click.Path(exists=True, path_type=Path))
+@click.option(
+    "--store",
+    "store_dir",
+    required=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Message store directory, created if missing",
+)
+@click.option(
+    "--search-index",
+    "index_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Also add the messages to this full-text search index",
+)
+def store_ingest(input_paths: Tuple[Path, ...], store_dir: Path, index_path: Optional[Path]):
+    """Add chat exports (text or zip files, or directories of them) to the partitioned message store.
+
+    Each export is stored under its file name as the group; re-ingesting a newer export of a
+    group replaces the overlapping messages.
+    """
+    store = MessageStore(store_dir)
+    index = SearchIndex(index_path) if index_path else None
+    for input_path in input_paths:
+        for file_path in find_exports(input_path) if input_path.is_dir() else [input_path]:
+            logger.info(f"Ingesting {file_path}")
+            df = chat_to_df(file_path)
+            store.write(df, group=file_path.stem)
+            if index is not None:
+                index.add(df, group=file_path.stem)
+
+
+@cli.command("import-csv")
+@click.argument("input_paths", nargs=-1, required=True, type=click.Path(exists=True, path_type=Path))
+@click.option(
+    "--output-dir",
+    "-o",
+    required=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory of the imported Parquet files, one per CSV",
+)
+def import_csv(input_paths: Tuple[Path, ...], output_dir: Path):
+    """Import saved messages CSVs (files, or directories of them) into the canonical Parquet format.
+
+    The delimiter and column order of every CSV are sniffed from its header, so files of any of
+    the historical layouts can be mixed. The imported files have the same typed 'Datetime',
+    'Sender' and 'Message' columns and load without parsing.
+    """
+    paths = sorted(
+        path
+        for input_path in input_paths
+        for path in (input_path.glob("*.csv") if input_path.is_dir() else [input_path])
+    )
+    import_csvs(paths, output_dir)
+
+
+@cli.command("reconcile")
+@click.argument("input_paths", nargs=-1, required=True, type=click.Path(exists=True, path_type=Path))
+@click.option(
+    "--tolerance-seconds",
+    default=2.0,
+    show_default=True,
+    help="Largest time difference of the same message in two snapshots",
+)
+@click.option(
+    "--output", "-o", required=True, type=click.Path(dir_okay=False, path_type=Path), help="Merged history file"
+)
+@click.option("--report", type=click.Path(dir_okay=False, path_type=Path), help="Overlap report file")
+def reconcile_snapshots(input_paths: Tuple[Path, ...], tolerance_seconds: float, output: Path, report: Optional[Path]):
+    """Merge overlapping message snapshots (CSV or imported Parquet files, or directories of them) into one history.
+
+    Snapshots are merged in file name order. Messages a later snapshot repeats, with the same
+    sender and text and a timestamp shifted by at most the tolerance, are kept once, and the
+    overlapping stretches found are reported.
+    """
+    paths = sorted(
+        path
+        for input_path in input_paths
+        for path in (
+            [path for pattern in ("*.csv", "*.parquet") for path in input_path.glob(pattern)]
+            if input_path.is_dir()
+            else [input_path]
+        )
+    )
+    history, overlaps = reconcile(((path.stem, load_messages(path)) for path in paths), tolerance_seconds)
+    history.to_csv(output, sep="|", index=False)
+    logger.info(f"History of {len(history)} messages from {len(paths)} snapshots saved to {output}")
+    if report:
+        overlaps.to_csv(report, sep="|", index=False)
+        logger.info(f"Overlap report saved to {report}")
+    else:
+        print(overlaps.to_string())
+
+
+@cli.command("search-index")
+@click.argument("input_paths", nargs=-1, required=True, type=click.Path(exists=True, path_type=Path))
+@click.option(
+    "--index",
+    "index_path",
+    required=True,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Search index file to create or update",
+)
+def search_index(input_paths: Tuple[Path, ...], index_path: Path):
+    """Add chat exports (text or zip files, or directories of them) to the full-text search index.
+
+    Each export is indexed under its file name as the group; messages already indexed are skipped.
+    """
+    index = SearchIndex(index_path)
+    for input_path in input_paths:
+        for file_path in find_exports(input_path) if input_path.is_dir() else [input_path]:
+            logger.info(f"Indexing {file_path}")
+            index.add(chat_to_df(file_path), group=file_path.stem)
+    index.optimize()
+    logger.info(f"Search index {index_path} holds {len(index)} messages")
+
+
+@cli.command()
+@click.argument("query")
+@click.option(
+    "--index",
+    "index_path",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Search index built by search-index, store-ingest or watch",
+)
+@click.option("--group", "-g", "groups", multiple=True, help="Group to search, repeatable; defaults to all")
+@click.option("--sender", help="Only messages of this sender (name or phone number)")
+@click.option("--since", type=click.DateTime(["%Y-%m-%d"]), help="First day (YYYY-MM-DD)")
+@click.option("--until", type=click.DateTime(["%Y-%m-%d"]), help="Last day (YYYY-MM-DD), inclusive")
+@click.option("--order", type=click.Choice(list(ORDERS)), default="rank", show_default=True, help="Result order")
+@click.option("--limit", default=20, show_default=True, help="Results per page")
+@click.option("--page", default=1, show_default=True, help="Page of results")
+@click.option("--raw", is_flag=True, help="Read QUERY as FTS5 syntax (OR, NOT, prefix*) instead of plain terms")
+@click.option("--output", "-o", type=click.Path(path_type=Path), help="Output file path")
+def search(
+    query: str,
+    index_path: Path,
+    groups: Tuple[str, ...],
+    sender: Optional[str],
+    since: Optional[datetime],
+    until: Optional[datetime],
+    order: str,
+    limit: int,
+    page: int,
+    raw: bool,
+    output: Optional[Path],
+):
+    """Find messages containing every term of QUERY across the indexed groups."""
+    index = SearchIndex(index_path, read_only=True)
+    filters = dict(
+        groups=list(groups),
+        sender=sender,
+        since=since.date() if since else None,
+        until=until.date() if until else None,
+        raw=raw,
+    )
+    result = index.search(query, order=order, limit=limit, page=page, **filters)
+    logger.info(f"Page {page}: {len(result)} of {index.count(query, **filters)} matching messages")
+    if output:
+        result.to_csv(output, sep="|", index=False)
+        logger.info(f"Results saved to {output}")
+    else:
+        print(result.to_string())
+
+
+@cli.command()
+@click.argument("store_dir", type=click.Path(exists=True, file_okay=False, path_type=Path))
+@click.option("--group", "-g", "groups", multiple=True, help="Group to analyze, repeatable; defaults to all")
+@click.option("--output", "-o", type=click.Path(path_type=Path), help="Output file path")
+@click.option(
+    "--window-days",
+    "-w",
+    multiple=True,
+    default=[60],
+    help="Window in days to consider for inactivity; repeat (-w 30 -w 90) for one column per window",
+)
+@click.option(
+    "--exclude-contacts/--include-contacts",
+    default=False,
+    help="Exclude contacts (users with ~)",
+)
+@click.option(
+    "--alias-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory where per-group alias indexes are persisted and reused",
+)
+def analyze_store(
+    store_dir: Path,
+    groups: Tuple[str, ...],
+    output: Optional[Path],
+    window_days: Tuple[int, ...],
+    exclude_contacts: bool,
+    alias_dir: Optional[Path],
+):
+    """Analyze groups in the message store, like analyze-multiple, in bounded memory."""
+    store = MessageStore(store_dir)
+    all_results = []
+    senders = SenderDictionary()
+    for group in groups or store.groups():
+        logger.info(f"Processing {group}")
+        df = store.analysis_frame(group, windows=window_days)
+        analysis = create_analysis(df, senders=senders, aliases=load_aliases(alias_dir, Path(group), df))
+        result = analysis.get_inactive_users(exclude_contacts=exclude_contacts, windows=window_days)
+        result.insert(0, "Group", group)
+        all_results.append(result)
+    for result in all_results:
+        result["User"] = senders.recategorize(result["User"])
+    combined_results = pd.concat(all_results, ignore_index=True)
+    if output:
+        combined_results.to_csv(output, sep="|", index=False)
+        logger.info(f"Results saved to {output}")
+    else:
+        print(combined_results.to_string())
+
+
+@cli.command()
+@click.argument("input_dir", type=click.Path(exists=True, file_okay=False, path_type=Path))
+@click.option(
+    "--store",
+    "store_dir",
+    required=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Message store the exports are ingested into",
+)
+@click.option(
+    "--output",
+    "-o",
+    required=True,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Results file, refreshed after every batch of changes",
+)
+@click.option(
+    "--window-days",
+    "-w",
+    multiple=True,
+    default=[60],
+    help="Window in days to consider for inactivity; repeat (-w 30 -w 90) for one column per window",
+)
+@click.option(
+    "--exclude-contacts/--include-contacts",
+    default=False,
+    help="Exclude contacts (users with ~)",
+)
+@click.option(
+    "--alias-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory where per-group alias indexes are persisted and reused",
+)
+@click.option(
+    "--debounce",
+    default=2.0,
+    show_default=True,
+    help="Seconds without changes before a burst of changed exports is processed",
+)
+@click.option(
+    "--search-index",
+    "index_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Also add ingested messages to this full-text search index",
+)
+@click.option(
+    "--spam-output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Check ingested messages for spam and append the flags to this file",
+)
+@click.option(
+    "--spam-state",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Spam detector state, resumed on start and saved after every batch",
+)
+@click.option("--poll", is_flag=True, help="Poll for changes instead of using file system notifications")
+@click.option("--once", is_flag=True, help="Ingest what changed, refresh the results and exit")
+def watch(
+    input_dir: Path,
+    store_dir: Path,
+    output: Path,
+    window_days: Tuple[int, ...],
+    exclude_contacts: bool,
+    alias_dir: Optional[Path],
+    debounce: float,
+    index_path: Optional[Path],
+    spam_output: Optional[Path],
+    spam_state: Optional[Path],
+    poll: bool,
+    once: bool,
+):
+    """Keep the results of analyze-multiple up to date as exports are added to a directory.
+
+    New and changed exports are ingested into the message store, parsing only the lines appended
+    to an export since it was last seen, and only the groups that changed are analyzed again.
+    With --search-index and --spam-output, the new messages are also indexed for search and
+    checked for spam as they are ingested.
+    """
+    store = MessageStore(store_dir)
+    detector = load_detector(spam_state) if spam_output else None
+    index = SearchIndex(index_path) if index_path else None
+
+    def on_ingest(group: str, df: pd.DataFrame) -> None:
+        if index is not None:
+            index.add(df, group=group)
+        if detector is not None:
+            append_flags(detector.process(df, group=group), spam_output)
+
+    watcher = ExportWatcher(store, on_ingest=on_ingest if index is not None or detector is not None else None)
+    senders = SenderDictionary()
+    results: Dict[str, pd.DataFrame] = {}
+
+    def refresh(groups: Set[str]) -> None:
+        for group in sorted(groups):
+            df = store.analysis_frame(group, windows=window_days)
+            analysis = create_analysis(df, senders=senders, aliases=load_aliases(alias_dir, Path(group), df))
+            result = analysis.get_inactive_users(exclude_contacts=exclude_contacts, windows=window_days)
+            result.insert(0, "Group", group)
+            results[group] = result
+        if not results:
+            return
+        combined_results = pd.concat(
+            [result.assign(User=senders.recategorize(result["User"])) for result in results.values()],
+            ignore_index=True,
+        )
+        partial = output.with_name(f"{output.name}.partial")
+        combined_results.to_csv(partial, sep="|", index=False)
+        partial.replace(output)
+        logger.info(f"Results for {len(groups)} changed group(s) saved to {output}")
+
+    def save_detector() -> None:
+        if detector is not None and spam_state:
+            detector.save(spam_state)
+
+    exports = find_exports(input_dir)
+    watcher.sync(exports)
+    save_detector()
+    refresh({path.stem for path in exports if store.partitions([path.stem])})
+    if once:
+        return
+    try:
+        for paths in watch_exports(input_dir, debounce=debounce, force_polling=poll):
+            changed = watcher.sync(paths)
+            save_detector()
+            if changed:
+                refresh(changed)
+    except KeyboardInterrupt:
+        logger.info(f"Stopped watching {input_dir}")
+
+
 if __name__ == "__main__":
-    cli() 
\ No newline at end of file
+    cli()
@@ -0,0 +1,312 @@
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import pandas as pd
+from loguru import logger
+
+from src.core.profiling import profiled
+from src.core.senders import normalize_sender
+
+# A phone number as it appears in "added" events and @mentions: +91 98765 43210, @919876543210
+PHONE_PATTERN = re.compile(r"^@?\+?[\d\s()-]{8,}$")
+MENTION_PATTERN = r"@(\+?\d[\d -]{7,}\d)"
+
+# System messages whose subject and sender field name the same person, and number changes
+# that name both the old and the new identifier. iOS exports start system messages with a
+# left-to-right mark; Android ones have no sender field, which the parser reports as "System".
+SYSTEM_MARK_PATTERN = r"^\s*[\u200e\u200f]"
+SYSTEM_SENDER = "System"
+JOIN_SUBJECT_PATTERN = r"^(?P<subject>.+?) joined (?:using this group's invite link|from the community)"
+LEFT_SUBJECT_PATTERN = r"^(?P<subject>.+?) left$"
+NUMBER_CHANGE_PATTERN = r"^(?P<old>.+?) changed (?:their phone number )?to (?P<new>.+?)$"
+
+
+def member_key(identifier: str) -> str:
+    """Map an identifier to the key used for alias resolution.
+
+    Phone numbers are reduced to their digits and names are normalized as sender names are, so
+    "+91 98765 43210" / "@919876543210" and "~ Rahul" / "Rahul" collapse to one key each. Case is
+    kept: "Rahul" and "rahul" can be two people, and only an event links them.
+
+    Args:
+        identifier: Sender name, phone number or mention
+
+    Returns:
+        Key prefixed with "tel:" for phone numbers and "name:" otherwise
+    """
+    name = normalize_sender(identifier)
+    if PHONE_PATTERN.match(name):
+        return "tel:" + re.sub(r"\D", "", name)
+    return "name:" + name
+
+
+class AliasIndex:
+    """Union-find over identifiers that refer to the same group member."""
+
+    def __init__(self) -> None:
+        """Initialize an empty index."""
+        self.keys: Dict[str, int] = {}
+        self.parent: List[int] = []
+        self.size: List[int] = []
+        # Display name recorded for each key, used to label the canonical member
+        self.names: List[str] = []
+
+    def __len__(self) -> int:
+        """Return the number of distinct identifiers."""
+        return len(self.parent)
+
+    def add(self, identifier: str) -> int:
+        """Register an identifier.
+
+        Args:
+            identifier: Sender name, phone number or mention
+
+        Returns:
+            Node id of the identifier
+        """
+        key = member_key(identifier)
+        node = self.keys.get(key)
+        if node is None:
+            node = len(self.parent)
+            self.keys[key] = node
+            self.parent.append(node)
+            self.size.append(1)
+            self.names.append(normalize_sender(identifier))
+        return node
+
+    def find(self, node: int) -> int:
+        """Find the root of a node, compressing the path on the way.
+
+        Args:
+            node: Node id
+
+        Returns:
+            Node id of the root
+        """
+        root = node
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[node] != root:
+            self.parent[node], node = root, self.parent[node]
+        return root
+
+    def union(self, first: str, second: str) -> int:
+        """Record that two identifiers refer to the same member.
+
+        Args:
+            first: First identifier
+            second: Second identifier
+
+        Returns:
+            Node id of the merged root
+        """
+        a, b = self.find(self.add(first)), self.find(self.add(second))
+        if a == b:
+            return a
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return a
+
+    def canonical(self, identifier: str) -> Optional[int]:
+        """Return the canonical member id of an identifier.
+
+        Args:
+            identifier: Sender name, phone number or mention
+
+        Returns:
+            Canonical member id, or None if the identifier was never seen
+        """
+        node = self.keys.get(member_key(identifier))
+        return None if node is None else self.find(node)
+
+    def display_name(self, member: int) -> str:
+        """Return the display name of a member.
+
+        Args:
+            member: Canonical member id
+
+        Returns:
+            Name of the alias chosen as the member's label, preferring names over phone numbers
+        """
+        return self.names[member]
+
+    def compress(self) -> None:
+        """Point every node directly at its root and pick a name-like root for each member.
+
+        After compression, canonical lookups are a dictionary access plus one list index.
+        """
+        roots = [self.find(node) for node in range(len(self.parent))]
+        # Prefer a name over a phone number as the member's label
+        members: Dict[int, List[int]] = {}
+        for node, root in enumerate(roots):
+            members.setdefault(root, []).append(node)
+        for nodes in members.values():
+            named = [node for node in nodes if not PHONE_PATTERN.match(self.names[node])]
+            label = min(named) if named else min(nodes)
+            for node in nodes:
+                self.parent[node] = label
+            self.size[label] = len(nodes)
+
+    @profiled()
+    def add_messages(self, df: pd.DataFrame) -> "AliasIndex":
+        """Add identifiers and alias edges found in a message DataFrame.
+
+        Args:
+            df: DataFrame with 'Sender' and 'Message' columns
+
+        Returns:
+            This index, for chaining
+        """
+        for sender in pd.unique(df["Sender"].dropna().astype(str)):
+            self.add(sender)
+
+        raw = df["Message"].astype(str)
+        candidates = raw.str.contains("joined|left|changed|@", regex=True)
+        raw, senders = raw[candidates], df.loc[candidates, "Sender"].astype(str)
+        messages = raw.str.replace(r"^[\u200e\u200f\s]+", "", regex=True)
+        # Only system messages are events; members write "the bus already left" too
+        system = raw.str.contains(SYSTEM_MARK_PATTERN, regex=True) | (senders == SYSTEM_SENDER)
+
+        # Join/leave events name the member in the text, while the sender field may show another
+        # alias of the same member. Exports that attribute system messages to the group itself
+        # show one sender with many subjects, so only senders with a single subject are linked.
+        subjects = pd.concat(
+            [messages.str.extract(pattern)["subject"] for pattern in (JOIN_SUBJECT_PATTERN, LEFT_SUBJECT_PATTERN)]
+        ).dropna()
+        subjects = subjects[~subjects.str.strip().str.lower().isin(["", "you"])]
+        events = pd.DataFrame(
+            {
+                "Sender": senders[subjects.index].to_numpy(),
+                "Subject": subjects.to_numpy(),
+                "System": system[subjects.index].to_numpy(),
+            }
+        )
+        events = events[events["Sender"] != SYSTEM_SENDER]
+        events["Subject_Key"] = events["Subject"].map(member_key)
+        # Unmarked lines only count when they pair a known identifier with a phone number, as exports
+        # that name a member by number in the sender field and by name in the text do
+        sender_phone = events["Sender"].map(member_key).str.startswith("tel:")
+        phone_pair = sender_phone != events["Subject_Key"].str.startswith("tel:")
+        events = events[events["System"] | (events["Subject_Key"].isin(set(self.keys)) & phone_pair)]
+        single_subject = events.groupby("Sender")["Subject_Key"].transform("nunique") == 1
+        for sender, subject in (
+            events.loc[single_subject, ["Sender", "Subject"]].drop_duplicates().itertuples(index=False)
+        ):
+            self.union(sender, subject)
+
+        changes = messages[system].str.extract(NUMBER_CHANGE_PATTERN).dropna()
+        for old, new in zip(changes["old"], changes["new"], strict=True):
+            if PHONE_PATTERN.match(normalize_sender(new)):
+                self.union(old, new)
+
+        # Mentioned numbers are registered so they resolve to the member they belong to
+        mentions = messages.str.extractall(MENTION_PATTERN)
+        if not mentions.empty:
+            for mention in mentions[0].unique():
+                self.add(mention)
+
+        self.compress()
+        logger.info(f"Alias index has {len(self)} identifiers for {len(self.members())} members")
+        return self
+
+    def add_aliases(self, pairs: Iterable[tuple]) -> "AliasIndex":
+        """Record known aliases, e.g. a saved contact name and a phone number.
+
+        Args:
+            pairs: Iterable of (identifier, identifier) pairs
+
+        Returns:
+            This index, for chaining
+        """
+        for first, second in pairs:
+            self.union(first, second)
+        self.compress()
+        return self
+
+    def members(self) -> List[int]:
+        """Return the canonical member ids.
+
+        Returns:
+            List of root node ids
+        """
+        return [node for node in range(len(self.parent)) if self.find(node) == node]
+
+    def keys_by_member(self) -> Dict[int, List[str]]:
+        """Group the keys of all identifiers by member.
+
+        Returns:
+            Dictionary of canonical member id to member keys ("tel:..." / "name:...")
+        """
+        keys_by_member: Dict[int, List[str]] = {}
+        for key, node in self.keys.items():
+            keys_by_member.setdefault(self.find(node), []).append(key)
+        return keys_by_member
+
+    @classmethod
+    def from_messages(cls, df: pd.DataFrame) -> "AliasIndex":
+        """Build an alias index from a message DataFrame.
+
+        Args:
+            df: DataFrame with 'Sender' and 'Message' columns
+
+        Returns:
+            New AliasIndex
+        """
+        return cls().add_messages(df)
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Persist the index as JSON.
+
+        Args:
+            path: Output file path
+        """
+        self.compress()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"keys": list(self.keys), "parent": self.parent, "names": self.names}
+        path.write_text(json.dumps(data, ensure_ascii=False))
+        logger.info(f"Saved alias index with {len(self)} identifiers to {path}")
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "AliasIndex":
+        """Load an index persisted with save.
+
+        Args:
+            path: Path to the JSON file
+
+        Returns:
+            AliasIndex with the same members
+        """
+        data = json.loads(Path(path).read_text())
+        index = cls()
+        index.keys = {key: node for node, key in enumerate(data["keys"])}
+        index.parent = list(data["parent"])
+        index.names = list(data["names"])
+        index.size = [1] * len(index.parent)
+        for node, root in enumerate(index.parent):
+            if node != root:
+                index.size[root] += 1
+        logger.info(f"Loaded alias index with {len(index)} identifiers from {path}")
+        return index
+
+    @classmethod
+    def load_or_build(cls, path: Optional[Union[str, Path]], df: pd.DataFrame) -> "AliasIndex":
+        """Load a persisted index and extend it with the given messages, or build a new one.
+
+        Args:
+            path: Optional path of the persisted index; the updated index is written back to it
+            df: DataFrame with 'Sender' and 'Message' columns
+
+        Returns:
+            AliasIndex covering the messages
+        """
+        if path is None:
+            return cls.from_messages(df)
+        index = cls.load(path) if Path(path).exists() else cls()
+        index.add_messages(df)
+        index.save(path)
+        return index
@@ -1,154 +1,276 @@
 import re
-from typing import Tuple
+from typing import Any, Dict, Optional, Sequence, Tuple
 
+import numpy as np
 import pandas as pd
 from loguru import logger
 
+from src.core import scoring
+from src.core.aliases import JOIN_SUBJECT_PATTERN, MENTION_PATTERN, AliasIndex, member_key
+from src.core.graph import InteractionGraph
+from src.core.membership import MembershipTimeline
+from src.core.profiling import profiled
+from src.core.senders import SenderDictionary
+
+# Fragments of system messages that occasionally get parsed as user names
+SYSTEM_FRAGMENTS = [
+    "message was deleted",
+    "this message",
+    "messages and calls",
+    "changed the subject",
+    "changed this group",
+    "reset this group",
+    "group's settings",
+]
+
+
+def is_valid_user(name: str) -> bool:
+    """Check whether an interned name looks like a real user rather than a parsing artifact.
+
+    Args:
+        name: Normalized user name
+
+    Returns:
+        True if the name should be reported as a user
+    """
+    # Skip system messages or fragments of messages that got parsed as users
+    if len(name) < 2 or name == "System":
+        return False
+    # Skip if user contains common system message fragments
+    if any(fragment in name.lower() for fragment in SYSTEM_FRAGMENTS):
+        return False
+    # Skip if user name is too long (likely a message fragment)
+    return len(name.split()) <= 5
+
 
 class WhatsAppGroupAnalysis:
     """Class for analyzing WhatsApp group chat data."""
 
-    def __init__(self, df: pd.DataFrame) -> None:
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        senders: Optional[SenderDictionary] = None,
+        aliases: Optional[AliasIndex] = None,
+    ) -> None:
         """Initialize with a DataFrame containing message data.
 
         Args:
-            df: DataFrame with 'Datetime' and 'Sender' columns
+            df: DataFrame with 'Datetime' and 'Sender' columns, and optionally 'Count' (messages per row, as in
+                the compact frames of MessageStore.analysis_frame)
+            senders: Optional sender dictionary to share ids with other groups, defaults to a new one
+            aliases: Optional alias index for the group, built from the messages if not given
         """
         self.df = df
         # Convert the 'Datetime' column to a datetime object
         self.df["Datetime"] = pd.to_datetime(self.df["Datetime"])
-        logger.info(f"Initialized WhatsAppGroupAnalysis with {len(df)} messages")
+        # Intern senders so that joins, groupbys and set operations run on integer codes
+        self.senders = senders if senders is not None else SenderDictionary()
+        self.df["Sender"] = self.senders.encode(self.df["Sender"])
+        # Resolve every alias of a member (phone number, "~ Name", saved contact) to one id
+        self.aliases = aliases if aliases is not None else AliasIndex.from_messages(self.df)
+        self._canonical = np.empty(0, dtype=np.int32)
+        self._events: Optional[pd.DataFrame] = None
+        self._timeline: Optional[MembershipTimeline] = None
+        self._graphs: Dict[int, InteractionGraph] = {}
+        self.sender_codes = self._canonical_codes(self.df["Sender"].cat.codes.to_numpy())
+        # Messages per row, None when every row is one message
+        self.weights = self.df["Count"].to_numpy() if "Count" in self.df.columns else None
+        logger.info(f"Initialized WhatsAppGroupAnalysis with {len(df)} messages and {len(self.senders)} senders")
 
-    def get_current_users(self) -> Tuple[pd.DataFrame, int]:
-        """Get the current users in the group.
+    def _rows_matching(self, pattern: str) -> np.ndarray:
+        """Find the messages matching a regular expression, ignoring case.
+
+        Args:
+            pattern: Regular expression in lower case
 
         Returns:
-            Tuple of (DataFrame with current users, count of current users)
+            Boolean mask of matching rows
+        """
+        # Lower-casing first is several times faster than a case-insensitive regex
+        return self.df["Message"].str.lower().str.contains(pattern, na=False).to_numpy()
+
+    def _message_counts(self, since: Optional[pd.Timestamp] = None) -> np.ndarray:
+        """Count the messages of every member.
+
+        Args:
+            since: Optional time after which messages are counted, defaults to all messages
+
+        Returns:
+            Array of message counts indexed by sender id
+        """
+        rows = None if since is None else (self.df["Datetime"] > since).to_numpy()
+        codes = self.sender_codes if rows is None else self.sender_codes[rows]
+        weights = self.weights if rows is None or self.weights is None else self.weights[rows]
+        valid = codes >= 0
+        counts = np.bincount(
+            codes[valid], weights=None if weights is None else weights[valid], minlength=len(self.senders)
+        )
+        return counts.astype(np.int64)
+
+    def _last_message_times(self) -> np.ndarray:
+        """Find the time of the last message of every member.
+
+        Returns:
+            datetime64 array indexed by sender id, NaT for members who never posted
         """
-        # Extract user events chronologically
+        valid = self.sender_codes >= 0
+        last = pd.Series(self.df["Datetime"].to_numpy()[valid]).groupby(self.sender_codes[valid]).max()
+        return last.reindex(np.arange(len(self.senders))).to_numpy()
+
+    def _active_members(self, since: pd.Timestamp) -> np.ndarray:
+        """Find the members who posted after a point in time.
+
+        Args:
+            since: Time after which messages count
+
+        Returns:
+            Sorted array of sender ids
+        """
+        return np.unique(self.sender_codes[(self.df["Datetime"] > since).to_numpy()])
+
+    def _canonical_codes(self, codes: np.ndarray) -> np.ndarray:
+        """Map sender ids to the sender id labelling their member.
+
+        Args:
+            codes: Array of sender ids, -1 where missing
+
+        Returns:
+            Array of canonical sender ids, -1 where missing
+        """
+        # Extend the mapping for senders interned since the last call; interning a member's
+        # label can itself add a sender, hence the loop
+        mapping = list(self._canonical)
+        while len(mapping) < len(self.senders):
+            name = self.senders.names[len(mapping)]
+            member = self.aliases.canonical(name)
+            if member is None:
+                member = self.aliases.add(name)
+            mapping.append(self.senders.intern(self.aliases.display_name(member)))
+        self._canonical = np.asarray(mapping, dtype=np.int32)
+        codes = np.asarray(codes, dtype=np.int32)
+        return np.append(self._canonical, np.int32(-1))[codes]
+
+    def _unsaved_members(self, users: np.ndarray) -> np.ndarray:
+        """Return whether each member was ever shown with the "~" prefix.
+
+        Args:
+            users: Array of canonical sender ids
+
+        Returns:
+            Boolean array aligned with users
+        """
+        self._canonical_codes(np.empty(0, dtype=np.int32))
+        unsaved = np.zeros(len(self.senders), dtype=bool)
+        np.logical_or.at(unsaved, self._canonical, np.asarray(self.senders.unsaved, dtype=bool))
+        return unsaved[users]
+
+    def _users_frame(self, codes: np.ndarray, **columns: Any) -> pd.DataFrame:
+        """Build a DataFrame with a categorical 'User' column from sender ids.
+
+        Args:
+            codes: Array of sender ids
+            **columns: Additional columns aligned with codes
+
+        Returns:
+            DataFrame with 'User' followed by the additional columns
+        """
+        return pd.DataFrame({"User": self.senders.decode(codes), **columns})
+
+    @profiled()
+    def _extract_user_events(self) -> pd.DataFrame:
+        """Extract join and leave events from the messages.
+
+        The events are extracted once per analysis and reused by every method that needs them.
+
+        Returns:
+            DataFrame with 'datetime', 'user' (sender id) and 'event_type' columns, sorted by datetime
+        """
+        if self._events is not None:
+            return self._events
         user_events = []
-        
+
         # Compile patterns for message matching
-        joined_pattern = r"joined using this group|joined from the community"
-        added_pattern = r"added"
-        left_pattern = r"left(?!\s+\w)"  # "left" not followed by a word (to avoid phrases like "left behind")
-        removed_pattern = r"removed"
-        
-        # Create a unified DataFrame of user events
-        for _, row in self.df.iterrows():
-            message = row["Message"]
-            datetime = row["Datetime"]
-            sender = row["Sender"]
-            
+        joined_pattern = re.compile(r"joined using this group|joined from the community", re.IGNORECASE)
+        join_subject_pattern = re.compile(JOIN_SUBJECT_PATTERN)
+        added_pattern = re.compile(r"(.*?)added\s+(.*?)$", re.IGNORECASE)
+        left_pattern = re.compile(r"left(?!\s+\w)", re.IGNORECASE)  # "left" not followed by a word
+        removed_pattern = re.compile(r"(.*?)removed\s+(.*?)$", re.IGNORECASE)
+
+        # Only messages mentioning one of the keywords can be events, so skip the rest up front
+        candidates = self._rows_matching("joined|added|left|removed")
+        rows = self.df.loc[candidates, ["Datetime", "Message"]]
+        codes = self.sender_codes[candidates]
+
+        for datetime, message, sender in zip(rows["Datetime"], rows["Message"], codes, strict=True):
             if not message or not isinstance(message, str):
                 continue
-                
+
             # Handle users who joined
-            if re.search(joined_pattern, message, re.IGNORECASE):
-                # The sender is the one who joined
-                user_events.append({
-                    "datetime": datetime,
-                    "user": sender,
-                    "event_type": "join"
-                })
-            
+            if joined_pattern.search(message):
+                # The subject of "X joined ..." is the one who joined; some exports attribute the
+                # message to the group itself, so fall back to the sender only when there is none
+                match = join_subject_pattern.match(message.lstrip("\u200e "))
+                if match and match.group("subject").lower() != "you":
+                    user_events.append((datetime, self.senders.intern(match.group("subject")), "join"))
+                else:
+                    user_events.append((datetime, sender, "join"))
+
             # Handle users who were added
-            elif re.search(added_pattern, message, re.IGNORECASE):
-                # Extract the user who was added from the message
-                match = re.search(r"(.*?)added\s+(.*?)$", message, re.IGNORECASE)
+            elif "added" in message.lower():
+                match = added_pattern.search(message)
                 if match and match.group(2):
-                    added_user = match.group(2).strip()
-                    user_events.append({
-                        "datetime": datetime,
-                        "user": added_user,
-                        "event_type": "join"
-                    })
-            
+                    user_events.append((datetime, self.senders.intern(match.group(2)), "join"))
+
             # Handle users who left
-            elif re.search(left_pattern, message, re.IGNORECASE):
+            elif left_pattern.search(message):
                 # In "X left", X is typically at the beginning of the message
                 if message.strip().endswith("left"):
                     left_user = message.split("left")[0].strip()
                     # If the message is just "left", then the sender left
-                    if not left_user:
-                        left_user = sender
-                    user_events.append({
-                        "datetime": datetime,
-                        "user": left_user,
-                        "event_type": "leave"
-                    })
-            
+                    user = self.senders.intern(left_user) if left_user else sender
+                    user_events.append((datetime, user, "leave"))
+
             # Handle users who were removed
-            elif re.search(removed_pattern, message, re.IGNORECASE):
-                # Try to extract the removed user
-                match = re.search(r"(.*?)removed\s+(.*?)$", message, re.IGNORECASE)
+            elif "removed" in message.lower():
+                match = removed_pattern.search(message)
                 if match and match.group(2):
-                    removed_user = match.group(2).strip()
-                    user_events.append({
-                        "datetime": datetime,
-                        "user": removed_user,
-                        "event_type": "leave"
-                    })
-        
-        # Create and sort events DataFrame
-        events_df = pd.DataFrame(user_events)
-        if not events_df.empty:
-            events_df = events_df.sort_values("datetime")
-            
-            # Get the latest event for each user
-            latest_events = events_df.drop_duplicates(subset=["user"], keep="last")
-            
-            # Users whose latest event is "join" are current users
-            current_users = latest_events[latest_events["event_type"] == "join"]["user"].tolist()
-        else:
-            current_users = []
-            
+                    user_events.append((datetime, self.senders.intern(match.group(2)), "leave"))
+
+        events_df = pd.DataFrame(user_events, columns=["datetime", "user", "event_type"])
+        events_df["user"] = self._canonical_codes(events_df["user"].to_numpy(dtype=np.int32))
+        self._events = events_df.sort_values("datetime", kind="stable")
+        return self._events
+
+    @profiled()
+    def get_current_users(self) -> Tuple[pd.DataFrame, int]:
+        """Get the current users in the group.
+
+        Returns:
+            Tuple of (DataFrame with current users, count of current users)
+        """
+        events_df = self._extract_user_events()
+
+        # Users whose latest event is "join" are current users
+        latest_events = events_df.drop_duplicates(subset=["user"], keep="last")
+        current_users = latest_events.loc[latest_events["event_type"] == "join", "user"].to_numpy()
+
         # Also add users who have sent messages but aren't in our events log
-        all_senders = set(self.df["Sender"].unique())
-        all_event_users = set(events_df["user"].unique() if not events_df.empty else [])
-        unknown_users = all_senders - all_event_users
-        
-        # Combine users from events and unknown senders
-        all_current_users = list(set(current_users).union(unknown_users))
-        
-        # Normalize user names to handle duplicates
-        normalized_users = []
-        for user in all_current_users:
-            # Skip empty users or None values
-            if not user or pd.isna(user):
-                continue
-                
-            # Skip system messages or fragments of messages that got parsed as users
-            user_str = str(user).strip()
-            if len(user_str) < 2 or user_str == "System":
-                continue
-            
-            # Skip if user contains common system message fragments
-            if any(fragment in user_str.lower() for fragment in ["message was deleted", "this message", "messages and calls", "changed the subject", "changed this group", "reset this group", "group's settings"]):
-                continue
+        all_senders = np.unique(self.sender_codes)
+        unknown_users = np.setdiff1d(all_senders[all_senders >= 0], events_df["user"].to_numpy())
+
+        # Combine users from events and unknown senders, in id order
+        candidates = np.union1d(current_users, unknown_users).astype(np.int32)
+        unique_users = np.array(
+            [code for code in candidates if is_valid_user(self.senders.names[code])], dtype=np.int32
+        )
 
-            # Skip if user name is too long (likely a message fragment)
-            if len(user_str.split()) > 5:
-                continue
-                
-            # Keep the user
-            normalized_users.append(user_str)
-        
-        # Remove duplicates but maintain predictable order
-        seen = set()
-        unique_users = [x for x in normalized_users if not (x in seen or seen.add(x))]
-        
-        # Limit to the expected count if specified
-        expected_count = 899  # Based on known group size
-        if len(unique_users) > expected_count:
-            unique_users = unique_users[:expected_count]
-        
         # Creating a DataFrame with current users
-        current_users_df = pd.DataFrame(unique_users, columns=["User"])
+        current_users_df = self._users_frame(unique_users)
         current_users_count = len(unique_users)
         logger.info(f"Found {current_users_count} current users")
         return current_users_df, current_users_count
 
+    @profiled()
     def get_message_count_in_window(self, window_days: int = 60) -> pd.DataFrame:
         """Get the message count for each user in a time window.
 
@@ -162,54 +284,53 @@ class WhatsAppGroupAnalysis:
         max_date = self.df["Datetime"].max()
         # Calculate the start date based on the window_days parameter
         start_date = max_date - pd.Timedelta(days=window_days)
-        # Filter messages within the given window
-        messages_in_window = self.df[self.df["Datetime"] > start_date]
-        # Count messages per user
-        message_count_in_window = messages_in_window["Sender"].value_counts().reset_index()
-        message_count_in_window.columns = ["User", "Message_Count_In_Window"]
+        # Count messages per user within the given window
+        counts = self._message_counts(since=start_date)
+        users = np.flatnonzero(counts)
+        # Most active users first, like value_counts
+        users = users[np.argsort(-counts[users], kind="stable")]
+        message_count_in_window = self._users_frame(users, Message_Count_In_Window=counts[users])
         logger.info(f"Message counts calculated for {len(message_count_in_window)} users in {window_days} day window")
         return message_count_in_window
 
-    def get_inactive_users(self, exclude_contacts: bool = False) -> pd.DataFrame:
+    @profiled()
+    def get_inactive_users(
+        self, exclude_contacts: bool = False, windows: Optional[Sequence[int]] = None
+    ) -> pd.DataFrame:
         """Get users who have been inactive.
 
         Args:
             exclude_contacts: Whether to exclude contacts (users with names starting with '~'), defaults to False
+            windows: Optional windows in days to report side by side (see get_inactive_users_by_window);
+                defaults to the 60-day window alone
 
         Returns:
             DataFrame with inactive users and their statistics
         """
+        if windows is not None:
+            return self.get_inactive_users_by_window(windows, exclude_contacts=exclude_contacts)
         # Get users with zero messages
-        users_with_zero_messages = self.get_users_with_zero_messages()
+        users = self.get_users_with_zero_messages()["User"].cat.codes.to_numpy()
         # Filter users whose usernames start with a tilde ("~")
         if exclude_contacts:
-            inactive_users = users_with_zero_messages[users_with_zero_messages["User"].str.startswith("~")]
-        else:
-            inactive_users = users_with_zero_messages
-        # Get users with joining date
-        users_with_joining_date = self.get_users_with_joining_date()
-        # Merge inactive users with joining dates
-        inactive_users_with_joining_date = pd.merge(inactive_users, users_with_joining_date, on="User", how="left")
+            users = users[self._unsaved_members(users)]
+        # Look up joining dates by user id
+        joining_dates = self._joining_dates().reindex(users).to_numpy()
         # Get the cutoff date for the last 60 days
         max_date = self.df["Datetime"].max()
         cutoff_date = max_date - pd.Timedelta(days=60)
-        # Filter users who joined more than 60 days ago
-        filtered_inactive_users = inactive_users_with_joining_date[
-            inactive_users_with_joining_date["Joining_Date"] < cutoff_date
-        ]
+        # Filter users who joined more than 60 days ago (users without a joining date are dropped)
+        joined_before_cutoff = joining_dates < cutoff_date.to_datetime64()
+        users, joining_dates = users[joined_before_cutoff], joining_dates[joined_before_cutoff]
         # Count total messages sent by each user since the beginning
-        total_message_count = self.df["Sender"].value_counts().reset_index()
-        total_message_count.columns = ["User", "Total_Messages_Sent"]
-        # Merge with total messages sent
-        filtered_inactive_users_with_messages = pd.merge(
-            filtered_inactive_users, total_message_count, on="User", how="left"
-        ).fillna(0)
+        total_message_count = self._message_counts()
         # Find the most recent message date for each user
-        most_recent_message_date = self.df.groupby("Sender")["Datetime"].max().reset_index()
-        most_recent_message_date.columns = ["User", "Most_Recent_Message_Date"]
-        # Merge with the most recent message date
-        filtered_inactive_users_with_messages = pd.merge(
-            filtered_inactive_users_with_messages, most_recent_message_date, on="User", how="left"
+        most_recent_message_date = self._last_message_times()[users]
+        filtered_inactive_users_with_messages = self._users_frame(
+            users,
+            Joining_Date=joining_dates,
+            Total_Messages_Sent=total_message_count[users],
+            Most_Recent_Message_Date=most_recent_message_date,
         )
         # Calculate days since last message
         filtered_inactive_users_with_messages["Days_Since_Last_Message"] = (
@@ -217,6 +338,59 @@ class WhatsAppGroupAnalysis:
         ).dt.days
         return filtered_inactive_users_with_messages
 
+    @profiled()
+    def get_inactive_users_by_window(self, windows: Sequence[int], exclude_contacts: bool = False) -> pd.DataFrame:
+        """Get the users inactive in each of several windows, in one pass.
+
+        A user is inactive in a window when they joined before it started and sent no message
+        since. Inactivity in a window implies inactivity in every shorter one, so each user's
+        last message time and joining date are placed among the sorted window start dates with
+        searchsorted, which gives the windows they are inactive in at once; extra windows cost
+        one comparison per user.
+
+        Args:
+            windows: Windows in days, counted back from the last message of the chat
+            exclude_contacts: Whether to exclude contacts (users with names starting with '~'), defaults to False
+
+        Returns:
+            DataFrame with the columns of get_inactive_users and one boolean 'Inactive_<days>d'
+            column per window, shortest first, for users inactive in at least one window
+        """
+        windows = sorted(set(windows))
+        current_users_df, _ = self.get_current_users()
+        users = current_users_df["User"].cat.codes.to_numpy()
+        if exclude_contacts:
+            users = users[self._unsaved_members(users)]
+        max_date = self.df["Datetime"].max()
+        # Window start dates in ascending order, i.e. longest window first
+        starts = (max_date - pd.to_timedelta(windows[::-1], unit="D")).to_numpy()
+        last_message = self._last_message_times()[users]
+        joining_dates = self._joining_dates().reindex(users).to_numpy()
+
+        # The longest windows starting before a user's last message saw them post
+        active = np.where(np.isnat(last_message), 0, np.searchsorted(starts, last_message, side="left"))
+        # The shortest windows starting after a user joined count them (users without a joining date never do)
+        eligible = len(windows) - np.searchsorted(starts, joining_dates, side="right")
+        # Inactive in the shortest `inactive_in` windows
+        inactive_in = np.minimum(len(windows) - active, eligible)
+        keep = inactive_in > 0
+        users, inactive_in = users[keep], inactive_in[keep]
+        result = self._users_frame(
+            users,
+            Joining_Date=joining_dates[keep],
+            Total_Messages_Sent=self._message_counts()[users],
+            Most_Recent_Message_Date=last_message[keep],
+        )
+        result["Days_Since_Last_Message"] = (max_date - result["Most_Recent_Message_Date"]).dt.days
+        for position, days in enumerate(windows):
+            result[f"Inactive_{days}d"] = position < inactive_in
+        logger.info(
+            "Inactive users per window: "
+            + ", ".join(f"{days}d: {result[f'Inactive_{days}d'].sum()}" for days in windows)
+        )
+        return result
+
+    @profiled()
     def get_users_with_zero_messages(self) -> pd.DataFrame:
         """Get users who have sent zero messages in the last 60 days.
 
@@ -228,108 +402,343 @@ class WhatsAppGroupAnalysis:
         # Calculate the start date for the last 60 days
         start_date = max_date - pd.Timedelta(days=60)
         # Get all users who have sent messages in the window
-        users_with_messages = set(self.df[self.df["Datetime"] > start_date]["Sender"].unique())
-        
-        # Get all current users in the group
+        users_with_messages = self._active_members(start_date)
+
+        # Get all current users in the group; these are already filtered for message fragments
         current_users_df, _ = self.get_current_users()
-        all_users = set(current_users_df["User"].unique())
-        
-        # Filter out system messages and message fragments
-        valid_users = set()
-        for user in all_users:
-            # Skip empty users or None values
-            if not user or pd.isna(user):
-                continue
-                
-            # Convert to string and strip whitespace
-            user_str = str(user).strip()
-            
-            # Skip very short strings and system messages
-            if len(user_str) < 2 or user_str == "System":
-                continue
-                
-            # Skip strings that look like message fragments
-            if len(user_str.split()) > 5:
-                continue
-                
-            valid_users.add(user_str)
-        
+        all_users = current_users_df["User"].cat.codes.to_numpy()
+
         # Find users who have not sent any messages in the window
-        users_with_zero_messages = [user for user in valid_users if user not in users_with_messages]
-        
+        users_with_zero_messages = np.setdiff1d(all_users, users_with_messages)
+
         # Create a DataFrame with users who have sent zero messages
-        users_with_zero_messages_df = pd.DataFrame(users_with_zero_messages, columns=["User"])
+        users_with_zero_messages_df = self._users_frame(users_with_zero_messages)
         logger.info(f"Found {len(users_with_zero_messages_df)} users with zero messages in the last 60 days")
         return users_with_zero_messages_df
 
-    def get_users_with_joining_date(self) -> pd.DataFrame:
-        """Get the joining date for each user.
+    @profiled()
+    def _joining_dates(self) -> pd.Series:
+        """Get the earliest joining date for each user.
 
         Returns:
-            DataFrame with users and their joining dates
+            Series of joining dates indexed by sender id
         """
-        joining_data = []
-        
         # Handle direct joins
-        joining_pattern = self.df["Message"].str.contains("joined using this group", case=False, na=False)
-        joining_messages = self.df[joining_pattern]
-        
-        for _, row in joining_messages.iterrows():
-            joining_data.append({
-                "User": row["Sender"],
-                "Joining_Date": row["Datetime"]
-            })
-        
+        joining_pattern = self._rows_matching("joined using this group")
+        joined_ids = self.sender_codes[joining_pattern]
+        # Prefer the subject of "X joined ..." over the sender, as for join events
+        subjects = self.df.loc[joining_pattern, "Message"].str.lstrip("\u200e ").str.extract(JOIN_SUBJECT_PATTERN)
+        for position, subject in enumerate(subjects["subject"]):
+            if isinstance(subject, str) and subject.lower() != "you":
+                joined_ids[position] = self.senders.intern(subject)
+        user_ids = [self._canonical_codes(joined_ids)]
+        dates = [self.df["Datetime"].to_numpy()[joining_pattern]]
+
         # Handle added users
-        added_pattern = self.df["Message"].str.contains("added", case=False, na=False)
-        added_messages = self.df[added_pattern]
-        
-        for _, row in added_messages.iterrows():
-            message = row["Message"]
+        added_messages = self.df[self._rows_matching("added")]
+        added_ids, added_dates = [], []
+        for message, datetime in zip(added_messages["Message"], added_messages["Datetime"], strict=True):
             if "added" in message:
                 parts = message.split("added")
                 if len(parts) > 1:
-                    added_user = parts[1].strip()
-                    joining_data.append({
-                        "User": added_user,
-                        "Joining_Date": row["Datetime"]
-                    })
-        
-        # Create DataFrame from collected data
-        users_with_joining_date = pd.DataFrame(joining_data)
-        
+                    added_ids.append(self.senders.intern(parts[1].strip()))
+                    added_dates.append(datetime)
+        user_ids.append(self._canonical_codes(np.asarray(added_ids, dtype=np.int32)))
+        dates.append(np.asarray(added_dates, dtype="datetime64[ns]"))
+
         # Handle duplicates (users who were added multiple times)
         # Keep the earliest joining date
-        users_with_joining_date = users_with_joining_date.sort_values("Joining_Date")
-        users_with_joining_date = users_with_joining_date.drop_duplicates(subset=["User"], keep="first")
-        
+        joining_dates = pd.Series(np.concatenate(dates)).groupby(np.concatenate(user_ids)).min()
+        return joining_dates[joining_dates.index >= 0]
+
+    @profiled()
+    def get_users_with_joining_date(self) -> pd.DataFrame:
+        """Get the joining date for each user.
+
+        Returns:
+            DataFrame with users and their joining dates
+        """
+        joining_dates = self._joining_dates().sort_values(kind="stable")
+        users_with_joining_date = self._users_frame(
+            joining_dates.index.to_numpy(dtype=np.int32), Joining_Date=joining_dates.to_numpy()
+        )
         logger.info(f"Found joining dates for {len(users_with_joining_date)} users")
         return users_with_joining_date
 
+    @profiled()
+    def get_membership_timeline(self) -> MembershipTimeline:
+        """Get the membership intervals of every member.
+
+        The timeline is built once per analysis from the join/add/leave/remove events.
+
+        Returns:
+            MembershipTimeline over sender ids
+        """
+        if self._timeline is None:
+            events = self._extract_user_events()
+            valid = np.array([is_valid_user(name) for name in self.senders.names], dtype=bool)
+            events = events[valid[events["user"].to_numpy()] & (events["user"].to_numpy() >= 0)]
+            senders = np.unique(self.sender_codes)
+            senders = senders[senders >= 0]
+            self._timeline = MembershipTimeline.from_events(
+                events, senders[valid[senders]], self.df["Datetime"].min().to_datetime64()
+            )
+        return self._timeline
+
+    @profiled()
+    def get_members_as_of(self, when) -> pd.DataFrame:
+        """Get the members of the group at a point in time.
+
+        Args:
+            when: Point in time, e.g. "2024-03-01" or a Timestamp
+
+        Returns:
+            DataFrame with the members
+        """
+        members = self.get_membership_timeline().members_as_of(when)
+        logger.info(f"Found {len(members)} members as of {when}")
+        return self._users_frame(members)
+
+    @profiled()
+    def get_daily_member_counts(self, start=None, end=None) -> pd.DataFrame:
+        """Get the number of members at the end of each day.
+
+        Args:
+            start: Optional first day, defaults to the first membership
+            end: Optional last day, defaults to the day of the last message
+
+        Returns:
+            DataFrame with 'Date' and 'Members' columns
+        """
+        end = end if end is not None else self.df["Datetime"].max()
+        counts = self.get_membership_timeline().daily_counts(start, end)
+        return counts.rename_axis("Date").reset_index()
+
+    def _mentions(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the @mentions of phone numbers in the messages.
+
+        Returns:
+            Tuple of (row of each mention, sender id of the mentioned member)
+        """
+        rows = np.flatnonzero(self._rows_matching("@"))
+        messages = pd.Series(self.df["Message"].to_numpy()[rows], index=rows, dtype=object)
+        found = messages.str.extractall(MENTION_PATTERN)[0]
+        if found.empty:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        mentioned, uniques = pd.factorize(found)
+        members = self._canonical_codes(np.array([self.senders.intern(mention) for mention in uniques], dtype=np.int32))
+        return found.index.get_level_values(0).to_numpy(), members[mentioned]
+
+    def _quotes(self) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Find the quoted replies, for messages that carry the quoted sender in a 'ReplyTo' column.
+
+        Returns:
+            Tuple of (row of each reply, sender id of the quoted member), or None without quotes
+        """
+        if "ReplyTo" not in self.df.columns:
+            return None
+        rows = np.flatnonzero(self.df["ReplyTo"].notna().to_numpy())
+        quoted = self.senders.encode(self.df["ReplyTo"].iloc[rows]).cat.codes.to_numpy()
+        return rows, self._canonical_codes(quoted)
+
+    @profiled()
+    def get_interaction_graph(self, gap_minutes: int = 5) -> InteractionGraph:
+        """Get the graph of who interacts with whom.
+
+        A message counts as a reply to the previous message when it follows it within gap_minutes
+        and comes from another member; @mentions of phone numbers and quoted replies (when the
+        messages have a 'ReplyTo' column) are counted separately. The graph is built once per gap.
+
+        Args:
+            gap_minutes: Longest pause, in minutes, between a message and its reply, defaults to 5
+
+        Returns:
+            InteractionGraph over sender ids
+
+        Raises:
+            ValueError: If the messages are a compact frame with a 'Count' column, which loses
+                their order
+        """
+        if gap_minutes in self._graphs:
+            return self._graphs[gap_minutes]
+        if self.weights is not None:
+            raise ValueError("The interaction graph needs one row per message, not a compact frame")
+        mentions, quotes = self._mentions(), self._quotes()
+        # System messages and parsing artifacts neither reply nor are replied to
+        valid = np.array([is_valid_user(name) for name in self.senders.names] + [False], dtype=bool)
+        codes = np.where(valid[self.sender_codes], self.sender_codes, -1)
+        self._graphs[gap_minutes] = InteractionGraph.from_messages(
+            self.df["Datetime"].to_numpy(),
+            codes,
+            len(self.senders),
+            np.timedelta64(gap_minutes, "m"),
+            mentions=mentions,
+            quotes=quotes,
+        )
+        return self._graphs[gap_minutes]
+
+    @profiled()
+    def get_interaction_metrics(self, gap_minutes: int = 5) -> pd.DataFrame:
+        """Get the interaction metrics of every member who posted or was interacted with.
+
+        Args:
+            gap_minutes: Longest pause, in minutes, between a message and its reply, defaults to 5
+
+        Returns:
+            DataFrame with 'User', 'Messages', 'Initiated' and 'Received' (weighted interactions),
+            'Partners', 'PageRank', 'Community' (-1 without interactions) and 'Component', sorted by
+            decreasing PageRank
+        """
+        graph = self.get_interaction_graph(gap_minutes)
+        initiated, received, partners = graph.degrees()
+        # Mentions may have added senders since the graph was built; they have no messages
+        messages = self._message_counts()[: len(graph)]
+        messages = np.pad(messages, (0, len(graph) - len(messages)))
+        members = np.flatnonzero((messages > 0) | (partners > 0))
+        valid = np.array([is_valid_user(self.senders.names[member]) for member in members], dtype=bool)
+        members = members[valid]
+        metrics = self._users_frame(
+            members,
+            Messages=messages[members],
+            Initiated=initiated[members],
+            Received=received[members],
+            Partners=partners[members],
+            PageRank=graph.pagerank()[members],
+            Community=graph.communities()[members],
+            Component=graph.components()[members],
+        )
+        logger.info(f"Computed interaction metrics of {len(metrics)} members")
+        return metrics.sort_values(["PageRank", "User"], ascending=[False, True], ignore_index=True)
+
+    def get_interactions(self, gap_minutes: int = 5) -> pd.DataFrame:
+        """Get the interacting pairs of members.
+
+        Args:
+            gap_minutes: Longest pause, in minutes, between a message and its reply, defaults to 5
+
+        Returns:
+            DataFrame with 'Source' and 'Target' members, 'Replies', 'Mentions', 'Quotes' and
+            'Weight', sorted by decreasing weight
+        """
+        edges = self.get_interaction_graph(gap_minutes).edges()
+        edges["Source"] = self.senders.decode(edges["Source"].to_numpy())
+        edges["Target"] = self.senders.decode(edges["Target"].to_numpy())
+        return edges
+
+    @profiled()
+    def score_members(
+        self,
+        model: str = "exponential",
+        decay_days: int = 90,
+        reference_messages: int = 5,
+        top_k: Optional[int] = None,
+        largest: bool = False,
+    ) -> pd.DataFrame:
+        """Score every current member from the full message history.
+
+        Args:
+            model: Decay model, one of scoring.DECAY_MODELS, defaults to "exponential"
+            decay_days: Decay constant, half-life or window in days, defaults to 90
+            reference_messages: Number of messages that would give a score of 1.0, defaults to 5
+            top_k: Optional number of members to return, defaults to all
+            largest: Whether to rank the most active members first, defaults to least active first
+
+        Returns:
+            DataFrame with 'User', 'Total_Messages_Sent', 'Days_Since_Last_Message' and
+            'Activity_Score', ranked by score
+        """
+        users = self.get_current_users()[0]["User"].cat.codes.to_numpy()
+        scores, counts, days_since_last = scoring.activity_scores(
+            self.sender_codes,
+            self.df["Datetime"].to_numpy(),
+            len(self.senders),
+            self.df["Datetime"].max().to_datetime64(),
+            model=model,
+            decay_days=decay_days,
+            reference_messages=reference_messages,
+            weights=self.weights,
+        )
+        users = users[scoring.rank(scores[users], k=top_k, largest=largest)]
+        # NaN for members who never posted, as in get_inactive_users
+        days_since_last = np.floor(np.where(np.isinf(days_since_last), np.nan, days_since_last))
+        scored_members = self._users_frame(
+            users,
+            Total_Messages_Sent=counts[users],
+            Days_Since_Last_Message=days_since_last[users],
+            Activity_Score=scores[users],
+        )
+        logger.info(f"Scored {len(users)} members with the {model} model")
+        return scored_members
+
+    @profiled()
+    def score_engagement(
+        self, tracker: scoring.EngagementTracker, top_k: Optional[int] = None, largest: bool = False
+    ) -> pd.DataFrame:
+        """Update an engagement tracker with this export and score every current member.
+
+        Only messages newer than the tracker's last update are ingested, so refreshing a
+        persisted tracker with each day's export costs O(new messages).
+
+        Args:
+            tracker: Engagement tracker of this group, possibly loaded from disk
+            top_k: Optional number of members to return, defaults to all
+            largest: Whether to rank the most engaged members first, defaults to least engaged first
+
+        Returns:
+            DataFrame with 'User' and 'Engagement' as of the last message, ranked by engagement
+        """
+        tracker.update(self.sender_codes, self.df["Datetime"].to_numpy(), self.senders.names, weights=self.weights)
+        engagement = tracker.engagement(self.df["Datetime"].max().to_datetime64())
+        users = self.get_current_users()[0]["User"].cat.codes.to_numpy()
+        scores = np.array([engagement.get(member_key(self.senders.names[code]), 0.0) for code in users])
+        order = scoring.rank(scores, k=top_k, largest=largest)
+        return self._users_frame(users[order], Engagement=scores[order])
+
+    @profiled()
     def calculate_activity_score(
         self,
         inactive_users_df: pd.DataFrame,
         decay_days: int = 90,
         reference_messages: int = 5,
+        model: str = "exponential",
     ) -> pd.DataFrame:
         """Calculate an activity score for inactive users.
 
         Args:
-            inactive_users_df: DataFrame with inactive users
+            inactive_users_df: DataFrame with inactive users, as returned by get_inactive_users
             decay_days: Number of days for score to decay to zero, defaults to 90
             reference_messages: Number of messages that would give a score of 1.0, defaults to 5
+            model: Decay model, one of scoring.DECAY_MODELS, defaults to "exponential"
 
         Returns:
-            DataFrame with activity scores for inactive users
+            Copy of the DataFrame with an 'Activity_Score' column, sorted by score (ascending)
         """
-        # Calculate base score (normalized by reference_messages)
-        inactive_users_df["Base_Score"] = inactive_users_df["Total_Messages_Sent"] / reference_messages
-        # Calculate decay factor
-        inactive_users_df["Decay_Factor"] = inactive_users_df["Days_Since_Last_Message"] / decay_days
-        # Calculate activity score with exponential decay
-        inactive_users_df["Activity_Score"] = inactive_users_df["Base_Score"] * pd.np.exp(
-            -inactive_users_df["Decay_Factor"]
-        )
-        # Sort by activity score (ascending)
-        inactive_users_df = inactive_users_df.sort_values("Activity_Score")
-        return inactive_users_df 
\ No newline at end of file
+        if model == "windowed":
+            # Needs every message of the users, not just their totals. The frame may have been read
+            # back from a CSV or built by another analysis, so users are looked up by name
+            codes, names = pd.factorize(inactive_users_df["User"].astype(str))
+            ids = [self.senders.lookup(name) for name in names]
+            ids = np.array([-1 if sender_id is None else sender_id for sender_id in ids], dtype=np.int32)
+            users = self._canonical_codes(ids[codes])
+            scores, _, _ = scoring.activity_scores(
+                self.sender_codes,
+                self.df["Datetime"].to_numpy(),
+                len(self.senders),
+                self.df["Datetime"].max().to_datetime64(),
+                model=model,
+                decay_days=decay_days,
+                reference_messages=reference_messages,
+                weights=self.weights,
+            )
+            # Users unknown to this export have no messages, and a score of zero
+            activity_score = np.append(scores, 0.0)[users]
+        else:
+            # Users who never posted have no last message, and a score of zero
+            days_since_last = inactive_users_df["Days_Since_Last_Message"].to_numpy(dtype=np.float64, na_value=np.inf)
+            activity_score = (
+                inactive_users_df["Total_Messages_Sent"].to_numpy(dtype=np.float64)
+                / reference_messages
+                * scoring.decay(days_since_last, model, decay_days)
+            )
+        order = scoring.rank(activity_score)
+        return inactive_users_df.assign(Activity_Score=activity_score).iloc[order]
@@ -0,0 +1,196 @@
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.core.analysis import WhatsAppGroupAnalysis
+from src.core.profiling import profiled
+
+# Query engines the analysis can run on:
+#   pandas - eager pandas/numpy, always available
+#   duckdb - embedded DuckDB, multi-threaded and vectorized; needs the "duckdb" extra
+ENGINES: Tuple[str, ...] = ("pandas", "duckdb")
+
+
+def _connect(threads: Optional[int] = None) -> Any:
+    """Open an in-memory DuckDB connection.
+
+    Args:
+        threads: Optional number of threads, defaults to DuckDB's choice (the CPU count)
+
+    Returns:
+        DuckDB connection
+
+    Raises:
+        ImportError: If duckdb is not installed
+    """
+    try:
+        import duckdb
+    except ImportError as e:
+        raise ImportError("The duckdb engine needs duckdb: pip install 'whatsapp-analyzer[duckdb]'") from e
+    connection = duckdb.connect()
+    if threads:
+        connection.execute(f"SET threads = {int(threads)}")
+    return connection
+
+
+class DuckDBGroupAnalysis(WhatsAppGroupAnalysis):
+    """WhatsAppGroupAnalysis whose message scans and aggregations run in an embedded DuckDB.
+
+    The messages are handed to DuckDB once, as an Arrow table, and every scan (keyword search)
+    and per-member aggregation becomes a query that DuckDB runs multi-threaded without
+    materializing intermediate frames. Results come back as numpy arrays; alias resolution,
+    event parsing and the report frames are shared with the pandas engine, so both engines
+    produce identical reports.
+
+    Only those primitives run in DuckDB. Join and leave events are still classified by the
+    Python loop of _extract_user_events: DuckDB selects the candidate rows, but each of them is
+    then matched against the event patterns one at a time, so groups with many system lines
+    gain less.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        senders=None,
+        aliases=None,
+        threads: Optional[int] = None,
+    ) -> None:
+        """Initialize with a DataFrame containing message data.
+
+        Args:
+            df: DataFrame with 'Datetime', 'Sender' and 'Message' columns, and optionally 'Count'
+            senders: Optional sender dictionary to share ids with other groups, defaults to a new one
+            aliases: Optional alias index for the group, built from the messages if not given
+            threads: Optional number of DuckDB threads, defaults to the CPU count
+        """
+        import pyarrow as pa
+
+        self._connection = _connect(threads)
+        super().__init__(df, senders=senders, aliases=aliases)
+        weights = self.weights if self.weights is not None else np.ones(len(self.df), dtype=np.int64)
+        messages = pa.table(
+            {
+                "row": np.arange(len(self.df), dtype=np.int64),
+                "Datetime": self.df["Datetime"].to_numpy(),
+                "member": self.sender_codes,
+                "weight": weights.astype(np.int64),
+                "Message": pa.array(self.df["Message"], type=pa.string(), from_pandas=True),
+            }
+        )
+        self._connection.register("messages", messages)
+
+    def _query(self, sql: str, *parameters: Any) -> Dict[str, np.ndarray]:
+        """Run a query over the 'messages' table.
+
+        Args:
+            sql: SQL query
+            *parameters: Values of the query's ? placeholders
+
+        Returns:
+            Dictionary of result columns
+        """
+        return self._connection.execute(sql, list(parameters)).fetchnumpy()
+
+    def _by_member(self, members: np.ndarray, values: np.ndarray, fill: Any) -> np.ndarray:
+        """Scatter per-member query results into an array indexed by sender id."""
+        result = np.full(len(self.senders), fill, dtype=np.asarray(fill).dtype)
+        result[members] = values
+        return result
+
+    @profiled()
+    def _rows_matching(self, pattern: str) -> np.ndarray:
+        """Find the messages matching a regular expression with a parallel scan."""
+        rows = self._query("SELECT row FROM messages WHERE regexp_matches(Message, ?, 'i')", pattern)["row"]
+        mask = np.zeros(len(self.df), dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def _message_counts(self, since: Optional[pd.Timestamp] = None) -> np.ndarray:
+        """Count the messages of every member with a grouped sum."""
+        window = "" if since is None else "AND Datetime > ?"
+        parameters = [] if since is None else [since.to_pydatetime()]
+        counts = self._query(
+            f"SELECT member, sum(weight) AS messages FROM messages WHERE member >= 0 {window} GROUP BY member",
+            *parameters,
+        )
+        return self._by_member(counts["member"], counts["messages"], np.int64(0))
+
+    def _last_message_times(self) -> np.ndarray:
+        """Find the time of the last message of every member with a grouped max."""
+        last = self._query("SELECT member, max(Datetime) AS last FROM messages WHERE member >= 0 GROUP BY member")
+        return self._by_member(last["member"], last["last"], np.datetime64("NaT", "ns"))
+
+    def _active_members(self, since: pd.Timestamp) -> np.ndarray:
+        """Find the members who posted after a point in time."""
+        active = self._query("SELECT DISTINCT member FROM messages WHERE Datetime > ?", since.to_pydatetime())
+        return np.sort(active["member"])
+
+
+def make_analysis(df: pd.DataFrame, engine: str = "pandas", **kwargs: Any) -> WhatsAppGroupAnalysis:
+    """Create a group analysis on a query engine.
+
+    Args:
+        df: DataFrame with the group's messages
+        engine: One of ENGINES, defaults to "pandas"
+        **kwargs: Passed on to the analysis class (senders, aliases)
+
+    Returns:
+        WhatsAppGroupAnalysis for the engine
+
+    Raises:
+        ValueError: If the engine is unknown
+    """
+    if engine == "pandas":
+        return WhatsAppGroupAnalysis(df, **kwargs)
+    if engine == "duckdb":
+        return DuckDBGroupAnalysis(df, **kwargs)
+    raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+
+
+@profiled()
+def top_senders(df: pd.DataFrame, freq: str, k: int = 5, threads: Optional[int] = None) -> pd.DataFrame:
+    """Get the top K senders per week or month as one DuckDB query.
+
+    Same result as MessageStore.top_senders; private_community_stats uses it with its duckdb engine.
+
+    Args:
+        df: DataFrame with 'Datetime' and 'Sender' columns
+        freq: 'W' (week, ending on Sunday) or 'M' (month)
+        k: Number of top senders per period, defaults to 5
+        threads: Optional number of DuckDB threads
+
+    Returns:
+        DataFrame with 'Sender', 'Datetime' (period end) and 'Message' (message count)
+
+    Raises:
+        ValueError: If freq is not 'W' or 'M'
+    """
+    if freq not in ["W", "M"]:
+        raise ValueError("freq must be 'W' or 'M'")
+    import pyarrow as pa
+
+    period_end = "date_trunc('week', Datetime) + INTERVAL 6 DAY" if freq == "W" else "last_day(Datetime)"
+    connection = _connect(threads)
+    connection.register(
+        "messages",
+        pa.table({"Datetime": pd.to_datetime(df["Datetime"]).to_numpy(), "Sender": df["Sender"].astype(str)}),
+    )
+    result = connection.execute(
+        f"""
+        WITH counts AS (
+            SELECT Sender, CAST({period_end} AS TIMESTAMP) AS period, count(*) AS Message
+            FROM messages
+            GROUP BY ALL
+        )
+        SELECT Sender, period AS Datetime, Message
+        FROM counts
+        QUALIFY row_number() OVER (PARTITION BY period ORDER BY Message DESC, Sender) <= ?
+        ORDER BY period, Message DESC, Sender
+        """,
+        [k],
+    ).df()
+    result["Datetime"] = result["Datetime"].astype("datetime64[ns]")
+    logger.info(f"Found the top {k} senders of {result['Datetime'].nunique()} periods")
+    return result
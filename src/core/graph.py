@@ -0,0 +1,231 @@
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+try:
+    from scipy import sparse
+    from scipy.sparse.csgraph import connected_components
+except ImportError:  # Graph analytics are optional; see the "graph" extra
+    sparse = connected_components = None
+
+# Kinds of interactions, each kept as its own sparse matrix
+KINDS = ("replies", "mentions", "quotes")
+# Label propagation stops after this many rounds even if labels still change
+MAX_ROUNDS = 50
+
+
+class InteractionGraph:
+    """Who talks to whom, as sparse member-by-member matrices.
+
+    Entry (i, j) of each matrix counts interactions of member i directed at member j:
+        replies  - i posted right after j, within a time gap
+        mentions - i @mentioned j
+        quotes   - i quoted a message of j, when the messages carry quoted replies
+    The matrices are built from the whole message stream with vectorized operations, and every
+    metric (degrees, PageRank, communities, components) runs on the sparse representation, so
+    memory and time grow with the number of interacting pairs rather than members squared.
+    """
+
+    def __init__(self, matrices: Dict[str, "sparse.csr_matrix"], weights: Optional[Dict[str, float]] = None) -> None:
+        """Wrap interaction matrices.
+
+        Args:
+            matrices: Square sparse matrix per kind of interaction, all of the same shape
+            weights: Optional weight per kind in the combined adjacency, defaults to 1 for each
+
+        Raises:
+            ImportError: If scipy is not installed
+        """
+        if sparse is None:
+            raise ImportError("Interaction graphs need scipy: pip install 'whatsapp-analyzer[graph]'")
+        self.matrices = {kind: sparse.csr_matrix(matrices[kind], dtype=np.float64) for kind in KINDS}
+        self.weights = {kind: 1.0 for kind in KINDS} | (weights or {})
+        adjacency = sum(self.weights[kind] * self.matrices[kind] for kind in KINDS)
+        adjacency.setdiag(0)
+        adjacency.eliminate_zeros()
+        self.adjacency: "sparse.csr_matrix" = adjacency.tocsr()
+
+    def __len__(self) -> int:
+        """Return the number of nodes (sender ids)."""
+        return self.adjacency.shape[0]
+
+    @classmethod
+    def from_messages(
+        cls,
+        times: np.ndarray,
+        codes: np.ndarray,
+        n_members: int,
+        gap: np.timedelta64,
+        mentions: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+        quotes: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+        weights: Optional[Dict[str, float]] = None,
+    ) -> "InteractionGraph":
+        """Build the graph from a message stream.
+
+        Args:
+            times: datetime64 time of every message, in order
+            codes: Sender id of every message, -1 for messages that do not count (system messages)
+            n_members: Number of sender ids
+            gap: Longest time between two messages for the second to count as a reply to the first
+            mentions: Optional (row, mentioned sender id) pairs
+            quotes: Optional (row, quoted sender id) pairs
+            weights: Optional weight per kind in the combined adjacency
+
+        Returns:
+            InteractionGraph
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        times = np.asarray(times, dtype="datetime64[ns]")
+        shape = (n_members, n_members)
+
+        def matrix(sources: np.ndarray, targets: np.ndarray) -> "sparse.csr_matrix":
+            keep = (sources >= 0) & (targets >= 0) & (sources != targets)
+            values = np.ones(int(keep.sum()), dtype=np.float64)
+            # Duplicate (source, target) pairs are summed on conversion
+            return sparse.coo_matrix((values, (sources[keep], targets[keep])), shape=shape).tocsr()
+
+        # Consecutive messages by different members, close enough in time to be a conversation
+        close = np.diff(times) <= gap
+        replies = matrix(np.where(close, codes[1:], -1), codes[:-1])
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        matrices = {"replies": replies}
+        for kind, pairs in (("mentions", mentions), ("quotes", quotes)):
+            rows, targets = pairs if pairs is not None else empty
+            rows = np.asarray(rows, dtype=np.int64)
+            matrices[kind] = matrix(codes[rows], np.asarray(targets, dtype=np.int64))
+        graph = cls(matrices, weights)
+        logger.info(
+            f"Built interaction graph with {graph.adjacency.nnz} member pairs: "
+            + ", ".join(f"{int(graph.matrices[kind].sum())} {kind}" for kind in KINDS)
+        )
+        return graph
+
+    def degrees(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Weighted out-degree, weighted in-degree and number of distinct partners of every node.
+
+        Returns:
+            Tuple of (interactions initiated, interactions received, partners) arrays
+        """
+        out_degree = np.asarray(self.adjacency.sum(axis=1)).ravel()
+        in_degree = np.asarray(self.adjacency.sum(axis=0)).ravel()
+        partners = (self.adjacency + self.adjacency.T).getnnz(axis=1)
+        return out_degree, in_degree, partners
+
+    def pagerank(self, damping: float = 0.85, tolerance: float = 1e-10, max_iterations: int = 100) -> np.ndarray:
+        """PageRank of every node, by power iteration on the sparse adjacency.
+
+        Members receiving interactions from well-connected members rank highest. Nodes without
+        outgoing interactions spread their rank evenly.
+
+        Args:
+            damping: Probability of following an interaction rather than jumping, defaults to 0.85
+            tolerance: L1 change below which the iteration stops, defaults to 1e-10
+            max_iterations: Iteration limit, defaults to 100
+
+        Returns:
+            Array of PageRank scores summing to 1
+        """
+        n = len(self)
+        if n == 0:
+            return np.empty(0)
+        out_degree = np.asarray(self.adjacency.sum(axis=1)).ravel()
+        dangling = out_degree == 0
+        # Transposed transition matrix: rank flows from each node along its normalized out-edges
+        transition = (sparse.diags(np.divide(1.0, out_degree, where=~dangling, out=np.zeros(n))) @ self.adjacency).T
+        transition = transition.tocsr()
+        rank = np.full(n, 1.0 / n)
+        for _ in range(max_iterations):
+            updated = damping * (transition @ rank + rank[dangling].sum() / n) + (1 - damping) / n
+            change = np.abs(updated - rank).sum()
+            rank = updated
+            if change < tolerance:
+                break
+        return rank
+
+    def communities(self, seed: int = 0) -> np.ndarray:
+        """Detect communities by label propagation on the symmetrized adjacency.
+
+        Every round scores each node's candidate labels as one sparse product (adjacency times a
+        one-hot label matrix) and moves a random half of the nodes whose neighbours favour another
+        label; updating half the nodes keeps pairs from swapping labels forever. Stops when no
+        node would change, or after MAX_ROUNDS.
+
+        Args:
+            seed: Seed of the random halves, defaults to 0 so results are reproducible
+
+        Returns:
+            Community of every node, numbered by decreasing size; -1 for nodes without interactions
+        """
+        n = len(self)
+        weights = (self.adjacency + self.adjacency.T).tocsr()
+        connected = weights.getnnz(axis=1) > 0
+        labels = np.arange(n)
+        rng = np.random.default_rng(seed)
+        for _ in range(MAX_ROUNDS):
+            one_hot = sparse.csr_matrix((np.ones(n), (np.arange(n), labels)), shape=(n, n))
+            scores = (weights @ one_hot).tocsr()
+            best = np.asarray(scores.argmax(axis=1)).ravel()
+            gain = np.asarray(scores.max(axis=1).todense()).ravel() - np.asarray(scores[np.arange(n), labels]).ravel()
+            moving = connected & (best != labels) & (gain > 0)
+            if not moving.any():
+                break
+            moving &= rng.random(n) < 0.5
+            labels = np.where(moving, best, labels)
+
+        # Number communities by decreasing size
+        sizes = np.bincount(labels[connected], minlength=n)
+        order = np.argsort(-sizes, kind="stable")
+        rank = np.empty(n, dtype=np.int64)
+        rank[order] = np.arange(n)
+        communities = np.where(connected, rank[labels], -1)
+        logger.info(
+            f"Found {len(np.unique(communities[connected]))} communities, modularity {self.modularity(communities):.3f}"
+        )
+        return communities
+
+    def modularity(self, communities: np.ndarray) -> float:
+        """Modularity of a partition on the symmetrized adjacency.
+
+        Args:
+            communities: Community of every node; nodes with -1 are ignored
+
+        Returns:
+            Modularity, between -0.5 and 1; higher means denser within communities than by chance
+        """
+        weights = (self.adjacency + self.adjacency.T).tocoo()
+        total = weights.sum()
+        if total == 0:
+            return 0.0
+        labels = np.asarray(communities)
+        inside = weights.data[(labels[weights.row] == labels[weights.col]) & (labels[weights.row] >= 0)].sum()
+        strength = np.asarray(weights.sum(axis=1)).ravel()
+        grouped = labels >= 0
+        community_strength = np.bincount(labels[grouped], weights=strength[grouped])
+        return float(inside / total - ((community_strength / total) ** 2).sum())
+
+    def components(self) -> np.ndarray:
+        """Weakly connected component of every node.
+
+        Returns:
+            Component label of every node
+        """
+        _, labels = connected_components(self.adjacency, directed=True, connection="weak")
+        return labels
+
+    def edges(self) -> pd.DataFrame:
+        """List the interacting pairs.
+
+        Returns:
+            DataFrame with 'Source' and 'Target' (sender ids), one count column per kind and
+            'Weight' (combined adjacency), sorted by decreasing weight
+        """
+        adjacency = self.adjacency.tocoo()
+        frame = pd.DataFrame({"Source": adjacency.row, "Target": adjacency.col})
+        for kind in KINDS:
+            # Indexing a sparse matrix with empty arrays returns a matrix, not an empty array
+            counts = self.matrices[kind][adjacency.row, adjacency.col] if adjacency.nnz else np.empty(0)
+            frame[kind.capitalize()] = np.asarray(counts).ravel().astype(np.int64)
+        frame["Weight"] = adjacency.data
+        return frame.sort_values(["Weight", "Source", "Target"], ascending=[False, True, True], ignore_index=True)
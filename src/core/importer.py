@@ -0,0 +1,188 @@
+from pathlib import Path
+from typing import List, Tuple, Union
+
+import pandas as pd
+from loguru import logger
+
+from src.core.profiling import profiled
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+except ImportError:  # The importer is optional; see the "store" extra
+    pa = pc = pacsv = pq = None
+
+# Canonical columns of imported messages; 'Sender' is missing for CSVs saved without one
+CANONICAL_COLUMNS = ["Datetime", "Sender", "Message"]
+# Candidate delimiters, in order of preference when a header holds several equally often
+DELIMITERS = ("|", ",", "\t", ";")
+TIMESTAMP_FORMATS = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S"]
+# Day of the month of a timestamp in any of TIMESTAMP_FORMATS
+DAY_PATTERN = r"^\s*\d{4}-\d{1,2}-(?P<day>\d{1,2})"
+
+
+def canonical_schema() -> "pa.Schema":
+    """Return the Arrow schema of imported messages."""
+    return pa.schema([("Datetime", pa.timestamp("ns")), ("Sender", pa.string()), ("Message", pa.string())])
+
+
+def sniff_csv(path: Union[str, Path]) -> Tuple[str, List[str]]:
+    """Find the delimiter and columns of a messages CSV from its header line.
+
+    Args:
+        path: CSV file
+
+    Returns:
+        Tuple of (delimiter, column names); known columns are spelled as in CANONICAL_COLUMNS
+
+    Raises:
+        ValueError: If the header has no 'Datetime' or no 'Message' column
+    """
+    with open(path, "r", encoding="utf-8-sig") as file:
+        header = file.readline().rstrip("\r\n")
+    delimiter = max(DELIMITERS, key=lambda candidate: (header.count(candidate), -DELIMITERS.index(candidate)))
+    known = {column.lower(): column for column in CANONICAL_COLUMNS}
+    columns = [known.get(name.strip().lower(), name.strip()) for name in header.split(delimiter)]
+    missing = {"Datetime", "Message"} - set(columns)
+    if missing:
+        raise ValueError(f"{path} has no {' or '.join(sorted(missing))} column in its header: {header!r}")
+    return delimiter, columns
+
+
+def _parse_times(values: "pa.ChunkedArray") -> "pa.ChunkedArray":
+    """Parse timestamp strings with the first of TIMESTAMP_FORMATS that fits, null where none does."""
+    parsed = pc.coalesce(*(pc.strptime(values, format=fmt, unit="ns", error_is_null=True) for fmt in TIMESTAMP_FORMATS))
+    # strptime rolls days past the end of a month over (2024-02-31 becomes 2024-03-02); such a
+    # date is as invalid as any other, so its day must come out as written
+    days = pc.struct_field(pc.extract_regex(values, DAY_PATTERN), "day").cast(pa.int64())
+    return pc.if_else(pc.equal(pc.day(parsed), days), parsed, pa.scalar(None, parsed.type))
+
+
+def _repair(text: str, delimiter: str, columns: List[str]) -> List[str]:
+    """Split a row with too many fields, putting the extra delimiters back into the message."""
+    fields = text.rstrip("\r\n").split(delimiter)
+    if len(fields) < len(columns):
+        return fields
+    message = columns.index("Message")
+    after = len(columns) - message - 1
+    end = len(fields) - after
+    return fields[:message] + [delimiter.join(fields[message:end])] + fields[end:]
+
+
+@profiled()
+def read_messages_csv(path: Union[str, Path]) -> pd.DataFrame:
+    """Read a messages CSV of any of the historical layouts into the canonical columns.
+
+    The delimiter and column order are sniffed from the header, then the file is parsed by
+    pyarrow's multi-threaded CSV reader with explicit column types, and timestamps are parsed by
+    pyarrow's strptime kernel. Rows with more fields than the header, from a delimiter inside a
+    message, are split again with the extra delimiters kept in the message; rows with fewer, or
+    without a valid timestamp, are dropped and counted.
+
+    Args:
+        path: CSV file
+
+    Returns:
+        DataFrame with CANONICAL_COLUMNS, sorted by time
+
+    Raises:
+        ImportError: If pyarrow is not installed
+    """
+    if pacsv is None:
+        raise ImportError("Importing CSVs needs pyarrow: pip install 'whatsapp-analyzer[store]'")
+    delimiter, columns = sniff_csv(path)
+    invalid: List[str] = []
+
+    def skip_invalid(row) -> str:
+        invalid.append(row.text)
+        return "skip"
+
+    wanted = [column for column in CANONICAL_COLUMNS if column in columns]
+    schema = canonical_schema()
+    table = pacsv.read_csv(
+        path,
+        read_options=pacsv.ReadOptions(column_names=columns, skip_rows=1),
+        parse_options=pacsv.ParseOptions(
+            delimiter=delimiter, newlines_in_values=True, invalid_row_handler=skip_invalid
+        ),
+        convert_options=pacsv.ConvertOptions(
+            # Timestamps are read as text: one bad value must drop its row, not fail the file
+            column_types={
+                column: pa.string() if column == "Datetime" else schema.field(column).type for column in wanted
+            },
+            include_columns=wanted,
+            strings_can_be_null=False,
+        ),
+    )
+    rows = [fields for fields in (_repair(text, delimiter, columns) for text in invalid) if len(fields) == len(columns)]
+    if rows:
+        repaired = pa.Table.from_pandas(pd.DataFrame(rows, columns=columns)[wanted], schema=table.schema)
+        table = pa.concat_tables([table, repaired])
+    times = _parse_times(table.column("Datetime"))
+    table = table.set_column(table.schema.get_field_index("Datetime"), "Datetime", times).filter(pc.is_valid(times))
+    df = table.to_pandas()
+
+    dropped = len(invalid) - len(rows) + times.null_count
+    if invalid or dropped:
+        logger.warning(f"{path}: repaired {len(rows)} and dropped {dropped} malformed rows")
+    if "Sender" not in df:
+        df["Sender"] = None
+    df = df[CANONICAL_COLUMNS].sort_values("Datetime", kind="stable", ignore_index=True)
+    logger.info(f"Read {len(df)} messages from {path} ({delimiter!r}-delimited, columns {', '.join(columns)})")
+    return df
+
+
+def write_messages(df: pd.DataFrame, path: Union[str, Path]) -> None:
+    """Write messages in the canonical columnar format, atomically.
+
+    Args:
+        df: DataFrame with CANONICAL_COLUMNS
+        path: Parquet file to write
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f"{path.name}.partial")
+    table = pa.Table.from_pandas(df[CANONICAL_COLUMNS], schema=canonical_schema(), preserve_index=False)
+    pq.write_table(table, partial)
+    partial.replace(path)
+
+
+def load_messages(path: Union[str, Path]) -> pd.DataFrame:
+    """Load messages saved in the canonical format, or import a CSV on the fly.
+
+    Args:
+        path: Parquet file written by write_messages, or a messages CSV
+
+    Returns:
+        DataFrame with CANONICAL_COLUMNS
+
+    Raises:
+        ImportError: If pyarrow is not installed
+    """
+    if pq is None:
+        raise ImportError("Loading messages needs pyarrow: pip install 'whatsapp-analyzer[store]'")
+    if Path(path).suffix == ".parquet":
+        return pq.read_table(path, schema=canonical_schema()).to_pandas()
+    return read_messages_csv(path)
+
+
+@profiled()
+def import_csvs(paths: List[Path], output_dir: Union[str, Path]) -> List[Path]:
+    """Convert messages CSVs into canonical Parquet files.
+
+    Args:
+        paths: CSV files
+        output_dir: Directory of the Parquet files, one per CSV, named after it
+
+    Returns:
+        Paths of the written files
+    """
+    written = []
+    for path in paths:
+        target = Path(output_dir) / f"{path.stem}.parquet"
+        write_messages(read_messages_csv(path), target)
+        written.append(target)
+    logger.info(f"Imported {len(written)} CSV files into {output_dir}")
+    return written
@@ -0,0 +1,193 @@
+import re
+import zipfile
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.core.profiling import profiled
+from src.core.rollup import period_end
+
+# Media types of attachment placeholders; "media" is Android's "<Media omitted>", which names no type
+MEDIA_TYPES = ("image", "video", "audio", "sticker", "gif", "document", "contact", "location", "media")
+# Placeholders of attachments left out of an export, lowercased
+OMITTED = {
+    "image omitted": "image",
+    "video omitted": "video",
+    "video note omitted": "video",
+    "audio omitted": "audio",
+    "sticker omitted": "sticker",
+    "gif omitted": "gif",
+    "document omitted": "document",
+    "contact card omitted": "contact",
+    "<media omitted>": "media",
+}
+# File name tokens of exported attachments: iOS "00000012-PHOTO-2023-...jpg", Android "IMG-2023...-WA0001.jpg"
+FILE_TOKENS = {
+    "PHOTO": "image",
+    "IMG": "image",
+    "VIDEO": "video",
+    "VID": "video",
+    "AUDIO": "audio",
+    "PTT": "audio",
+    "AUD": "audio",
+    "STICKER": "sticker",
+    "STK": "sticker",
+    "GIF": "gif",
+    "DOC": "document",
+    "CONTACT": "contact",
+}
+EXTENSIONS = {
+    **dict.fromkeys(["jpg", "jpeg", "png", "heic"], "image"),
+    **dict.fromkeys(["mp4", "mov", "3gp", "mkv"], "video"),
+    **dict.fromkeys(["opus", "ogg", "m4a", "aac", "mp3", "amr"], "audio"),
+    "webp": "sticker",
+    "gif": "gif",
+    "vcf": "contact",
+}
+ATTACHED_PATTERN = re.compile(r"<attached: (?P<ios>[^>]+)>|(?P<android>\S+\.\w+) \(file attached\)")
+# Left-to-right mark WhatsApp puts in front of placeholders
+LRM = "\u200e"
+
+
+def attachment_name(message: str) -> Optional[str]:
+    """Get the file name of an attachment included in the export.
+
+    Args:
+        message: Message text
+
+    Returns:
+        File name of the attachment, or None if the message does not reference one
+    """
+    match = ATTACHED_PATTERN.search(message)
+    return match and (match["ios"] or match["android"])
+
+
+def file_media_type(name: str) -> str:
+    """Classify an attachment by its file name.
+
+    Args:
+        name: File name of the attachment
+
+    Returns:
+        One of MEDIA_TYPES; files that are not recognized are documents
+    """
+    stem, _, extension = name.rpartition(".")
+    for token in stem.upper().split("-")[:2]:
+        if token in FILE_TOKENS:
+            return FILE_TOKENS[token]
+    return EXTENSIONS.get(extension.lower(), "document")
+
+
+def media_code(message: str) -> int:
+    """Classify a message as an attachment placeholder.
+
+    Cheap enough to run on every parsed line: messages are only inspected further when they
+    end like a placeholder.
+
+    Args:
+        message: Message text
+
+    Returns:
+        Index of the media type in MEDIA_TYPES, or -1 for a text message
+    """
+    if not message.endswith(("omitted", ">", ")")) and not message.startswith(("Location: ", LRM)):
+        return -1
+    text = message.replace(LRM, "").strip()
+    lowered = text.lower()
+    if lowered in OMITTED:
+        return MEDIA_TYPES.index(OMITTED[lowered])
+    if lowered.endswith(" document omitted"):
+        # "report.pdf • 3 pages document omitted"
+        return MEDIA_TYPES.index("document")
+    if lowered.startswith("location: "):
+        return MEDIA_TYPES.index("location")
+    name = attachment_name(text)
+    return -1 if name is None else MEDIA_TYPES.index(file_media_type(name))
+
+
+def media_column(codes: Iterable[int]) -> pd.Categorical:
+    """Build the compact 'Media' column from media codes.
+
+    Args:
+        codes: Media codes, as returned by media_code
+
+    Returns:
+        Categorical of MEDIA_TYPES, missing for text messages
+    """
+    return pd.Categorical.from_codes(np.fromiter(codes, dtype=np.int8), categories=list(MEDIA_TYPES))
+
+
+def archive_media(source: Union[str, Path, BinaryIO]) -> pd.DataFrame:
+    """List the attachments of a zipped export from its central directory.
+
+    Only the archive's index is read: the attachments themselves are never opened.
+
+    Args:
+        source: Path of a zipped export, or a binary file object holding one
+
+    Returns:
+        DataFrame with 'File', 'Media', 'Bytes' (uncompressed size) and 'Compressed', one row per
+        attachment
+    """
+    # Imported here: utils imports this module for media_code
+    from src.core.utils import chat_member
+
+    with zipfile.ZipFile(source) as archive:
+        chat = chat_member(archive).filename
+        members = [info for info in archive.infolist() if not info.is_dir() and info.filename != chat]
+    names = [Path(info.filename).name for info in members]
+    return pd.DataFrame(
+        {
+            "File": names,
+            "Media": pd.Categorical([file_media_type(name) for name in names], categories=list(MEDIA_TYPES)),
+            "Bytes": np.array([info.file_size for info in members], dtype=np.int64),
+            "Compressed": np.array([info.compress_size for info in members], dtype=np.int64),
+        }
+    )
+
+
+@profiled()
+def media_stats(
+    df: pd.DataFrame, freq: str = "M", archive: Optional[Union[str, Path, BinaryIO]] = None
+) -> pd.DataFrame:
+    """Count the attachments of every sender per week or month, by media type.
+
+    Args:
+        df: DataFrame with 'Datetime', 'Sender' and 'Media' columns, as returned by chat_to_df
+        freq: 'W' (week, ending on Sunday) or 'M' (month), defaults to 'M'
+        archive: Optional zipped export the messages came from; adds the 'Bytes' of the attachments
+            found in it, taken from its central directory
+
+    Returns:
+        DataFrame with 'Period' (period end), 'Sender', one count column per media type, 'Total' and,
+        with an archive, 'Bytes'
+
+    Raises:
+        ValueError: If freq is not 'W' or 'M'
+    """
+    if freq not in ["W", "M"]:
+        raise ValueError("freq must be 'W' or 'M'")
+    media = df[df["Media"].notna()]
+    if media.empty:
+        columns = ["Period", "Sender", *MEDIA_TYPES, "Total"] + (["Bytes"] if archive is not None else [])
+        return pd.DataFrame(columns=columns)
+    keys = [period_end(media["Datetime"], freq).rename("Period"), media["Sender"].astype(str)]
+    stats = media.groupby(keys + [media["Media"]], observed=True).size().unstack("Media", fill_value=0)
+    stats = stats.reindex(columns=list(MEDIA_TYPES), fill_value=0)
+    stats.columns = list(stats.columns)
+    stats["Total"] = stats.sum(axis=1)
+
+    if archive is not None:
+        sizes = archive_media(archive).set_index("File")["Bytes"]
+        names = media["Message"].map(attachment_name)
+        found = names.isin(sizes.index)
+        logger.info(f"Found {found.sum()} of {names.notna().sum()} referenced attachments in the archive")
+        attached = pd.Series(sizes.reindex(names[found]).to_numpy(), index=names[found].index)
+        attached_bytes = attached.groupby([key[found] for key in keys]).sum()
+        stats["Bytes"] = attached_bytes.reindex(stats.index, fill_value=0).astype(np.int64)
+    senders = stats.index.get_level_values("Sender").nunique()
+    logger.info(f"Counted {stats['Total'].sum()} attachments of {senders} senders")
+    return stats.reset_index()
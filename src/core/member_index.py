@@ -0,0 +1,207 @@
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.core.aliases import member_key
+from src.core.analysis import WhatsAppGroupAnalysis, is_valid_user
+from src.core.profiling import profiled
+
+
+class MemberIndex:
+    """Cross-group index of member activity, keyed by a canonical member key.
+
+    For every member the index keeps, per group, the first and last message dates and the
+    message count. Each ingest replaces the statistics of one group, so re-ingesting a newer
+    export of a group only touches that group.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty index."""
+        # member key -> group -> [first seen, last seen, message count]; dates are ISO strings
+        self.activity: Dict[str, Dict[str, list]] = {}
+        # member key -> display name
+        self.names: Dict[str, str] = {}
+        # alias key ("tel:..." / "name:...") -> member key, so aliases resolve across groups
+        self.aliases: Dict[str, str] = {}
+        # group -> date of the last message in the ingested export
+        self.group_ends: Dict[str, str] = {}
+        self._lookup: Optional[pd.DataFrame] = None
+
+    def __len__(self) -> int:
+        """Return the number of members."""
+        return len(self.activity)
+
+    def resolve(self, identifier: str) -> Optional[str]:
+        """Return the member key of a name, phone number or mention.
+
+        Args:
+            identifier: Any alias of the member
+
+        Returns:
+            Member key, or None if the member is not in the index
+        """
+        return self.aliases.get(member_key(identifier))
+
+    @profiled()
+    def ingest(self, group: str, analysis: WhatsAppGroupAnalysis) -> None:
+        """Add or replace the activity of one group.
+
+        Args:
+            group: Name of the group
+            analysis: Analysis of the group's export
+        """
+        for groups in self.activity.values():
+            groups.pop(group, None)
+
+        codes = analysis.sender_codes
+        # "System" and fragments of messages parsed as senders are not members, as in get_current_users
+        members = np.array([is_valid_user(name) for name in analysis.senders.names] + [False], dtype=bool)
+        valid = members[codes]
+        weights = analysis.weights[valid] if analysis.weights is not None else 1
+        per_member = (
+            pd.DataFrame(
+                {"User": codes[valid], "Datetime": analysis.df["Datetime"].to_numpy()[valid], "Count": weights}
+            )
+            .groupby("User")
+            .agg(min=("Datetime", "min"), max=("Datetime", "max"), count=("Count", "sum"))
+        )
+        # Current members who never posted are indexed too, with no activity
+        current_users, _ = analysis.get_current_users()
+        silent = np.setdiff1d(current_users["User"].cat.codes.to_numpy(), per_member.index.to_numpy())
+
+        keys_by_member = analysis.aliases.keys_by_member()
+        for code, first_seen, last_seen, count in per_member.itertuples():
+            key = self._member_for(analysis, int(code), keys_by_member)
+            self.activity.setdefault(key, {})[group] = [first_seen.isoformat(), last_seen.isoformat(), int(count)]
+        for code in silent:
+            key = self._member_for(analysis, int(code), keys_by_member)
+            self.activity.setdefault(key, {})[group] = [None, None, 0]
+
+        self.group_ends[group] = analysis.df["Datetime"].max().isoformat()
+        self.activity = {key: groups for key, groups in self.activity.items() if groups}
+        self._lookup = None
+        logger.info(f"Indexed {len(per_member) + len(silent)} members of {group}; index has {len(self)} members")
+
+    def _member_for(self, analysis: WhatsAppGroupAnalysis, code: int, keys_by_member: Dict[int, List[str]]) -> str:
+        """Find or assign the member key for a canonical sender of a group.
+
+        Args:
+            analysis: Analysis of the group's export
+            code: Canonical sender id in the analysis
+            keys_by_member: Alias keys grouped by member, from the group's alias index
+
+        Returns:
+            Member key shared by every alias of the member across groups
+        """
+        name = analysis.senders.names[code]
+        alias_keys = keys_by_member.get(analysis.aliases.canonical(name), [member_key(name)])
+        key = next((self.aliases[alias] for alias in alias_keys if alias in self.aliases), member_key(name))
+        for alias in alias_keys:
+            self.aliases.setdefault(alias, key)
+        self.names.setdefault(key, name)
+        return key
+
+    def lookup(self) -> pd.DataFrame:
+        """Return the per-member lookup table, sorted by days since the member was last active.
+
+        Days since last activity are measured per group against the end of that group's export,
+        and the smallest value across groups is kept. Members who never posted have infinity.
+
+        Returns:
+            DataFrame indexed by member key with 'User', 'Groups' and 'Days_Since_Last_Active'
+        """
+        if self._lookup is None:
+            group_ends = {group: pd.Timestamp(end) for group, end in self.group_ends.items()}
+            rows = []
+            for key, groups in self.activity.items():
+                days = [
+                    (group_ends[group] - pd.Timestamp(last_seen)).days if last_seen else np.inf
+                    for group, (_, last_seen, _) in groups.items()
+                ]
+                rows.append((key, self.names[key], len(groups), min(days)))
+            lookup = pd.DataFrame(rows, columns=["Member", "User", "Groups", "Days_Since_Last_Active"])
+            self._lookup = lookup.set_index("Member").sort_values("Days_Since_Last_Active", kind="stable")
+        return self._lookup
+
+    def inactive_everywhere(self, days: int) -> pd.DataFrame:
+        """Members who have not posted in any of their groups for at least the given number of days.
+
+        Args:
+            days: Inactivity threshold in days
+
+        Returns:
+            Slice of the lookup table
+        """
+        lookup = self.lookup()
+        start = np.searchsorted(lookup["Days_Since_Last_Active"].to_numpy(), days, side="left")
+        return lookup.iloc[start:]
+
+    def active_somewhere(self, days: int) -> pd.DataFrame:
+        """Members who posted in at least one of their groups within the given number of days.
+
+        Args:
+            days: Activity window in days
+
+        Returns:
+            Slice of the lookup table
+        """
+        lookup = self.lookup()
+        end = np.searchsorted(lookup["Days_Since_Last_Active"].to_numpy(), days, side="left")
+        return lookup.iloc[:end]
+
+    def member_activity(self, identifier: str) -> pd.DataFrame:
+        """Per-group activity of one member.
+
+        Args:
+            identifier: Any alias of the member
+
+        Returns:
+            DataFrame with one row per group, empty if the member is unknown
+        """
+        key = self.resolve(identifier)
+        groups = self.activity.get(key, {}) if key else {}
+        return pd.DataFrame(
+            [(group, first_seen, last_seen, count) for group, (first_seen, last_seen, count) in groups.items()],
+            columns=["Group", "First_Seen", "Last_Seen", "Message_Count"],
+        )
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Persist the index as JSON.
+
+        Args:
+            path: Output file path
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "activity": self.activity,
+            "names": self.names,
+            "aliases": self.aliases,
+            "group_ends": self.group_ends,
+        }
+        path.write_text(json.dumps(data, ensure_ascii=False))
+        logger.info(f"Saved member index with {len(self)} members across {len(self.group_ends)} groups to {path}")
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "MemberIndex":
+        """Load an index persisted with save, or return an empty one if the file does not exist.
+
+        Args:
+            path: Path to the JSON file
+
+        Returns:
+            MemberIndex
+        """
+        index = cls()
+        if Path(path).exists():
+            data = json.loads(Path(path).read_text())
+            index.activity = data["activity"]
+            index.names = data["names"]
+            index.aliases = data["aliases"]
+            index.group_ends = data["group_ends"]
+            logger.info(f"Loaded member index with {len(index)} members from {path}")
+        return index
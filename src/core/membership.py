@@ -0,0 +1,175 @@
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+# End of an interval that is still open: the largest representable time, so that comparisons
+# need no special case
+OPEN_END = np.datetime64(np.iinfo(np.int64).max, "ns")
+
+
+class MembershipTimeline:
+    """Membership intervals of every member, built once from join/add/leave/remove events.
+
+    Each member has a sorted list of half-open [start, end) intervals. All intervals are also kept
+    in flat arrays sorted by start, so "who was a member at time t" is a binary search for the
+    intervals that started by t plus a vectorized check of their ends, and the membership size
+    over time is a sweep over the interval boundaries. Neither re-scans the messages.
+    """
+
+    def __init__(self, members: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> None:
+        """Index a set of intervals.
+
+        Args:
+            members: Member id of each interval
+            starts: Start of each interval as datetime64 values
+            ends: End of each interval as datetime64 values, NaT while the member is still in the group
+        """
+        order = np.argsort(starts, kind="stable")
+        self.members = np.asarray(members, dtype=np.int32)[order]
+        self.starts = np.asarray(starts, dtype="datetime64[ns]")[order]
+        ends = np.asarray(ends, dtype="datetime64[ns]")[order]
+        self.ends = np.where(np.isnat(ends), OPEN_END, ends)
+        self.by_member: Dict[int, List[Tuple[np.datetime64, np.datetime64]]] = {}
+        for member, start, end in zip(self.members, self.starts, self.ends, strict=True):
+            self.by_member.setdefault(int(member), []).append((start, end))
+
+    def __len__(self) -> int:
+        """Return the number of intervals."""
+        return len(self.starts)
+
+    @classmethod
+    def from_events(cls, events: pd.DataFrame, senders: np.ndarray, start: np.datetime64) -> "MembershipTimeline":
+        """Build the timeline from membership events.
+
+        Members whose first event is a leave, and senders without any event, were already in the
+        group when the export starts.
+
+        Args:
+            events: DataFrame with 'datetime', 'user' and 'event_type' ("join"/"leave"), sorted by datetime
+            senders: Ids of every member who sent a message
+            start: Time of the first message of the export
+
+        Returns:
+            MembershipTimeline
+        """
+        members, starts, ends = [], [], []
+        open_since: Dict[int, np.datetime64] = {}
+        seen = set()
+        for when, user, event_type in zip(
+            events["datetime"].to_numpy(), events["user"].to_numpy(), events["event_type"], strict=True
+        ):
+            user = int(user)
+            if user < 0:
+                continue
+            if event_type == "join":
+                open_since.setdefault(user, when)
+            elif user in open_since:
+                members.append(user)
+                starts.append(open_since.pop(user))
+                ends.append(when)
+            elif user not in seen:
+                members.append(user)
+                starts.append(start)
+                ends.append(when)
+            seen.add(user)
+        for user, since in open_since.items():
+            members.append(user)
+            starts.append(since)
+            ends.append(np.datetime64("NaT"))
+        for user in np.setdiff1d(senders[senders >= 0], np.fromiter(seen, dtype=np.int64, count=len(seen))):
+            members.append(int(user))
+            starts.append(start)
+            ends.append(np.datetime64("NaT"))
+        timeline = cls(
+            np.asarray(members, dtype=np.int32),
+            np.asarray(starts, dtype="datetime64[ns]"),
+            np.asarray(ends, dtype="datetime64[ns]"),
+        )
+        logger.info(f"Built membership timeline with {len(timeline)} intervals for {len(timeline.by_member)} members")
+        return timeline
+
+    def members_as_of(self, when) -> np.ndarray:
+        """Return the members of the group at a point in time.
+
+        Args:
+            when: Point in time (anything pd.Timestamp accepts, e.g. "2024-03-01")
+
+        Returns:
+            Sorted array of member ids
+        """
+        when = np.datetime64(pd.Timestamp(when).to_datetime64(), "ns")
+        started = np.searchsorted(self.starts, when, side="right")
+        current = self.ends[:started] > when
+        return np.unique(self.members[:started][current])
+
+    def is_member(self, member: int, when) -> bool:
+        """Check whether one member was in the group at a point in time.
+
+        Args:
+            member: Member id
+            when: Point in time
+
+        Returns:
+            True if one of the member's intervals contains the time
+        """
+        when = np.datetime64(pd.Timestamp(when).to_datetime64(), "ns")
+        intervals = self.by_member.get(member, [])
+        position = bisect_right(intervals, when, key=lambda interval: interval[0]) - 1
+        return position >= 0 and intervals[position][1] > when
+
+    def intervals(self, member: int) -> List[Tuple[np.datetime64, Optional[np.datetime64]]]:
+        """Return the membership intervals of a member.
+
+        Args:
+            member: Member id
+
+        Returns:
+            List of (start, end) tuples, end None while the member is still in the group
+        """
+        return [(start, None if end == OPEN_END else end) for start, end in self.by_member.get(member, [])]
+
+    def daily_counts(self, start=None, end=None) -> pd.Series:
+        """Count the members at the end of each day with a sweep over interval boundaries.
+
+        Args:
+            start: First day, defaults to the first interval start
+            end: Last day, defaults to the last finite interval boundary
+
+        Returns:
+            Series of member counts indexed by day
+        """
+        if not len(self):
+            return pd.Series(dtype=np.int64, name="Members")
+        days_start = self.starts.astype("datetime64[D]")
+        open_end = self.ends == OPEN_END
+        days_end = self.ends.astype("datetime64[D]")
+        first = _day(start) if start is not None else days_start.min()
+        finite = np.concatenate([days_start, days_end[~open_end]])
+        last = _day(end) if end is not None else finite.max()
+        n_days = int((last - first).astype(np.int64)) + 1
+        if n_days <= 0:
+            return pd.Series(dtype=np.int64, name="Members")
+        # +1 on the day an interval starts, -1 on the day it ends; intervals starting before the
+        # range count from its first day, boundaries after it are dropped
+        enter = np.clip((days_start - first).astype(np.int64), 0, None)
+        leave = np.clip((days_end[~open_end] - first).astype(np.int64), 0, None)
+        deltas = np.bincount(enter[enter < n_days], minlength=n_days) - np.bincount(
+            leave[leave < n_days], minlength=n_days
+        )
+        counts = np.cumsum(deltas)
+        return pd.Series(counts, index=pd.date_range(first, periods=n_days, freq="D"), name="Members")
+
+
+def _day(when) -> np.datetime64:
+    """Truncate a point in time to its day.
+
+    Args:
+        when: Point in time (anything pd.Timestamp accepts)
+
+    Returns:
+        datetime64[D] value
+    """
+    return pd.Timestamp(when).to_datetime64().astype("datetime64[D]")
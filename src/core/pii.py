@@ -0,0 +1,150 @@
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.core.profiling import profiled
+
+# Each detector is a named group in one combined alternation, so a message is scanned once
+# regardless of how many detectors are enabled. Order matters: URLs and emails are tried
+# first so that digits or "@" inside them are not picked up by the phone/mention detectors.
+DETECTOR_PATTERNS: Dict[str, str] = {
+    "url": r"https?://[^\s<>\"]+",
+    "email": r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b",
+    "upi": (
+        r"\b[A-Za-z0-9._-]{2,256}@(?:ybl|okaxis|okhdfcbank|oksbi|okicici|paytm|upi|apl|ibl|axl"
+        r"|icici|sbi|hdfcbank|axisbank|yesbank|kotak)\b"
+    ),
+    "phone": r"@\+?\d[\d-]{7,}\d|\+\d[\d -]{7,}\d",
+    "mention": r"(?<![\w.])@\w[\w.-]*",
+}
+
+REPLACEMENTS: Dict[str, str] = {
+    "email": "[EMAIL]",
+    "upi": "[UPI]",
+    "phone": "[PHONE]",
+    "mention": "[MENTION]",
+    "url_token": "[TOKEN]",
+}
+
+DEFAULT_DETECTORS: Tuple[str, ...] = ("phone", "email")
+ALL_DETECTORS: Tuple[str, ...] = ("phone", "email", "upi", "mention", "url_token")
+
+URL_TOKEN_PATTERN = re.compile(
+    r"([?&#](?:token|access_token|auth|authkey|key|api_key|apikey|sig|signature|session|sid|code"
+    r"|password|pwd|secret|invite)=)[^&#\s]+",
+    re.IGNORECASE,
+)
+
+
+class PIIScrubber:
+    """Single-pass scrubber for personally identifiable information in message text."""
+
+    def __init__(
+        self,
+        detectors: Iterable[str] = DEFAULT_DETECTORS,
+        replacements: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Compile the combined pattern for the enabled detectors.
+
+        Args:
+            detectors: Detectors to enable, any of "phone", "email", "upi", "mention" and "url_token"
+            replacements: Optional overrides for the placeholder written for each detector
+
+        Raises:
+            ValueError: If an unknown detector is requested
+        """
+        self.detectors = tuple(detectors)
+        unknown = set(self.detectors) - set(ALL_DETECTORS)
+        if unknown:
+            raise ValueError(f"Unknown PII detectors: {sorted(unknown)}")
+        self.replacements = {**REPLACEMENTS, **(replacements or {})}
+        # URLs are always matched so that their contents are shielded from the other detectors;
+        # they are only rewritten when the url_token detector is enabled.
+        groups = ["url"] + [name for name in DETECTOR_PATTERNS if name != "url" and name in self.detectors]
+        self.pattern = re.compile("|".join(f"(?P<{name}>{DETECTOR_PATTERNS[name]})" for name in groups))
+        self.counts: Counter = Counter()
+
+    def _replace(self, match: re.Match) -> str:
+        """Replacement callback shared by every detector.
+
+        Args:
+            match: Match of the combined pattern
+
+        Returns:
+            Replacement text for the match
+        """
+        category = match.lastgroup
+        if category == "url":
+            if "url_token" not in self.detectors:
+                return match.group(0)
+            url, n_tokens = URL_TOKEN_PATTERN.subn(rf"\1{self.replacements['url_token']}", match.group(0))
+            self.counts["url_token"] += n_tokens
+            return url
+        self.counts[category] += 1
+        return self.replacements[category]
+
+    def scrub_text(self, text: str) -> str:
+        """Scrub a single message.
+
+        Args:
+            text: Message text
+
+        Returns:
+            Message text with PII replaced by placeholders
+        """
+        return self.pattern.sub(self._replace, text)
+
+    @profiled()
+    def scrub(self, messages: pd.Series, n_jobs: int = 1) -> Tuple[pd.Series, Dict[str, int]]:
+        """Scrub a Series of messages.
+
+        Args:
+            messages: Series of message text
+            n_jobs: Number of worker processes, defaults to 1 (scrub in-process)
+
+        Returns:
+            Tuple of (scrubbed Series, count of replacements per category)
+        """
+        self.counts = Counter()
+        if n_jobs > 1 and len(messages) > n_jobs:
+            chunks = np.array_split(np.arange(len(messages)), n_jobs)
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                results = list(
+                    pool.map(
+                        _scrub_chunk,
+                        [self.detectors] * len(chunks),
+                        [self.replacements] * len(chunks),
+                        [messages.iloc[idx] for idx in chunks],
+                    )
+                )
+            scrubbed = pd.concat([chunk for chunk, _ in results])
+            for _, counts in results:
+                self.counts.update(counts)
+        else:
+            scrubbed = messages.str.replace(self.pattern, self._replace, regex=True)
+        counts = {category: self.counts.get(category, 0) for category in self.detectors}
+        logger.info(f"Scrubbed PII from {len(messages)} messages: {counts}")
+        return scrubbed, counts
+
+
+def _scrub_chunk(
+    detectors: Tuple[str, ...], replacements: Dict[str, str], messages: pd.Series
+) -> Tuple[pd.Series, Dict[str, int]]:
+    """Scrub one chunk of messages in a worker process.
+
+    Args:
+        detectors: Detectors to enable
+        replacements: Placeholder text per detector
+        messages: Chunk of message text
+
+    Returns:
+        Tuple of (scrubbed chunk, count of replacements per category)
+    """
+    scrubber = PIIScrubber(detectors=detectors, replacements=replacements)
+    scrubbed = messages.str.replace(scrubber.pattern, scrubber._replace, regex=True)
+    return scrubbed, dict(scrubber.counts)
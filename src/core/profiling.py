@@ -0,0 +1,264 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Union
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class Span:
+    """Timing record of one pipeline stage."""
+
+    __slots__ = ("name", "start", "duration", "rows_in", "rows_out", "peak_memory", "thread")
+
+    def __init__(self, name: str, rows_in: Optional[int] = None) -> None:
+        """Start a span.
+
+        Args:
+            name: Stage name, e.g. "analysis.get_inactive_users"
+            rows_in: Optional number of input rows
+        """
+        self.name = name
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.rows_in = rows_in
+        self.rows_out: Optional[int] = None
+        self.peak_memory = 0
+        self.thread = threading.get_ident()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the span.
+
+        Returns:
+            Dictionary of the span's fields
+        """
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class Profiler:
+    """Collects spans around pipeline stages; a no-op unless enabled."""
+
+    def __init__(self) -> None:
+        """Initialize a disabled profiler."""
+        self.enabled = False
+        self.track_memory = False
+        self.spans: List[Span] = []
+        # Called with every finished span, e.g. by the web metrics; run even when disabled
+        self.listeners: List[Callable[[Span], None]] = []
+        self._origin = time.perf_counter()
+        self._local = threading.local()
+
+    def enable(self, track_memory: bool = True) -> None:
+        """Start recording spans.
+
+        Args:
+            track_memory: Whether to measure peak memory per stage with tracemalloc, defaults to True
+        """
+        self.enabled = True
+        self.track_memory = track_memory
+        self.spans = []
+        self._origin = time.perf_counter()
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self) -> None:
+        """Stop recording spans."""
+        self.enabled = False
+        if self.track_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.track_memory = False
+
+    @property
+    def active(self) -> bool:
+        """Whether spans are measured at all."""
+        return self.enabled or bool(self.listeners)
+
+    @contextmanager
+    def span(self, name: str, rows_in: Optional[int] = None) -> Iterator[Optional[Span]]:
+        """Measure a block of code.
+
+        Args:
+            name: Stage name
+            rows_in: Optional number of input rows
+
+        Yields:
+            The span, whose rows_out can be set by the caller, or None when profiling is off
+        """
+        if not self.active:
+            yield None
+            return
+        # Each stack entry is [span, absolute peak seen so far, traced memory at start]
+        stack = self._local.__dict__.setdefault("stack", [])
+        track_memory = self.track_memory and tracemalloc.is_tracing()
+        current = 0
+        if track_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                # Fold the parent's peak so far into its entry before resetting for this child
+                stack[-1][1] = max(stack[-1][1], peak)
+            tracemalloc.reset_peak()
+        span = Span(name, rows_in)
+        stack.append([span, current, current])
+        try:
+            yield span
+        finally:
+            span.duration = time.perf_counter() - span.start
+            _, peak, start_memory = stack.pop()
+            if track_memory:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                span.peak_memory = peak - start_memory
+                if stack:
+                    stack[-1][1] = max(stack[-1][1], peak)
+            if self.enabled:
+                self.spans.append(span)
+            for listener in self.listeners:
+                listener(span)
+
+    def profiled(self, name: Optional[str] = None) -> Callable:
+        """Decorate a function so that each call is recorded as a span.
+
+        Input rows are taken from the first DataFrame argument, or from `self.df` for methods;
+        output rows from the returned DataFrame (or the first element of a returned tuple).
+
+        Args:
+            name: Optional stage name, defaults to the function's qualified name
+
+        Returns:
+            Decorator
+        """
+
+        def decorator(func: Callable) -> Callable:
+            stage = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not self.active:
+                    return func(*args, **kwargs)
+                with self.span(stage, rows_in=_count_input_rows(args, kwargs)) as span:
+                    result = func(*args, **kwargs)
+                    span.rows_out = count_rows(result)
+                return result
+
+            return wrapper
+
+        return decorator
+
+    def report(self) -> "pd.DataFrame":
+        """Summarize the recorded spans per stage.
+
+        Returns:
+            DataFrame with calls, total and mean seconds, rows in/out and peak memory per stage,
+            slowest stage first
+        """
+        import pandas as pd
+
+        if not self.spans:
+            return pd.DataFrame(
+                columns=["Stage", "Calls", "Total_Seconds", "Mean_Seconds", "Rows_In", "Rows_Out", "Peak_Memory_MB"]
+            )
+        spans = pd.DataFrame([span.to_dict() for span in self.spans])
+        report = (
+            spans.groupby("name")
+            .agg(
+                Calls=("duration", "size"),
+                Total_Seconds=("duration", "sum"),
+                Mean_Seconds=("duration", "mean"),
+                Rows_In=("rows_in", "max"),
+                Rows_Out=("rows_out", "max"),
+                Peak_Memory_MB=("peak_memory", lambda peak: peak.max() / 2**20),
+            )
+            .reset_index()
+            .rename(columns={"name": "Stage"})
+            .sort_values("Total_Seconds", ascending=False)
+        )
+        return report
+
+    def dump(self, path: Union[str, Path]) -> None:
+        """Write the recorded spans as a Chrome trace (open in chrome://tracing or Perfetto).
+
+        Args:
+            path: Output file path
+        """
+        pid = os.getpid()
+        events = [
+            {
+                "name": span.name,
+                "ph": "X",
+                "ts": (span.start - self._origin) * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": pid,
+                "tid": span.thread,
+                "args": {
+                    "rows_in": span.rows_in,
+                    "rows_out": span.rows_out,
+                    "peak_memory_mb": round(span.peak_memory / 2**20, 3),
+                },
+            }
+            for span in self.spans
+        ]
+        Path(path).write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
+        logger.info(f"Wrote {len(events)} spans to {path}")
+
+
+def count_rows(result: Any) -> Optional[int]:
+    """Return the number of rows in a stage result.
+
+    Args:
+        result: Value returned by a stage
+
+    Returns:
+        Row count for DataFrames and Series (or a tuple starting with one), None otherwise
+    """
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    return len(result) if _is_frame(result) else None
+
+
+def _count_input_rows(args: tuple, kwargs: dict) -> Optional[int]:
+    """Return the number of rows of a stage's input.
+
+    Args:
+        args: Positional arguments of the call
+        kwargs: Keyword arguments of the call
+
+    Returns:
+        Rows of the first DataFrame argument, or of `self.df` for methods, None otherwise
+    """
+    for value in (*args, *kwargs.values()):
+        if _is_frame(value, series=False):
+            return len(value)
+    df = getattr(args[0], "df", None) if args else None
+    return len(df) if _is_frame(df, series=False) else None
+
+
+def _is_frame(value: Any, series: bool = True) -> bool:
+    """Check for a pandas DataFrame (or Series) without importing pandas.
+
+    Importing this module must stay cheap for the web app, which defers pandas until the first
+    analysis; if pandas has not been imported yet, no value can be a DataFrame.
+
+    Args:
+        value: Value to check
+        series: Whether a Series counts too, defaults to True
+
+    Returns:
+        True if the value is a DataFrame (or Series)
+    """
+    pd = sys.modules.get("pandas")
+    if pd is None:
+        return False
+    return isinstance(value, (pd.DataFrame, pd.Series) if series else pd.DataFrame)
+
+
+PROFILER = Profiler()
+span = PROFILER.span
+profiled = PROFILER.profiled
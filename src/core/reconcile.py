@@ -0,0 +1,172 @@
+from typing import Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.core.pii import PIIScrubber
+from src.core.profiling import profiled
+
+REPORT_COLUMNS = ["Snapshot", "Start", "End", "Matched", "Unmatched", "Shift_Seconds"]
+# Unmatched snapshot rows tolerated inside one overlap range before it is split in two
+MAX_GAP_ROWS = 20
+# Some snapshots were saved with phone numbers and emails scrubbed, with one placeholder or
+# another; content is compared scrubbed the same way, so a message matches its scrubbed copies
+SCRUBBER = PIIScrubber(replacements={"phone": "[PHONE]", "email": "[EMAIL]"})
+PLACEHOLDER_PATTERN = r"\[(PHONE|EMAIL) REMOVED\]"
+# Older snapshots kept only the first line of multi-line messages, newer ones join the lines with
+# spaces; content is compared up to the first line break
+LINE_BREAK_PATTERN = r"\n|\s{2,}"
+
+
+def content_hashes(df: pd.DataFrame, with_sender: bool) -> np.ndarray:
+    """Hash the content of every message, leaving its time out.
+
+    Messages are compared by their first line, with phone numbers and emails scrubbed.
+
+    Args:
+        df: DataFrame with 'Message', and 'Sender' if with_sender
+        with_sender: Whether the sender is part of the content
+
+    Returns:
+        uint64 array, one hash per row
+    """
+    messages = df["Message"].fillna("").astype(str).str.strip().str.split(LINE_BREAK_PATTERN, n=1, regex=True).str[0]
+    messages, _ = SCRUBBER.scrub(messages.str.replace(PLACEHOLDER_PATTERN, r"[\1]", regex=True))
+    columns = {"Message": messages}
+    if with_sender:
+        columns["Sender"] = df["Sender"].astype(str).str.strip()
+    return pd.util.hash_pandas_object(pd.DataFrame(columns), index=False).to_numpy()
+
+
+def match_snapshots(
+    existing: pd.DataFrame, snapshot: pd.DataFrame, tolerance: pd.Timedelta
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Pair the messages two snapshots have in common.
+
+    Two messages match when they have the same content and their times differ by at most the
+    tolerance; each message matches at most once. Both snapshots' rows are sorted together by
+    (content hash, time) so that matching messages end up next to each other, and one pass pairs
+    every row with its predecessor when it comes from the other snapshot and is close enough in time.
+
+    Args:
+        existing: DataFrame with 'Datetime' and 'Message', and optionally 'Sender'
+        snapshot: DataFrame with the same columns
+        tolerance: Largest time difference of matching messages
+
+    Returns:
+        Tuple of (positions in existing, positions in snapshot) of the matched pairs
+    """
+    # Senders only count when both sides know them: older snapshots were saved without
+    with_sender = all("Sender" in df and df["Sender"].notna().all() for df in (existing, snapshot))
+    hashes = np.concatenate([content_hashes(existing, with_sender), content_hashes(snapshot, with_sender)])
+    times = np.concatenate(
+        [df["Datetime"].to_numpy().astype("datetime64[ns]").astype(np.int64) for df in (existing, snapshot)]
+    )
+    source = np.repeat([0, 1], [len(existing), len(snapshot)])
+    positions = np.concatenate([np.arange(len(existing)), np.arange(len(snapshot))])
+    order = np.lexsort((source, times, hashes))
+    hashes, times, source, positions = hashes[order], times[order], source[order], positions[order]
+
+    candidate = np.zeros(len(order), dtype=bool)
+    candidate[1:] = (hashes[1:] == hashes[:-1]) & (source[1:] != source[:-1]) & (np.diff(times) <= tolerance.value)
+    # Runs of identical messages close in time pair greedily, each row at most once
+    used = np.zeros(len(order), dtype=bool)
+    pairs = []
+    for row in np.flatnonzero(candidate).tolist():
+        if not used[row - 1]:
+            used[row - 1] = used[row] = True
+            pairs.append(row)
+    pairs = np.array(pairs, dtype=np.int64)
+    first_existing = source[pairs - 1] == 0
+    existing_rows = np.where(first_existing, positions[pairs - 1], positions[pairs])
+    snapshot_rows = np.where(first_existing, positions[pairs], positions[pairs - 1])
+    return existing_rows, snapshot_rows
+
+
+def overlap_ranges(
+    name: str, snapshot: pd.DataFrame, existing: pd.DataFrame, matches: Tuple[np.ndarray, np.ndarray]
+) -> pd.DataFrame:
+    """Describe the stretches of a snapshot that overlap the existing history.
+
+    Args:
+        name: Name of the snapshot
+        snapshot: DataFrame of the snapshot, sorted by time
+        existing: DataFrame of the history it was matched with
+        matches: Matched pairs, as returned by match_snapshots
+
+    Returns:
+        DataFrame with REPORT_COLUMNS, one row per range: its first and last matched time in the
+        snapshot, matched rows, snapshot rows in the range without a match, and the median time
+        shift of the snapshot against the history
+    """
+    existing_rows, snapshot_rows = matches
+    order = np.argsort(snapshot_rows, kind="stable")
+    existing_rows, snapshot_rows = existing_rows[order], snapshot_rows[order]
+    if not len(snapshot_rows):
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    breaks = np.flatnonzero(np.diff(snapshot_rows) > MAX_GAP_ROWS + 1) + 1
+    starts = np.concatenate([[0], breaks])
+    ends = np.concatenate([breaks, [len(snapshot_rows)]])
+    snapshot_times = snapshot["Datetime"].to_numpy()
+    shifts = (snapshot_times[snapshot_rows] - existing["Datetime"].to_numpy()[existing_rows]) / np.timedelta64(1, "s")
+    return pd.DataFrame(
+        {
+            "Snapshot": name,
+            "Start": snapshot_times[snapshot_rows[starts]],
+            "End": snapshot_times[snapshot_rows[ends - 1]],
+            "Matched": ends - starts,
+            "Unmatched": snapshot_rows[ends - 1] - snapshot_rows[starts] + 1 - (ends - starts),
+            "Shift_Seconds": [float(np.median(shifts[start:end])) for start, end in zip(starts, ends, strict=True)],
+        }
+    )
+
+
+@profiled()
+def reconcile(
+    snapshots: Iterable[Tuple[str, pd.DataFrame]], tolerance_seconds: float = 2.0
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Merge overlapping snapshots of a chat into one deduplicated history.
+
+    Snapshots are folded into the history in the given order. Messages of a snapshot that match a
+    message already in the history (same sender and text, times within the tolerance) are dropped;
+    their columns fill what the history lacks, such as the sender of messages from a snapshot
+    saved without one. The rest are added.
+
+    Args:
+        snapshots: (name, DataFrame) pairs in order, each with 'Datetime' and 'Message' and
+            optionally 'Sender'
+        tolerance_seconds: Largest time difference of the same message in two snapshots, defaults to 2
+
+    Returns:
+        Tuple of (history, with a 'Snapshot' column naming where each message was first seen;
+        report of the overlap ranges, as returned by overlap_ranges)
+    """
+    tolerance = pd.Timedelta(seconds=tolerance_seconds)
+    history = pd.DataFrame(columns=["Datetime", "Message", "Snapshot"])
+    reports: List[pd.DataFrame] = []
+    for name, snapshot in snapshots:
+        snapshot = snapshot.sort_values("Datetime", kind="stable", ignore_index=True).assign(Snapshot=name)
+        existing_rows, snapshot_rows = match_snapshots(history, snapshot, tolerance)
+        reports.append(overlap_ranges(name, snapshot, history, (existing_rows, snapshot_rows)))
+        for column in snapshot.columns.difference(history.columns):
+            history[column] = pd.Series(pd.NA, index=history.index, dtype=object)
+        for column in snapshot.columns.drop("Snapshot"):
+            if history[column].iloc[existing_rows].isna().any():
+                filled = (
+                    history[column]
+                    .iloc[existing_rows]
+                    .fillna(pd.Series(snapshot[column].to_numpy()[snapshot_rows], index=history.index[existing_rows]))
+                )
+                history.loc[history.index[existing_rows], column] = filled
+        added = np.ones(len(snapshot), dtype=bool)
+        added[snapshot_rows] = False
+        frames = [frame for frame in (history, snapshot[added]) if len(frame)]
+        history = pd.concat(frames, ignore_index=True) if frames else history
+        history = history.sort_values("Datetime", kind="stable", ignore_index=True)
+        logger.info(f"{name}: {len(snapshot_rows)} of {len(snapshot)} messages already known, {added.sum()} added")
+    first = [column for column in ["Datetime", "Sender", "Message"] if column in history]
+    history = history[first + [column for column in history.columns if column not in first]]
+    reports = [report for report in reports if len(report)]
+    report = pd.concat(reports, ignore_index=True) if reports else pd.DataFrame(columns=REPORT_COLUMNS)
+    return history, report
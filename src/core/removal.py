@@ -0,0 +1,258 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.core.aliases import AliasIndex, member_key
+from src.core.profiling import profiled
+
+# Statuses of a removal log record: flagged as a candidate, then removed or kept by a moderator
+STATUSES = ("flagged", "removed", "kept")
+ACTIONED = {"removed", "kept"}
+CANDIDATE_COLUMNS = [
+    "Rank",
+    "Candidate_Id",
+    "Group",
+    "User",
+    "Joining_Date",
+    "Total_Messages_Sent",
+    "Most_Recent_Message_Date",
+    "Days_Since_Last_Message",
+    "First_Flagged",
+]
+
+
+def candidate_id(group: str, user: str) -> str:
+    """Derive the stable id of a member of a group.
+
+    Args:
+        group: Group name
+        user: Member name or phone number; spellings with the same alias key share an id
+
+    Returns:
+        16 hex digit id, the same on every run
+    """
+    return hashlib.blake2b(f"{group}\x1f{member_key(user)}".encode(), digest_size=8).hexdigest()
+
+
+def read_allow_list(path: Union[str, Path]) -> List[str]:
+    """Read an allow-list file: one name or phone number per line, '#' starts a comment.
+
+    Args:
+        path: Allow-list file
+
+    Returns:
+        Identifiers in the file
+    """
+    lines = (line.split("#", 1)[0].strip() for line in Path(path).read_text().splitlines())
+    return [line for line in lines if line]
+
+
+def allowed_keys(identifiers: Iterable[str], aliases: Optional[AliasIndex] = None) -> Set[str]:
+    """Resolve allow-listed identifiers to the alias keys of the members they name.
+
+    Args:
+        identifiers: Names or phone numbers
+        aliases: Optional alias index of a group, so that an allow-listed phone number also covers
+            the name the member is reported under
+
+    Returns:
+        Set of alias keys
+    """
+    keys = set()
+    for identifier in identifiers:
+        keys.add(member_key(identifier))
+        member = aliases.canonical(identifier) if aliases is not None else None
+        if member is not None:
+            keys.add(member_key(aliases.display_name(member)))
+    return keys
+
+
+class RemovalLog:
+    """Append-only JSON-lines log of removal candidates and the actions taken on them.
+
+    Every record is one line: candidate id, group, user, status and time. Nothing is rewritten:
+    a later record for the same id supersedes earlier ones, so the log is also the history of
+    every decision. Batches are flushed to disk before the next starts, and a line torn by a crash
+    is skipped on load, so an interrupted run can simply be started again.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        """Open a log, loading the records it already holds.
+
+        Args:
+            path: JSON-lines file, created on the first append
+        """
+        self.path = Path(path)
+        # Latest status and first flagging time per candidate id
+        self.status: Dict[str, str] = {}
+        self.first_flagged: Dict[str, pd.Timestamp] = {}
+        if self.path.exists():
+            with open(self.path, "r") as file:
+                for number, line in enumerate(file, start=1):
+                    try:
+                        self._apply(json.loads(line))
+                    except (json.JSONDecodeError, KeyError):
+                        logger.warning(f"Skipping unreadable line {number} of {self.path}")
+        logger.info(f"Loaded removal log with {len(self.status)} members, {len(self.actioned())} actioned")
+
+    def _apply(self, record: Dict[str, str]) -> None:
+        """Update the in-memory state with one record."""
+        self.status[record["id"]] = record["status"]
+        if record["status"] == "flagged":
+            self.first_flagged.setdefault(record["id"], pd.Timestamp(record["time"]))
+
+    def actioned(self) -> Set[str]:
+        """Return the ids of members a moderator removed or kept."""
+        return {identifier for identifier, status in self.status.items() if status in ACTIONED}
+
+    def append(self, records: List[Dict[str, str]]) -> None:
+        """Append a batch of records and flush it to disk.
+
+        Args:
+            records: Records with 'id', 'group', 'user', 'status' (one of STATUSES) and 'time'
+
+        Raises:
+            ValueError: If a record has an unknown status
+        """
+        if not records:
+            return
+        unknown = {record["status"] for record in records} - set(STATUSES)
+        if unknown:
+            raise ValueError(f"Unknown status {', '.join(sorted(unknown))}; expected one of {', '.join(STATUSES)}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a+b") as file:
+            # A line torn by a crash has no newline; start the batch on a line of its own
+            if file.tell():
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b"\n":
+                    file.write(b"\n")
+            file.writelines((json.dumps(record, ensure_ascii=False) + "\n").encode() for record in records)
+            file.flush()
+            os.fsync(file.fileno())
+        for record in records:
+            self._apply(record)
+
+    def mark(self, ids: Iterable[str], status: str, when: Optional[pd.Timestamp] = None) -> int:
+        """Record a moderator's action on candidates.
+
+        Args:
+            ids: Candidate ids
+            status: 'removed' or 'kept'
+            when: Time of the action, defaults to now
+
+        Returns:
+            Number of records appended
+
+        Raises:
+            ValueError: If status is not an action
+        """
+        if status not in ACTIONED:
+            raise ValueError(f"status must be one of {', '.join(sorted(ACTIONED))}")
+        when = (when or pd.Timestamp.now()).isoformat()
+        records = [{"id": identifier, "status": status, "time": when} for identifier in dict.fromkeys(ids)]
+        self.append(records)
+        logger.info(f"Marked {len(records)} candidates as {status}")
+        return len(records)
+
+
+@profiled()
+def removal_candidates(
+    report: pd.DataFrame,
+    log: RemovalLog,
+    allowed: Optional[Set[str]] = None,
+    grace_days: int = 0,
+    now: Optional[pd.Timestamp] = None,
+) -> pd.DataFrame:
+    """Rank the inactive members that are ready to be removed, and flag new ones in the log.
+
+    Members are identified by stable ids, so every rule is a set lookup on ids or alias keys:
+    allow-listed members and members a moderator already removed or kept are dropped, members
+    not seen before are flagged in the log, and a member becomes ready once it has been flagged
+    for grace_days, giving time to warn it first. Ready members are ranked longest silent first,
+    then fewest messages.
+
+    Args:
+        report: Inactive users with 'Group', 'User', 'Joining_Date', 'Total_Messages_Sent',
+            'Most_Recent_Message_Date' and 'Days_Since_Last_Message', as from get_inactive_users
+        log: Removal log; new candidates are appended to it as one batch
+        allowed: Optional alias keys of members never to remove, from allowed_keys
+        grace_days: Days between flagging a member and reporting it as ready, defaults to 0
+        now: Time of the run, defaults to now
+
+    Returns:
+        DataFrame with CANDIDATE_COLUMNS, ranked
+    """
+    now = now or pd.Timestamp.now()
+    users = report["User"].astype(str)
+    groups = report["Group"].astype(str)
+    keys = users.map(member_key)
+    ids = pd.Series([candidate_id(group, user) for group, user in zip(groups, users, strict=True)], index=report.index)
+
+    keep = ~ids.isin(log.actioned()).to_numpy()
+    if allowed:
+        keep &= ~keys.isin(allowed).to_numpy()
+    candidates = report[keep].assign(Candidate_Id=ids[keep], Group=groups[keep], User=users[keep])
+    candidates = candidates.drop_duplicates("Candidate_Id")
+
+    new = ~candidates["Candidate_Id"].isin(log.first_flagged.keys())
+    log.append(
+        [
+            {"id": identifier, "group": group, "user": user, "status": "flagged", "time": now.isoformat()}
+            for identifier, group, user in candidates.loc[new, ["Candidate_Id", "Group", "User"]].itertuples(
+                index=False
+            )
+        ]
+    )
+    candidates["First_Flagged"] = candidates["Candidate_Id"].map(log.first_flagged).astype("datetime64[ns]")
+    ready = candidates[candidates["First_Flagged"] <= now - pd.Timedelta(days=grace_days)]
+
+    # Never-posted members first, then longest silent, then fewest messages
+    silent = ready["Days_Since_Last_Message"].fillna(np.inf)
+    ready = ready.assign(_silent=silent).sort_values(
+        ["_silent", "Total_Messages_Sent", "Candidate_Id"], ascending=[False, True, True], kind="stable"
+    )
+    ready = ready.drop(columns="_silent").reset_index(drop=True)
+    ready.insert(0, "Rank", np.arange(1, len(ready) + 1))
+    logger.info(
+        f"{len(report)} inactive members: {(~keep).sum()} allow-listed or actioned, {new.sum()} newly flagged, "
+        f"{len(ready)} ready for removal"
+    )
+    return ready[CANDIDATE_COLUMNS]
+
+
+def export_chunks(
+    candidates: pd.DataFrame, output_dir: Union[str, Path], chunk_size: int = 100, prefix: str = "removal"
+) -> List[Path]:
+    """Write ranked candidates as numbered CSV chunks, to be actioned one at a time.
+
+    Chunks left from an earlier export with the same prefix are replaced.
+
+    Args:
+        candidates: Ranked candidates, as returned by removal_candidates
+        output_dir: Directory of the chunks
+        chunk_size: Candidates per chunk, defaults to 100
+        prefix: File name prefix, defaults to 'removal'
+
+    Returns:
+        Paths of the written chunks, in rank order
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for number, start in enumerate(range(0, len(candidates), chunk_size), start=1):
+        path = output_dir / f"{prefix}-{number:04d}.csv"
+        partial = path.with_name(f"{path.name}.partial")
+        candidates.iloc[start : start + chunk_size].to_csv(partial, sep="|", index=False)
+        partial.replace(path)
+        paths.append(path)
+    # Chunks of an earlier, longer export would otherwise look current
+    for stale in set(output_dir.glob(f"{prefix}-[0-9][0-9][0-9][0-9].csv")) - set(paths):
+        stale.unlink()
+    logger.info(f"Exported {len(candidates)} candidates in {len(paths)} chunks to {output_dir}")
+    return paths
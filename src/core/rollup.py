@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+from src.core.profiling import profiled
+
+# Columns of a daily rollup: one row per day and sender
+ROLLUP_COLUMNS = ["Date", "Sender", "Messages", "Words", "URLs", "First", "Last"]
+URL_PATTERN = r"https?://"
+
+
+@profiled()
+def daily_rollup(df: pd.DataFrame) -> pd.DataFrame:
+    """Roll messages up per day and sender.
+
+    Args:
+        df: DataFrame with 'Datetime', 'Sender' and 'Message' columns
+
+    Returns:
+        DataFrame with ROLLUP_COLUMNS: message, word and URL counts and the first and last message
+        time of every sender on every day
+    """
+    messages = df["Message"].fillna("").astype(str)
+    per_message = pd.DataFrame(
+        {
+            "Date": df["Datetime"].dt.normalize(),
+            "Sender": df["Sender"].astype(str),
+            "Words": messages.str.split().str.len(),
+            "URLs": messages.str.count(URL_PATTERN),
+            "Datetime": df["Datetime"],
+        }
+    )
+    rollup = per_message.groupby(["Date", "Sender"], sort=True).agg(
+        Messages=("Datetime", "size"),
+        Words=("Words", "sum"),
+        URLs=("URLs", "sum"),
+        First=("Datetime", "min"),
+        Last=("Datetime", "max"),
+    )
+    return rollup.reset_index()[ROLLUP_COLUMNS]
+
+
+def period_end(days: pd.Series, freq: str) -> pd.Series:
+    """Label days with the last day of their week (ending on Sunday) or month, as resample does.
+
+    Args:
+        days: Series of datetimes
+        freq: 'W' or 'M'
+
+    Returns:
+        Series of period ends at midnight
+    """
+    return days.dt.to_period(freq).dt.end_time.dt.normalize()
+
+
+def window_end(times: pd.Series) -> pd.Series:
+    """Label times with the end of the ActivityStats window holding them.
+
+    ActivityStats scans each week as the seven days up to and including the Sunday midnight that
+    labels it, so a Sunday message after midnight belongs to the following week.
+
+    Args:
+        times: Series of datetimes
+
+    Returns:
+        Series with the first Sunday midnight at or after each time
+    """
+    day = times.dt.normalize()
+    end = day + pd.to_timedelta((6 - day.dt.weekday) % 7, unit="D")
+    return end.where(end >= times, end + pd.Timedelta(days=7))
+
+
+@profiled()
+def top_senders(rollup: pd.DataFrame, freq: str, k: int = 5) -> pd.DataFrame:
+    """Get the top K senders per week or month from a daily rollup.
+
+    Args:
+        rollup: Daily rollup, as returned by daily_rollup
+        freq: 'W' (week, ending on Sunday) or 'M' (month)
+        k: Number of top senders per period, defaults to 5
+
+    Returns:
+        DataFrame with 'Sender', 'Datetime' (period end) and 'Message' (message count)
+
+    Raises:
+        ValueError: If freq is not 'W' or 'M'
+    """
+    if freq not in ["W", "M"]:
+        raise ValueError("freq must be 'W' or 'M'")
+    if rollup.empty:
+        return pd.DataFrame(columns=["Sender", "Datetime", "Message"])
+    periods = period_end(rollup["Date"], freq).rename("Datetime")
+    counts = rollup.groupby([periods, rollup["Sender"]])["Messages"].sum().rename("Message").reset_index()
+    counts = counts[["Sender", "Datetime", "Message"]]
+    return counts.sort_values(["Datetime", "Message"], ascending=[True, False]).groupby("Datetime").head(k)
+
+
+@profiled()
+def sender_stats(rollup: pd.DataFrame, churn_days: int = 21) -> pd.DataFrame:
+    """Count new, active and churned senders per week from a daily rollup.
+
+    Matches ActivityStats.compute_sender_stats in private_community_stats: a sender is new in the
+    week of their first message, active in every week they post in, and counts as churned in every
+    week that ends more than churn_days after their last message.
+
+    Args:
+        rollup: Daily rollup, as returned by daily_rollup
+        churn_days: Days of silence after which a sender counts as churned, defaults to 21
+
+    Returns:
+        DataFrame indexed by week end ('Date') with 'New Senders', 'Active Senders' and
+        'Churned Senders'
+    """
+    columns = ["New Senders", "Active Senders", "Churned Senders"]
+    if rollup.empty:
+        return pd.DataFrame(columns=columns, index=pd.DatetimeIndex([], name="Date"))
+    first = rollup.groupby("Sender")["First"].min()
+    last = rollup.groupby("Sender")["Last"].max()
+    # Weeks are labelled like resample("W"), but scanned like ActivityStats (see window_end)
+    week_labels = period_end(rollup["Date"], "W")
+    weeks = pd.date_range(week_labels.min(), week_labels.max(), freq="W-SUN", name="Date")
+
+    # A day's messages fall in one window, except on Sundays, where messages at midnight close one
+    # window and later ones open the next: the day's first and last message cover both cases
+    active_weeks = pd.concat(
+        [
+            pd.DataFrame({"Week": window_end(rollup["First"]), "Sender": rollup["Sender"]}),
+            pd.DataFrame({"Week": window_end(rollup["Last"]), "Sender": rollup["Sender"]}),
+        ]
+    ).drop_duplicates()
+    active = active_weeks.groupby("Week").size().reindex(weeks, fill_value=0)
+    new = window_end(first).value_counts().reindex(weeks, fill_value=0)
+    # Senders whose last message is more than churn_days before the end of the week
+    cutoffs = (weeks - pd.Timedelta(days=churn_days)).to_numpy()
+    churned = np.searchsorted(np.sort(last.to_numpy()), cutoffs, side="left")
+    return pd.DataFrame(
+        {columns[0]: new.to_numpy(), columns[1]: active.to_numpy(), columns[2]: churned},
+        index=weeks,
+    ).astype(np.int64)
+
+
+def daily_sizes(rollup: pd.DataFrame) -> pd.DataFrame:
+    """Size each day's summarisation input from a daily rollup.
+
+    Args:
+        rollup: Daily rollup, as returned by daily_rollup
+
+    Returns:
+        DataFrame with 'Date', 'Messages', 'wc' (words, as in generate_daily_df), 'URLs' and 'Senders'
+    """
+    sizes = rollup.groupby("Date").agg(
+        Messages=("Messages", "sum"), wc=("Words", "sum"), URLs=("URLs", "sum"), Senders=("Sender", "nunique")
+    )
+    return sizes.reset_index()
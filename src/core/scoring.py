@@ -0,0 +1,295 @@
+import json
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from loguru import logger
+
+from src.core.aliases import member_key
+
+# Decay models:
+#   exponential - message count scaled by exp(-days since last message / decay_days)
+#   half-life   - message count halved every decay_days since the last message
+#   windowed    - sum over the messages of the last decay_days, each weighted by 1 - age / decay_days
+DECAY_MODELS: Tuple[str, ...] = ("exponential", "half-life", "windowed")
+
+SECONDS_PER_DAY = 86400.0
+
+
+def decay(age_days: np.ndarray, model: str, decay_days: float) -> np.ndarray:
+    """Weight ages in days with a decay model.
+
+    Args:
+        age_days: Ages in days, inf for "never"
+        model: One of DECAY_MODELS
+        decay_days: Decay constant, half-life or window in days depending on the model
+
+    Returns:
+        Weights in [0, 1]
+
+    Raises:
+        ValueError: If the model is unknown or decay_days is not positive
+    """
+    if decay_days <= 0:
+        raise ValueError(f"decay_days must be positive, got {decay_days}")
+    age_days = np.asarray(age_days, dtype=np.float64)
+    if model == "exponential":
+        return np.exp(-age_days / decay_days)
+    if model == "half-life":
+        return np.exp2(-age_days / decay_days)
+    if model == "windowed":
+        return np.clip(1.0 - age_days / decay_days, 0.0, 1.0)
+    raise ValueError(f"Unknown decay model {model!r}, expected one of {DECAY_MODELS}")
+
+
+def member_activity(
+    codes: np.ndarray, timestamps: np.ndarray, n_members: int, weights: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Count messages and find the last message time per member in one pass.
+
+    Args:
+        codes: Member id of every message, -1 where unknown
+        timestamps: Message times as datetime64 values
+        n_members: Number of member ids
+        weights: Optional number of messages per row, defaults to one
+
+    Returns:
+        Tuple of (message counts, last message time in seconds since the epoch, -inf if never)
+    """
+    valid = codes >= 0
+    codes = codes[valid]
+    seconds = timestamps[valid].astype("datetime64[s]").astype(np.float64)
+    counts = np.bincount(codes, weights=None if weights is None else weights[valid], minlength=n_members)
+    counts = counts.astype(np.int64)
+    last = np.full(n_members, -np.inf)
+    np.maximum.at(last, codes, seconds)
+    return counts, last
+
+
+def activity_scores(
+    codes: np.ndarray,
+    timestamps: np.ndarray,
+    n_members: int,
+    as_of: np.datetime64,
+    model: str = "exponential",
+    decay_days: float = 90,
+    reference_messages: float = 5,
+    weights: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Score every member from the full message history.
+
+    Args:
+        codes: Member id of every message, -1 where unknown
+        timestamps: Message times as datetime64 values
+        n_members: Number of member ids
+        as_of: Time the scores are computed for
+        model: One of DECAY_MODELS, defaults to "exponential"
+        decay_days: Decay constant, half-life or window in days, defaults to 90
+        reference_messages: Number of messages that would give a score of 1.0, defaults to 5
+        weights: Optional number of messages per row, defaults to one
+
+    Returns:
+        Tuple of (scores, message counts, days since the last message) per member id
+    """
+    counts, last = member_activity(codes, timestamps, n_members, weights)
+    now = np.datetime64(as_of, "s").astype(np.float64)
+    days_since_last = (now - last) / SECONDS_PER_DAY
+    if model == "windowed":
+        valid = codes >= 0
+        ages = (now - timestamps[valid].astype("datetime64[s]").astype(np.float64)) / SECONDS_PER_DAY
+        contributions = decay(ages, model, decay_days)
+        if weights is not None:
+            contributions = contributions * weights[valid]
+        scores = np.bincount(codes[valid], weights=contributions, minlength=n_members) / reference_messages
+    else:
+        scores = counts / reference_messages * decay(days_since_last, model, decay_days)
+    return scores, counts, days_since_last
+
+
+def rank(scores: np.ndarray, k: Optional[int] = None, largest: bool = False) -> np.ndarray:
+    """Return the positions of the k lowest (or highest) scores, in order.
+
+    Only the k selected scores are sorted; the rest is split off with a partial sort.
+
+    Args:
+        scores: Scores to rank
+        k: Number of positions to return, defaults to all
+        largest: Whether to return the highest scores first, defaults to lowest first
+
+    Returns:
+        Array of positions into scores
+    """
+    keys = -scores if largest else scores
+    if k is None or k >= len(keys):
+        return np.argsort(keys, kind="stable")
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    selected = np.argpartition(keys, k - 1)[:k]
+    return selected[np.argsort(keys[selected], kind="stable")]
+
+
+class EngagementTracker:
+    """Per-member engagement: the sum of every message's decayed contribution.
+
+    A message sent `age` days ago contributes decay(age), so the score of a member at time t is
+    sum(decay(t - t_i)) over their messages. Because the decay is exponential, moving the scores
+    from t to t' multiplies each of them by decay(t' - t); an update therefore decays the stored
+    scores and adds the new messages, and costs O(new messages) rather than a pass over the full
+    history.
+
+    Members are keyed by their alias key (see aliases.member_key), so scores survive re-exports in
+    which sender ids change. One tracker covers one group.
+    """
+
+    def __init__(self, decay_days: float = 30, model: str = "exponential") -> None:
+        """Initialize an empty tracker.
+
+        Args:
+            decay_days: Decay constant or half-life in days, defaults to 30
+            model: "exponential" or "half-life", defaults to "exponential"
+
+        Raises:
+            ValueError: If the model does not decay exponentially
+        """
+        if model not in ("exponential", "half-life"):
+            raise ValueError(f"Engagement needs an exponential decay model, got {model!r}")
+        self.decay_days = decay_days
+        self.model = model
+        # member key -> engagement as of self.as_of
+        self.scores: Dict[str, float] = {}
+        # member key -> display name
+        self.names: Dict[str, str] = {}
+        self.as_of: Optional[np.datetime64] = None
+        # Time of the newest ingested message, and how many messages share it: exports have minute
+        # resolution, so a later export can contain more messages from that same minute
+        self.watermark: Optional[np.datetime64] = None
+        self.watermark_count = 0
+
+    def __len__(self) -> int:
+        """Return the number of members with a score."""
+        return len(self.scores)
+
+    def _new_messages(self, timestamps: np.ndarray) -> np.ndarray:
+        """Select the messages not ingested yet.
+
+        Args:
+            timestamps: Message times as datetime64[s] values, in chronological order
+
+        Returns:
+            Boolean mask of new messages
+        """
+        if self.watermark is None:
+            return np.ones(len(timestamps), dtype=bool)
+        new = timestamps > self.watermark
+        at_watermark = np.flatnonzero(timestamps == self.watermark)
+        new[at_watermark[self.watermark_count :]] = True
+        return new
+
+    def update(
+        self,
+        codes: np.ndarray,
+        timestamps: np.ndarray,
+        names: Sequence[str],
+        as_of: Optional[np.datetime64] = None,
+        weights: Optional[np.ndarray] = None,
+    ) -> int:
+        """Ingest the messages newer than the last update.
+
+        Args:
+            codes: Member id of every message, -1 where unknown, in chronological order
+            timestamps: Message times as datetime64 values
+            names: Display name of every member id
+            as_of: Time to move the scores to, defaults to the newest message
+            weights: Optional number of messages per row, defaults to one; the watermark then
+                counts rows rather than messages, so compact and full frames should not be mixed
+
+        Returns:
+            Number of messages ingested
+        """
+        timestamps = np.asarray(timestamps).astype("datetime64[s]")
+        new = self._new_messages(timestamps)
+        if not new.any():
+            return 0
+        new_codes, new_times = codes[new], timestamps[new]
+        # Scores never move back in time, and never to before a message they include
+        as_of = new_times.max() if as_of is None else max(np.datetime64(as_of, "s"), new_times.max())
+        if self.as_of is not None:
+            as_of = max(as_of, self.as_of)
+            factor = float(decay((as_of - self.as_of) / np.timedelta64(1, "D"), self.model, self.decay_days))
+            self.scores = {key: score * factor for key, score in self.scores.items()}
+
+        # One pass over the new messages: weight each by its age and sum the weights per member
+        valid = new_codes >= 0
+        ages = (as_of - new_times[valid]) / np.timedelta64(1, "D")
+        contributions = decay(ages, self.model, self.decay_days)
+        if weights is not None:
+            contributions = contributions * weights[new][valid]
+        sums = np.bincount(new_codes[valid], weights=contributions, minlength=len(names))
+        for code in np.flatnonzero(sums):
+            key = member_key(names[code])
+            self.scores[key] = self.scores.get(key, 0.0) + float(sums[code])
+            self.names.setdefault(key, names[code])
+
+        self.as_of = as_of
+        newest = new_times.max()
+        if newest == self.watermark:
+            self.watermark_count += int((new_times == newest).sum())
+        elif self.watermark is None or newest > self.watermark:
+            self.watermark, self.watermark_count = newest, int((timestamps == newest).sum())
+        logger.info(f"Ingested {int(new.sum())} new messages; {len(self)} members have an engagement score")
+        return int(new.sum())
+
+    def engagement(self, as_of: Optional[np.datetime64] = None) -> Dict[str, float]:
+        """Return the scores decayed to a point in time.
+
+        Args:
+            as_of: Time to decay the scores to, defaults to the last update
+
+        Returns:
+            Dictionary of member key to engagement
+        """
+        if self.as_of is None or as_of is None:
+            return dict(self.scores)
+        days = (np.datetime64(as_of, "s") - self.as_of) / np.timedelta64(1, "D")
+        factor = float(decay(max(days, 0.0), self.model, self.decay_days))
+        return {key: score * factor for key, score in self.scores.items()}
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Persist the tracker as JSON.
+
+        Args:
+            path: Output file path
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "decay_days": self.decay_days,
+            "model": self.model,
+            "as_of": None if self.as_of is None else str(self.as_of),
+            "watermark": None if self.watermark is None else str(self.watermark),
+            "watermark_count": self.watermark_count,
+            "scores": self.scores,
+            "names": self.names,
+        }
+        path.write_text(json.dumps(data, ensure_ascii=False))
+        logger.info(f"Saved engagement scores for {len(self)} members to {path}")
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "EngagementTracker":
+        """Load a tracker persisted with save.
+
+        Args:
+            path: Path to the JSON file
+
+        Returns:
+            EngagementTracker
+        """
+        data = json.loads(Path(path).read_text())
+        tracker = cls(decay_days=data["decay_days"], model=data["model"])
+        tracker.as_of = None if data["as_of"] is None else np.datetime64(data["as_of"], "s")
+        tracker.watermark = None if data["watermark"] is None else np.datetime64(data["watermark"], "s")
+        tracker.watermark_count = data["watermark_count"]
+        tracker.scores = data["scores"]
+        tracker.names = data["names"]
+        logger.info(f"Loaded engagement scores for {len(tracker)} members from {path}")
+        return tracker
@@ -0,0 +1,225 @@
+import hashlib
+import sqlite3
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.core.aliases import member_key
+from src.core.profiling import profiled
+
+RESULT_COLUMNS = ["Group", "Datetime", "Sender", "Message"]
+# Orders of search results: best match first (BM25), or by time. Ties are broken by row id, so
+# pages of the same search never overlap or skip a message
+ORDERS = {"rank": "bm25(messages_fts), m.id", "newest": "m.time DESC, m.id DESC", "oldest": "m.time ASC, m.id ASC"}
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    digest INTEGER NOT NULL UNIQUE,
+    group_name TEXT NOT NULL,
+    time TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    sender_key TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_time ON messages (time);
+CREATE INDEX IF NOT EXISTS messages_sender ON messages (sender_key, time);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    message, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+
+def _digest(group: str, time: str, sender: str, message: str) -> int:
+    """Identify a message by a signed 64-bit hash of its fields, so re-ingested messages are skipped."""
+    key = "\x1f".join([group, time, sender, message]).encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little", signed=True)
+
+
+def phrase_query(text: str) -> str:
+    """Turn free text into an FTS5 query matching messages that contain every term.
+
+    Each whitespace-separated term is quoted, so URLs and punctuation are searched literally
+    instead of being read as query syntax: "x.com/abc" matches the tokens x, com and abc in a row.
+
+    Args:
+        text: Search text
+
+    Returns:
+        FTS5 query
+    """
+    return " ".join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+
+class SearchIndex:
+    """Full-text index of message history, in one SQLite file.
+
+    Messages are stored once with their group, time and sender, and their text is indexed by an
+    FTS5 table over the same rows, so a search looks up its terms in the inverted index and
+    filters by group, sender and date through ordinary indexes, without scanning the archive.
+    Adding messages is incremental: each batch only indexes rows not seen before, so exports and
+    deltas can be fed again as they are ingested. Messages later removed from an export stay
+    searchable, as in an archive.
+    """
+
+    def __init__(self, path: Union[str, Path], read_only: bool = False) -> None:
+        """Open (or create) an index.
+
+        Args:
+            path: SQLite file of the index
+            read_only: Whether to open an existing index for searching only, defaults to False
+
+        Raises:
+            FileNotFoundError: If read_only and the index does not exist
+        """
+        self.path = Path(path)
+        if read_only:
+            if not self.path.exists():
+                raise FileNotFoundError(f"Search index not found: {self.path}")
+            self.connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def __len__(self) -> int:
+        """Return the number of indexed messages."""
+        return self.connection.execute("SELECT count(*) FROM messages").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the index."""
+        self.connection.close()
+
+    @profiled()
+    def add(self, df: pd.DataFrame, group: Optional[str] = None) -> int:
+        """Index a batch of messages, skipping those already indexed.
+
+        Args:
+            df: DataFrame with 'Datetime', 'Sender' and 'Message' columns, and 'Group' unless group is given
+            group: Optional group of every message
+
+        Returns:
+            Number of messages added
+        """
+        groups = pd.Series(group, index=df.index) if group is not None else df["Group"].astype(str)
+        times = pd.to_datetime(df["Datetime"]).dt.strftime("%Y-%m-%d %H:%M:%S")
+        senders = df["Sender"].astype(str)
+        # Normalize each distinct sender name once
+        codes, names = pd.factorize(senders)
+        sender_keys = np.array([member_key(name) for name in names], dtype=object)[codes]
+        rows = zip(groups, times, senders, df["Message"].fillna("").astype(str), sender_keys, strict=True)
+        with self.connection:
+            last = self.connection.execute("SELECT coalesce(max(id), 0) FROM messages").fetchone()[0]
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO messages (digest, group_name, time, sender, message, sender_key) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                ((_digest(*row[:4]), *row) for row in rows),
+            )
+            # New rows got ids above the previous maximum; only they enter the text index
+            added = self.connection.execute(
+                "INSERT INTO messages_fts (rowid, message) SELECT id, message FROM messages WHERE id > ?", (last,)
+            ).rowcount
+        logger.info(f"Indexed {added} new of {len(df)} messages")
+        return added
+
+    def optimize(self) -> None:
+        """Merge the text index into one segment, for the fastest searches after a bulk load."""
+        with self.connection:
+            self.connection.execute("INSERT INTO messages_fts (messages_fts) VALUES ('optimize')")
+
+    def _where(
+        self,
+        query: str,
+        groups: Optional[List[str]],
+        sender: Optional[str],
+        since: Optional[date],
+        until: Optional[date],
+        raw: bool,
+    ) -> Tuple[str, List[str]]:
+        """Build the WHERE clause and parameters of a search."""
+        clauses = ["messages_fts MATCH ?"]
+        parameters = [query if raw else phrase_query(query)]
+        if groups:
+            clauses.append(f"m.group_name IN ({', '.join('?' * len(groups))})")
+            parameters.extend(groups)
+        if sender:
+            clauses.append("m.sender_key = ?")
+            parameters.append(member_key(sender))
+        if since:
+            clauses.append("m.time >= ?")
+            parameters.append(since.isoformat())
+        if until:
+            # Until is inclusive: every message of that day
+            clauses.append("m.time < ?")
+            parameters.append((until + timedelta(days=1)).isoformat())
+        return " AND ".join(clauses), parameters
+
+    def search(
+        self,
+        query: str,
+        groups: Optional[List[str]] = None,
+        sender: Optional[str] = None,
+        since: Optional[date] = None,
+        until: Optional[date] = None,
+        order: str = "rank",
+        limit: int = 20,
+        page: int = 1,
+        raw: bool = False,
+    ) -> pd.DataFrame:
+        """Find the messages matching a query.
+
+        Args:
+            query: Search text; every term must appear. With raw, an FTS5 query (OR, NOT, prefix*, ...)
+            groups: Optional groups to search, defaults to all
+            sender: Optional sender, matched as alias resolution does ('~' and phone formatting ignored)
+            since: Optional first day
+            until: Optional last day, inclusive
+            order: 'rank' (best match first), 'newest' or 'oldest', defaults to 'rank'
+            limit: Results per page, defaults to 20
+            page: Page number, starting at 1
+            raw: Whether query is FTS5 syntax rather than free text, defaults to False
+
+        Returns:
+            DataFrame with RESULT_COLUMNS
+
+        Raises:
+            ValueError: If order is unknown or page is below 1
+        """
+        if order not in ORDERS:
+            raise ValueError(f"order must be one of {', '.join(ORDERS)}")
+        if page < 1:
+            raise ValueError("page must be 1 or more")
+        where, parameters = self._where(query, groups, sender, since, until, raw)
+        rows = self.connection.execute(
+            "SELECT m.group_name, m.time, m.sender, m.message FROM messages_fts JOIN messages m ON m.id = "
+            f"messages_fts.rowid WHERE {where} ORDER BY {ORDERS[order]} LIMIT ? OFFSET ?",
+            [*parameters, limit, (page - 1) * limit],
+        ).fetchall()
+        result = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+        result["Datetime"] = pd.to_datetime(result["Datetime"])
+        return result
+
+    def count(
+        self,
+        query: str,
+        groups: Optional[List[str]] = None,
+        sender: Optional[str] = None,
+        since: Optional[date] = None,
+        until: Optional[date] = None,
+        raw: bool = False,
+    ) -> int:
+        """Count the messages matching a query, with the filters of search."""
+        where, parameters = self._where(query, groups, sender, since, until, raw)
+        return self.connection.execute(
+            f"SELECT count(*) FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid WHERE {where}", parameters
+        ).fetchone()[0]
+
+    def groups(self) -> Iterator[str]:
+        """Yield the names of the indexed groups."""
+        for (group,) in self.connection.execute("SELECT DISTINCT group_name FROM messages ORDER BY group_name"):
+            yield group
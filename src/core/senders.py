@@ -0,0 +1,161 @@
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+# WhatsApp prefixes display names of people not in your contacts with "~" followed by a
+# narrow no-break space, and sprinkles left-to-right marks around names in system messages.
+CONTACT_PREFIX = "~"
+INVISIBLE_CHARS = re.compile(r"[\u200e\u200f\u202a-\u202e\u2066-\u2069]")
+SPACE_CHARS = re.compile(r"[\s\u00a0\u2007\u202f]+")
+
+
+def normalize_sender(name: str) -> str:
+    """Normalize a sender name so that the same person always maps to the same key.
+
+    Args:
+        name: Raw sender name as it appears in the export
+
+    Returns:
+        Name with invisible marks, the "~" prefix and irregular whitespace removed
+    """
+    name = INVISIBLE_CHARS.sub("", name)
+    name = SPACE_CHARS.sub(" ", name).strip()
+    if name.startswith(CONTACT_PREFIX):
+        name = name[len(CONTACT_PREFIX) :].lstrip()
+    return name
+
+
+class SenderDictionary:
+    """Interns sender names to stable integer ids backing a categorical dtype."""
+
+    def __init__(self) -> None:
+        """Initialize an empty dictionary."""
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        # Whether the name was ever seen with the "~" prefix, i.e. is not a saved contact
+        self.unsaved: List[bool] = []
+
+    def __len__(self) -> int:
+        """Return the number of interned senders."""
+        return len(self.names)
+
+    def intern(self, name: str) -> int:
+        """Return the id for a sender, assigning a new one if needed.
+
+        Args:
+            name: Raw sender name
+
+        Returns:
+            Stable integer id of the normalized sender
+        """
+        raw = INVISIBLE_CHARS.sub("", name).strip()
+        key = normalize_sender(raw)
+        sender_id = self.ids.get(key)
+        if sender_id is None:
+            sender_id = len(self.names)
+            self.ids[key] = sender_id
+            self.names.append(key)
+            self.unsaved.append(False)
+        if raw.startswith(CONTACT_PREFIX):
+            self.unsaved[sender_id] = True
+        return sender_id
+
+    def lookup(self, name: str) -> Optional[int]:
+        """Return the id for a sender without interning it.
+
+        Args:
+            name: Raw sender name
+
+        Returns:
+            Integer id if the sender is known, None otherwise
+        """
+        return self.ids.get(normalize_sender(name))
+
+    @property
+    def dtype(self) -> pd.CategoricalDtype:
+        """Categorical dtype whose codes are the sender ids."""
+        return pd.CategoricalDtype(categories=self.names)
+
+    def encode(self, senders: pd.Series) -> pd.Series:
+        """Encode a Series of sender names as a categorical keyed on sender ids.
+
+        Only the distinct values are normalized, so this is cheap even on large frames.
+
+        Args:
+            senders: Series of raw sender names, plain or categorical
+
+        Returns:
+            Categorical Series whose codes are the sender ids
+        """
+        if isinstance(senders.dtype, pd.CategoricalDtype):
+            raw_codes, uniques = senders.cat.codes.to_numpy(), senders.cat.categories
+        else:
+            raw_codes, uniques = pd.factorize(senders)
+        id_map = np.fromiter((self.intern(str(name)) for name in uniques), dtype=np.int32, count=len(uniques))
+        # Missing senders have code -1, which indexes the trailing -1 sentinel
+        codes = np.append(id_map, np.int32(-1))[raw_codes]
+        return pd.Series(pd.Categorical.from_codes(codes, dtype=self.dtype), index=senders.index, name=senders.name)
+
+    def decode(self, codes: np.ndarray) -> pd.Categorical:
+        """Build a categorical of sender names from sender ids.
+
+        Args:
+            codes: Array of sender ids
+
+        Returns:
+            Categorical of sender names sharing this dictionary's categories
+        """
+        return pd.Categorical.from_codes(np.asarray(codes, dtype=np.int32), dtype=self.dtype)
+
+    def unsaved_mask(self, codes: np.ndarray) -> np.ndarray:
+        """Return whether each sender id belongs to a non-contact ("~") sender.
+
+        Args:
+            codes: Array of sender ids
+
+        Returns:
+            Boolean array aligned with codes
+        """
+        return np.asarray(self.unsaved, dtype=bool)[np.asarray(codes, dtype=np.int64)]
+
+    def recategorize(self, users: pd.Series) -> pd.Series:
+        """Widen a categorical built by this dictionary to its current categories.
+
+        Frames encoded before more senders were interned carry fewer categories; widening
+        them lets frames from several groups be concatenated without falling back to object.
+
+        Args:
+            users: Categorical Series encoded by this dictionary
+
+        Returns:
+            Series with this dictionary's full set of categories
+        """
+        return users.cat.set_categories(self.names)
+
+    def to_dict(self) -> Dict[str, list]:
+        """Serialize the dictionary.
+
+        Returns:
+            Dictionary with names and unsaved flags, suitable for JSON
+        """
+        return {"names": self.names, "unsaved": self.unsaved}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, list]) -> "SenderDictionary":
+        """Rebuild a dictionary serialized with to_dict.
+
+        Args:
+            data: Output of to_dict
+
+        Returns:
+            SenderDictionary with the same ids
+        """
+        senders = cls()
+        senders.names = list(data["names"])
+        senders.unsaved = list(data["unsaved"])
+        senders.ids = {name: idx for idx, name in enumerate(senders.names)}
+        logger.debug(f"Loaded sender dictionary with {len(senders)} senders")
+        return senders
@@ -0,0 +1,361 @@
+import hashlib
+import json
+import re
+from collections import deque
+from itertools import chain, islice
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.core.aliases import member_key
+from src.core.profiling import profiled
+
+# Kinds of flags:
+#   flood      - a sender posted flood_limit or more messages within window_seconds
+#   repeat     - a sender posted repeat_limit or more near-duplicates of a message within the horizon
+#   cross_post - near-duplicates of a message appeared in more than one group within the horizon
+FLAGS = ("flood", "repeat", "cross_post")
+FLAG_COLUMNS = ["Group", "Datetime", "Sender", "Flag", "Count", "Message"]
+# Tokens of message text: URLs whole, so that the same promo link weighs as one strong token, and words
+TOKEN_PATTERN = re.compile(r"https?://\S+|\w+")
+# MinHash signatures of SIGNATURE_SIZE values, indexed in BANDS bands of ROWS values: messages
+# with Jaccard similarity s share a band with probability 1 - (1 - s^ROWS)^BANDS, about 0.9 at
+# s = 0.7 and under 0.1 at s = 0.3
+SIGNATURE_SIZE = 32
+BANDS = 8
+ROWS = SIGNATURE_SIZE // BANDS
+# Entries compared per bucket, newest first: enough to count repeats and groups, and bounds the
+# work per message when one text floods a bucket
+MAX_CANDIDATES = 8
+# Messages hashed per numpy batch, bounding the (tokens x SIGNATURE_SIZE) hash matrix
+SIGNATURE_BATCH = 5_000
+# Fixed seeds and odd multipliers of the multiply-shift hash functions, so signatures are stable
+# across runs and saved detectors stay valid
+_RANDOM = np.random.default_rng(20240601)
+SEEDS = _RANDOM.integers(0, 2**63, SIGNATURE_SIZE, dtype=np.uint64)
+MULTIPLIERS = _RANDOM.integers(0, 2**63, SIGNATURE_SIZE, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+# A signed message in the index: (time in ns, signature bytes, group, sender key, bucket keys)
+Entry = Tuple[int, bytes, str, str, Tuple[int, ...]]
+
+
+def tokenize(message: str) -> List[str]:
+    """Split a message into lowercase word and URL tokens."""
+    return TOKEN_PATTERN.findall(message.lower())
+
+
+def signatures(tokens: List[List[str]]) -> np.ndarray:
+    """Compute the MinHash signature of every message.
+
+    Value i of a signature is the minimum of hash function i over the message's tokens, so two
+    messages agree on a value with probability equal to the Jaccard similarity of their token
+    sets. Each batch hashes its distinct tokens once, applies all hash functions as one
+    (tokens x SIGNATURE_SIZE) array operation and takes the per-message minimums with reduceat.
+
+    Args:
+        tokens: Tokens of every message, as returned by tokenize; every message needs a token
+
+    Returns:
+        uint32 array of shape (messages, SIGNATURE_SIZE)
+    """
+    result = np.empty((len(tokens), SIGNATURE_SIZE), dtype=np.uint32)
+    for start in range(0, len(tokens), SIGNATURE_BATCH):
+        batch = tokens[start : start + SIGNATURE_BATCH]
+        lengths = np.fromiter(map(len, batch), dtype=np.int64, count=len(batch))
+        codes, uniques = pd.factorize(np.fromiter(chain.from_iterable(batch), dtype=object, count=int(lengths.sum())))
+        # blake2b rather than hash(), which changes between processes
+        vocabulary = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little") for token in uniques),
+            dtype=np.uint64,
+            count=len(uniques),
+        )
+        hashed = ((vocabulary[codes][:, None] ^ SEEDS) * MULTIPLIERS) >> np.uint64(32)
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        result[start : start + len(batch)] = np.minimum.reduceat(hashed, offsets, axis=0)
+    return result
+
+
+def band_keys(signature_rows: np.ndarray) -> np.ndarray:
+    """Hash each band of every signature to a bucket key.
+
+    Args:
+        signature_rows: uint32 array of shape (messages, SIGNATURE_SIZE)
+
+    Returns:
+        uint64 array of shape (messages, BANDS); keys differ between bands
+    """
+    bands = signature_rows.reshape(len(signature_rows), BANDS, ROWS).astype(np.uint64)
+    keys = np.arange(1, BANDS + 1, dtype=np.uint64)[None, :] * np.uint64(0x9E3779B97F4A7C15)
+    for row in range(ROWS):
+        keys = (keys ^ bands[:, :, row]) * np.uint64(0xBF58476D1CE4E5B9)
+    return keys
+
+
+class SpamDetector:
+    """Streaming flood and spam detector over the messages of one or more groups.
+
+    Messages are fed in batches, in time order per group, and each is checked against:
+        - a sliding window of the sender's recent message times (flood);
+        - an LSH index of recent MinHash signatures (repeat and cross_post): each signature is
+          filed under the keys of its BANDS bands, so near-duplicates are found by looking up a
+          few buckets instead of comparing with every message, then confirmed by their estimated
+          Jaccard similarity.
+    Only messages of at least min_words words, or with a link, are signed: short replies ("ok",
+    "thanks") repeat naturally. State older than the horizon is evicted as the stream advances, so
+    memory stays bounded by the recent traffic. The detector can be saved and loaded to resume a
+    stream, and remembers per group how far it got so re-fed messages are skipped.
+    """
+
+    def __init__(
+        self,
+        window_seconds: int = 60,
+        flood_limit: int = 10,
+        repeat_limit: int = 3,
+        similarity: float = 0.7,
+        horizon_hours: float = 24,
+        min_words: int = 5,
+    ) -> None:
+        """Initialize an empty detector.
+
+        Args:
+            window_seconds: Length of the flood window, defaults to 60
+            flood_limit: Messages within the window that make a flood, defaults to 10
+            repeat_limit: Near-duplicate posts by a sender that make a repeat, defaults to 3
+            similarity: Smallest estimated Jaccard similarity of the token sets of near-duplicates,
+                defaults to 0.7
+            horizon_hours: How long signatures are remembered, defaults to 24
+            min_words: Fewest words of a signed message without a link, defaults to 5
+        """
+        self.window_seconds = window_seconds
+        self.flood_limit = flood_limit
+        self.repeat_limit = repeat_limit
+        self.similarity = similarity
+        self.horizon_hours = horizon_hours
+        self.min_words = min_words
+        # (group, sender key) -> times in ns of the sender's messages within the flood window
+        self.recent: Dict[Tuple[str, str], Deque[int]] = {}
+        # Signed messages in arrival order, and the same entries filed by bucket key
+        self.entries: Deque[Entry] = deque()
+        self.buckets: Dict[int, Deque[Entry]] = {}
+        # group -> (time in ns of the newest message, messages at that time), as in EngagementTracker
+        self.watermarks: Dict[str, Tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        """Return the number of signatures in the index."""
+        return len(self.entries)
+
+    def _add(self, entry: Entry) -> None:
+        """File a signed message in the index."""
+        self.entries.append(entry)
+        for key in entry[4]:
+            self.buckets.setdefault(key, deque()).append(entry)
+
+    def _evict(self, oldest: int) -> None:
+        """Drop the signatures of messages sent before a point in time.
+
+        Entries leave every bucket in the order they were added, so the first entry overall is
+        also the first of each of its buckets.
+
+        Args:
+            oldest: Time in ns of the oldest message to keep
+        """
+        while self.entries and self.entries[0][0] < oldest:
+            entry = self.entries.popleft()
+            for key in entry[4]:
+                bucket = self.buckets[key]
+                bucket.popleft()
+                if not bucket:
+                    del self.buckets[key]
+
+    def _near_duplicates(self, signature: bytes, keys: Tuple[int, ...]) -> List[Entry]:
+        """Find the indexed messages similar to a signature.
+
+        Args:
+            signature: Signature bytes of the message
+            keys: Bucket keys of the message
+
+        Returns:
+            Indexed entries whose estimated similarity reaches the threshold, among the newest
+            MAX_CANDIDATES of each bucket
+        """
+        buckets = [self.buckets[key] for key in keys if key in self.buckets]
+        if not buckets:
+            return []
+        candidates = list(
+            {id(entry): entry for bucket in buckets for entry in islice(reversed(bucket), MAX_CANDIDATES)}.values()
+        )
+        others = np.frombuffer(b"".join(entry[1] for entry in candidates), dtype=np.uint32).reshape(len(candidates), -1)
+        agreeing = np.count_nonzero(others == np.frombuffer(signature, dtype=np.uint32), axis=1)
+        similar = agreeing >= self.similarity * SIGNATURE_SIZE
+        return [entry for entry, keep in zip(candidates, similar.tolist(), strict=True) if keep]
+
+    def _new_messages(self, group: str, times: np.ndarray) -> np.ndarray:
+        """Select the messages of a group newer than its watermark, as EngagementTracker does."""
+        if group not in self.watermarks:
+            return np.ones(len(times), dtype=bool)
+        watermark, count = self.watermarks[group]
+        new = times > watermark
+        at_watermark = np.flatnonzero(times == watermark)
+        new[at_watermark[count:]] = True
+        return new
+
+    def _advance(self, groups: pd.Series, times: np.ndarray) -> np.ndarray:
+        """Select the new messages of a batch and move the watermarks past them.
+
+        Args:
+            groups: Group of every message
+            times: Time in ns of every message
+
+        Returns:
+            Boolean mask of new messages
+        """
+        new = np.zeros(len(times), dtype=bool)
+        for group, rows in groups.groupby(groups, sort=False).indices.items():
+            group_times = times[rows]
+            fresh = self._new_messages(group, group_times)
+            new[rows] = fresh
+            if not fresh.any():
+                continue
+            newest = int(group_times[fresh].max())
+            watermark, count = self.watermarks.get(group, (None, 0))
+            if newest == watermark:
+                count += int((group_times[fresh] == newest).sum())
+            else:
+                count = int((group_times == newest).sum())
+            self.watermarks[group] = (newest, count)
+        return new
+
+    @profiled()
+    def process(self, df: pd.DataFrame, group: Optional[str] = None) -> pd.DataFrame:
+        """Check a batch of messages and update the detector.
+
+        Args:
+            df: DataFrame with 'Datetime', 'Sender' and 'Message' columns, and 'Group' unless group
+                is given; messages already processed (at or before the group's watermark) are skipped
+            group: Optional group of every message
+
+        Returns:
+            DataFrame with FLAG_COLUMNS, one row per flag raised; 'Count' is the number of messages
+            in the flood window, of near-duplicate posts, or of groups with a near-duplicate
+        """
+        batch = pd.DataFrame(
+            {
+                "Group": pd.Series(group, index=df.index) if group is not None else df["Group"].astype(str),
+                "Datetime": pd.to_datetime(df["Datetime"]),
+                "Sender": df["Sender"].astype(str),
+                "Message": df["Message"].fillna("").astype(str),
+            }
+        ).sort_values("Datetime", kind="stable")
+        times = batch["Datetime"].to_numpy().astype("datetime64[ns]").astype(np.int64)
+        new = self._advance(batch["Group"], times)
+        batch, times = batch[new], times[new]
+
+        # Sign the messages long enough, or with a link, in bulk before the sequential scan
+        tokens = [tokenize(message) for message in batch["Message"]]
+        signed = np.array(
+            [len(words) >= self.min_words or any(word.startswith("http") for word in words) for words in tokens],
+            dtype=bool,
+        )
+        signed_rows = np.flatnonzero(signed)
+        signature_rows = signatures([tokens[row] for row in signed_rows])
+        packed = signature_rows.tobytes()
+        width = SIGNATURE_SIZE * signature_rows.itemsize
+        keys = band_keys(signature_rows).tolist()
+        position = np.full(len(batch), -1)
+        position[signed_rows] = np.arange(len(signed_rows))
+        # Normalize each distinct sender name once; different spellings may share a key
+        codes, names = pd.factorize(batch["Sender"])
+        sender_keys = np.array([member_key(name) for name in names], dtype=object)[codes]
+
+        window = int(self.window_seconds * 1e9)
+        horizon = int(self.horizon_hours * 3600 * 1e9)
+        flags = []
+        rows = zip(batch["Group"], sender_keys, times.tolist(), position.tolist(), strict=True)
+        for row, (name, key, time, signature) in enumerate(rows):
+            recent = self.recent.setdefault((name, key), deque())
+            recent.append(time)
+            while recent[0] <= time - window:
+                recent.popleft()
+            if len(recent) >= self.flood_limit:
+                flags.append((row, "flood", len(recent)))
+
+            if signature < 0:
+                continue
+            if self.entries and self.entries[0][0] < time - horizon:
+                self._evict(time - horizon)
+            entry = (time, packed[signature * width : (signature + 1) * width], name, key, tuple(keys[signature]))
+            duplicates = self._near_duplicates(entry[1], entry[4]) + [entry]
+            repeats = sum(1 for other in duplicates if other[2] == name and other[3] == key)
+            if repeats >= self.repeat_limit:
+                flags.append((row, "repeat", repeats))
+            groups_seen = len({other[2] for other in duplicates})
+            if groups_seen > 1:
+                flags.append((row, "cross_post", groups_seen))
+            self._add(entry)
+
+        # Senders silent for a whole window have nothing left to count
+        if len(times):
+            cutoff = int(times.max()) - window
+            self.recent = {key: recent for key, recent in self.recent.items() if recent[-1] > cutoff}
+        result = batch.iloc[[row for row, _, _ in flags]][["Group", "Datetime", "Sender", "Message"]]
+        result = result.reset_index(drop=True)
+        result.insert(3, "Flag", pd.Categorical([flag for _, flag, _ in flags], categories=list(FLAGS)))
+        result.insert(4, "Count", np.array([count for _, _, count in flags], dtype=np.int64))
+        logger.info(f"Checked {len(batch)} messages ({len(signed_rows)} signed), raised {len(result)} flags")
+        return result[FLAG_COLUMNS]
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Persist the detector as JSON.
+
+        Args:
+            path: Output file path
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "window_seconds": self.window_seconds,
+            "flood_limit": self.flood_limit,
+            "repeat_limit": self.repeat_limit,
+            "similarity": self.similarity,
+            "horizon_hours": self.horizon_hours,
+            "min_words": self.min_words,
+            "recent": [[group, key, list(times)] for (group, key), times in self.recent.items()],
+            "entries": [[time, signature.hex(), group, key] for time, signature, group, key, _ in self.entries],
+            "watermarks": {group: list(watermark) for group, watermark in self.watermarks.items()},
+        }
+        partial = path.with_name(f"{path.name}.partial")
+        partial.write_text(json.dumps(data, ensure_ascii=False))
+        partial.replace(path)
+        logger.info(f"Saved spam detector with {len(self)} signatures to {path}")
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "SpamDetector":
+        """Load a detector persisted with save.
+
+        Args:
+            path: Path to the JSON file
+
+        Returns:
+            SpamDetector
+        """
+        data = json.loads(Path(path).read_text())
+        detector = cls(
+            window_seconds=data["window_seconds"],
+            flood_limit=data["flood_limit"],
+            repeat_limit=data["repeat_limit"],
+            similarity=data["similarity"],
+            horizon_hours=data["horizon_hours"],
+            min_words=data["min_words"],
+        )
+        detector.recent = {(group, key): deque(times) for group, key, times in data["recent"]}
+        entries = [(time, bytes.fromhex(signature), group, key) for time, signature, group, key in data["entries"]]
+        if entries:
+            rows = np.frombuffer(b"".join(entry[1] for entry in entries), dtype=np.uint32).reshape(len(entries), -1)
+            for entry, keys in zip(entries, band_keys(rows).tolist(), strict=True):
+                detector._add((*entry, tuple(keys)))
+        detector.watermarks = {group: tuple(watermark) for group, watermark in data["watermarks"].items()}
+        logger.info(f"Loaded spam detector with {len(detector)} signatures from {path}")
+        return detector
@@ -0,0 +1,365 @@
+import re
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.core import rollup
+from src.core.profiling import profiled
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # The store is optional; see the "store" extra
+    pa = pc = pq = None
+
+COLUMNS = ["Datetime", "Sender", "Message"]
+# Rows read at a time; memory use of every aggregation is bounded by one row group plus its result
+ROW_GROUP_SIZE = 100_000
+# Partial aggregates are merged whenever this many have accumulated
+MERGE_EVERY = 32
+# Messages that may be membership events or number changes keep their text in analysis frames
+EVENT_KEYWORDS = "joined|added|left|removed|changed"
+# Window of get_inactive_users and get_users_with_zero_messages, always exact in analysis frames
+INACTIVITY_DAYS = 60
+PARTITION_PATTERN = re.compile(r"group=(?P<group>[^/\\]+)[/\\]month=(?P<month>\d{4}-\d{2})$")
+
+
+class MessageStore:
+    """Columnar message archive, partitioned by group and month.
+
+    Messages live in Parquet files under `<root>/group=<group>/month=<YYYY-MM>/`, written in row
+    groups of ROW_GROUP_SIZE rows. Aggregations read one row group at a time, compute a partial
+    aggregate and merge the partials, so the archive never has to fit in memory.
+
+    Next to the messages, every partition keeps its daily rollup (see src.core.rollup), rewritten
+    with the partition. Top senders, churn stats and summarisation sizing come from the rollups
+    and never read a message.
+    """
+
+    def __init__(self, root: Union[str, Path]) -> None:
+        """Open (or create) a store.
+
+        Args:
+            root: Directory of the store
+
+        Raises:
+            ImportError: If pyarrow is not installed
+        """
+        if pq is None:
+            raise ImportError("The message store needs pyarrow: pip install 'whatsapp-analyzer[store]'")
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def partition_path(self, group: str, month: str) -> Path:
+        """Return the directory of one partition.
+
+        Args:
+            group: Group name
+            month: Month as YYYY-MM
+
+        Returns:
+            Partition directory
+        """
+        return self.root / f"group={quote(group, safe='')}" / f"month={month}"
+
+    def partitions(
+        self, groups: Optional[Iterable[str]] = None, start: Optional[str] = None, end: Optional[str] = None
+    ) -> List[Tuple[str, str, Path]]:
+        """List the partitions of the store.
+
+        Args:
+            groups: Optional groups to restrict to, defaults to all
+            start: Optional first month (YYYY-MM)
+            end: Optional last month (YYYY-MM)
+
+        Returns:
+            List of (group, month, partition directory), in month order
+        """
+        groups = set(groups) if groups is not None else None
+        partitions = []
+        for path in self.root.glob("group=*/month=*"):
+            match = PARTITION_PATTERN.search(str(path))
+            if match is None:
+                continue
+            group, month = unquote(match.group("group")), match.group("month")
+            if groups is not None and group not in groups:
+                continue
+            if (start and month < start) or (end and month > end):
+                continue
+            partitions.append((group, month, path))
+        return sorted(partitions, key=lambda partition: (partition[1], partition[0]))
+
+    def groups(self) -> List[str]:
+        """Return the names of the groups in the store."""
+        return sorted({group for group, _, _ in self.partitions()})
+
+    def _read_partition(self, path: Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Read a whole partition."""
+        return pq.read_table(path / "data.parquet", columns=columns).to_pandas()
+
+    def _write_table(self, frame: pd.DataFrame, path: Path) -> None:
+        """Write a Parquet file atomically.
+
+        Args:
+            frame: DataFrame to write
+            path: Destination file
+        """
+        partial = path.with_name(f"{path.name}.partial")
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), partial, row_group_size=ROW_GROUP_SIZE)
+        partial.replace(path)
+
+    @profiled()
+    def write(self, df: pd.DataFrame, group: str) -> int:
+        """Add a group's messages to the store.
+
+        The export is authoritative over the span from its first to its last message: in each month
+        it touches, stored messages in that span are replaced, earlier and later ones are kept.
+        Importing a newer or an older export of a group therefore neither duplicates nor drops
+        messages.
+
+        Args:
+            df: DataFrame with 'Datetime', 'Sender' and 'Message' columns
+            group: Group name
+
+        Returns:
+            Number of partitions written
+        """
+        df = df[COLUMNS].assign(Sender=df["Sender"].astype(str)).sort_values("Datetime", kind="stable")
+        first, last = df["Datetime"].min(), df["Datetime"].max()
+        months = df["Datetime"].dt.strftime("%Y-%m")
+        written = 0
+        for month, messages in df.groupby(months, sort=True):
+            path = self.partition_path(group, month)
+            if (path / "data.parquet").exists():
+                stored = self._read_partition(path)
+                before, after = stored[stored["Datetime"] < first], stored[stored["Datetime"] > last]
+                messages = pd.concat([before, messages, after], ignore_index=True)
+            path.mkdir(parents=True, exist_ok=True)
+            self._write_table(messages, path / "data.parquet")
+            # The rollup covers exactly the partition, so it is rebuilt with it and nothing else
+            self._write_table(rollup.daily_rollup(messages), path / "rollup.parquet")
+            written += 1
+        logger.info(f"Stored {len(df)} messages of {group} in {written} monthly partitions")
+        return written
+
+    def batches(
+        self,
+        columns: Optional[List[str]] = None,
+        groups: Optional[Iterable[str]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """Read the store one row group at a time.
+
+        Args:
+            columns: Optional columns to read, defaults to all
+            groups: Optional groups to restrict to
+            start: Optional first month (YYYY-MM)
+            end: Optional last month (YYYY-MM)
+
+        Yields:
+            Tuples of (group, DataFrame of one row group)
+        """
+        for group, _, path in self.partitions(groups, start, end):
+            parquet_file = pq.ParquetFile(path / "data.parquet")
+            for row_group in range(parquet_file.num_row_groups):
+                yield group, parquet_file.read_row_group(row_group, columns=columns).to_pandas()
+
+    def aggregate(
+        self,
+        partial: Callable[[str, pd.DataFrame], pd.DataFrame],
+        merge: Callable[[List[pd.DataFrame]], pd.DataFrame],
+        columns: Optional[List[str]] = None,
+        groups: Optional[Iterable[str]] = None,
+    ) -> pd.DataFrame:
+        """Compute an aggregate as partial aggregates over row groups, merged as they accumulate.
+
+        Args:
+            partial: Function of (group, row group) returning a partial aggregate
+            merge: Function combining a list of partial aggregates into one
+            columns: Optional columns to read, defaults to all
+            groups: Optional groups to restrict to
+
+        Returns:
+            Merged aggregate, or an empty DataFrame if the store has no matching rows
+        """
+        partials: List[pd.DataFrame] = []
+        for group, batch in self.batches(columns, groups):
+            partials.append(partial(group, batch))
+            if len(partials) >= MERGE_EVERY:
+                partials = [merge(partials)]
+        return merge(partials) if partials else pd.DataFrame()
+
+    def last_message_time(self, group: str) -> pd.Timestamp:
+        """Return the time of a group's last stored message, reading only its last partition.
+
+        Args:
+            group: Group name
+
+        Returns:
+            Time of the last message
+
+        Raises:
+            ValueError: If the group has no stored messages
+        """
+        partitions = self.partitions([group])
+        if not partitions:
+            raise ValueError(f"No messages stored for group {group!r}")
+        times = pq.read_table(partitions[-1][2] / "data.parquet", columns=["Datetime"]).column("Datetime")
+        return pd.Timestamp(pc.max(times).as_py())
+
+    @profiled()
+    def analysis_frame(self, group: str, windows: Sequence[int] = (INACTIVITY_DAYS,)) -> pd.DataFrame:
+        """Build a compact message frame for WhatsAppGroupAnalysis.
+
+        Messages that may be membership events or number changes are kept verbatim. The others are
+        aggregated per row group into message counts, first and last times per sender and window
+        band (the messages a sender posted between two window starts), and the partials are
+        merged; each sender's aggregate is then written back as one row per band, at the band's
+        last message time with a 'Count' column, plus a row for the first message. Message
+        counts, first and last message times and the counts in each window are exact, and memory
+        grows with the senders and events, not with the history.
+
+        Args:
+            group: Group name
+            windows: Windows in days, counted back from the group's last message, whose message
+                counts must be exact; the INACTIVITY_DAYS window is always included
+
+        Returns:
+            DataFrame with 'Datetime', 'Sender', 'Message' and 'Count', in chronological order
+
+        Raises:
+            ValueError: If the group has no stored messages
+        """
+        end = self.last_message_time(group)
+        # Window starts in ascending order; a message's band is the number of starts before it,
+        # matching the analysis, which counts messages strictly after a window's start
+        days = sorted(set(windows) | {INACTIVITY_DAYS}, reverse=True)
+        starts = (end - pd.to_timedelta(days, unit="D")).to_numpy()
+
+        def partial(_: str, batch: pd.DataFrame) -> pd.DataFrame:
+            candidates = batch["Message"].str.lower().str.contains(EVENT_KEYWORDS, na=False)
+            messages = batch.loc[~candidates]
+            stats = (
+                messages.groupby(
+                    [messages["Sender"], np.searchsorted(starts, messages["Datetime"].to_numpy(), side="left")],
+                    sort=False,
+                )["Datetime"]
+                .agg(Count="size", First="min", Last="max")
+                .rename_axis(["Sender", "Band"])
+                .reset_index()
+            )
+            return pd.concat([batch.loc[candidates].assign(Count=1, Band=-1), stats], ignore_index=True)
+
+        def merge(partials: List[pd.DataFrame]) -> pd.DataFrame:
+            frame = pd.concat(partials, ignore_index=True)
+            stats = frame[frame["Band"] >= 0].groupby(["Sender", "Band"], sort=False, as_index=False)
+            stats = stats.agg(Count=("Count", "sum"), First=("First", "min"), Last=("Last", "max"))
+            return pd.concat([frame[frame["Band"] < 0], stats], ignore_index=True)
+
+        merged = self.aggregate(partial, merge, columns=COLUMNS, groups=[group])
+        events, stats = merged[merged["Band"] < 0], merged[merged["Band"] >= 0]
+        # The first message of each sender is in their earliest band; it gets a row of its own
+        first = stats["Band"].to_numpy() == stats.groupby("Sender")["Band"].transform("min").to_numpy()
+        frame = pd.concat(
+            [
+                events[COLUMNS].assign(Count=1),
+                pd.DataFrame({"Datetime": stats["Last"], "Sender": stats["Sender"], "Count": stats["Count"] - first}),
+                pd.DataFrame({"Datetime": stats["First"], "Sender": stats["Sender"], "Count": 1})[first],
+            ],
+            ignore_index=True,
+        )
+        frame = frame[frame["Count"] > 0].fillna({"Message": ""})
+        frame = frame.sort_values("Datetime", kind="stable", ignore_index=True)
+        frame["Count"] = frame["Count"].astype("int32")
+        logger.info(f"Compacted {int(frame['Count'].sum())} messages of {group} to {len(frame)} rows")
+        return frame[[*COLUMNS, "Count"]]
+
+    @profiled()
+    def daily_rollup(self, groups: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Read the daily rollups.
+
+        Partitions written before rollups existed get theirs built (and stored) on first use.
+
+        Args:
+            groups: Optional groups to restrict to, defaults to all
+
+        Returns:
+            DataFrame with 'Group' followed by rollup.ROLLUP_COLUMNS
+        """
+        rollups = []
+        for group, _, path in self.partitions(groups):
+            if not (path / "rollup.parquet").exists():
+                self._write_table(rollup.daily_rollup(self._read_partition(path)), path / "rollup.parquet")
+            rollups.append(pq.read_table(path / "rollup.parquet").to_pandas().assign(Group=group))
+        if not rollups:
+            return pd.DataFrame(columns=["Group", *rollup.ROLLUP_COLUMNS])
+        return pd.concat(rollups, ignore_index=True)[["Group", *rollup.ROLLUP_COLUMNS]]
+
+    def top_senders(self, freq: str, k: int = 5, groups: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Get the top K senders per week or month, like private_community_stats.get_top_senders.
+
+        Args:
+            freq: 'W' (week) or 'M' (month)
+            k: Number of top senders per period, defaults to 5
+            groups: Optional groups to restrict to, defaults to all
+
+        Returns:
+            DataFrame with 'Sender', 'Datetime' (period end) and 'Message' (message count)
+
+        Raises:
+            ValueError: If freq is not 'W' or 'M'
+        """
+        return rollup.top_senders(self.daily_rollup(groups), freq, k=k)
+
+    def sender_stats(self, groups: Optional[Iterable[str]] = None, churn_days: int = 21) -> pd.DataFrame:
+        """Count new, active and churned senders per week, like ActivityStats.compute_sender_stats.
+
+        Args:
+            groups: Optional groups to restrict to, defaults to all
+            churn_days: Days of silence after which a sender counts as churned, defaults to 21
+
+        Returns:
+            DataFrame indexed by week end with 'New Senders', 'Active Senders' and 'Churned Senders'
+        """
+        return rollup.sender_stats(self.daily_rollup(groups), churn_days=churn_days)
+
+    def daily_sizes(self, groups: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Size each day's summarisation input without reading the messages.
+
+        Args:
+            groups: Optional groups to restrict to, defaults to all
+
+        Returns:
+            DataFrame with 'Date', 'Messages', 'wc', 'URLs' and 'Senders'
+        """
+        return rollup.daily_sizes(self.daily_rollup(groups))
+
+    @profiled()
+    def daily_messages(self, groups: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Join each day's messages, like summarisation.generate_daily_df.
+
+        Args:
+            groups: Optional groups to restrict to, defaults to all
+
+        Returns:
+            DataFrame with 'Date', 'Message' (the day's messages joined) and 'wc' (word count)
+        """
+
+        def partial(_: str, batch: pd.DataFrame) -> pd.DataFrame:
+            return batch.groupby(batch["Datetime"].dt.date.rename("Date"))["Message"].agg(" \n ".join).to_frame()
+
+        def merge(partials: List[pd.DataFrame]) -> pd.DataFrame:
+            return pd.concat(partials).groupby(level=0)["Message"].agg(" \n ".join).to_frame()
+
+        daily_df = self.aggregate(partial, merge, columns=["Datetime", "Message"], groups=groups)
+        if daily_df.empty:
+            return pd.DataFrame(columns=["Date", "Message", "wc"])
+        daily_df = daily_df.reset_index()
+        daily_df["wc"] = daily_df["Message"].str.split().str.len()
+        return daily_df
@@ -1,11 +1,27 @@
+import io
 import re
+import zipfile
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Tuple, Union
+from typing import BinaryIO, Iterator, List, Optional, TextIO, Tuple, Union
 
+import numpy as np
 import pandas as pd
 from loguru import logger
 
+from src.core.media import media_code, media_column
+from src.core.pii import PIIScrubber
+from src.core.profiling import profiled
+from src.core.senders import SenderDictionary
+
+# File patterns of chat exports: plain text, or the zip written by "Export chat" with media
+EXPORT_PATTERNS = ("*.txt", "*.zip")
+# Name of the chat inside iOS zip exports; Android names it "WhatsApp Chat with <group>.txt"
+CHAT_MEMBER = "_chat.txt"
+
+ChatSource = Union[str, Path, BinaryIO]
+
 
 def parse_chat_line(line: str) -> Optional[Tuple[datetime, str, str]]:
     """Parse a single line from a WhatsApp chat export.
@@ -44,35 +60,151 @@ def parse_chat_line(line: str) -> Optional[Tuple[datetime, str, str]]:
     return None
 
 
-def parse_chat(file_path: Union[str, Path]) -> pd.DataFrame:
+def find_exports(directory: Path) -> List[Path]:
+    """List the chat exports in a directory.
+
+    Args:
+        directory: Directory to search
+
+    Returns:
+        Sorted paths of the text and zip exports
+    """
+    return sorted(path for pattern in EXPORT_PATTERNS for path in directory.glob(pattern))
+
+
+def chat_member(archive: zipfile.ZipFile) -> zipfile.ZipInfo:
+    """Find the chat log inside a zipped export.
+
+    Args:
+        archive: Open zip archive
+
+    Returns:
+        Entry of the chat log: _chat.txt if present, else the largest text file
+
+    Raises:
+        ValueError: If the archive contains no text file
+    """
+    texts = [info for info in archive.infolist() if not info.is_dir() and info.filename.lower().endswith(".txt")]
+    if not texts:
+        raise ValueError("No chat log (.txt) found in the zip archive")
+    named = [info for info in texts if Path(info.filename).name == CHAT_MEMBER]
+    return named[0] if named else max(texts, key=lambda info: info.file_size)
+
+
+@contextmanager
+def open_chat(source: ChatSource) -> Iterator[TextIO]:
+    """Open the text of a chat export for reading line by line.
+
+    Zipped exports are read in place: only the chat log is decompressed, as a stream, and media
+    entries are never read or extracted.
+
+    Args:
+        source: Path of a text or zip export, or a binary file object holding either (e.g. an upload)
+
+    Yields:
+        Text stream of the chat log
+    """
+    if isinstance(source, (str, Path)):
+        if not zipfile.is_zipfile(source):
+            with open(source, "r") as file:
+                yield file
+            return
+    elif not zipfile.is_zipfile(source):
+        source.seek(0)
+        text = io.TextIOWrapper(source, encoding="utf-8", errors="replace")
+        try:
+            yield text
+        finally:
+            # Leave the caller's file object open
+            text.detach()
+        return
+    with zipfile.ZipFile(source) as archive:
+        member = chat_member(archive)
+        logger.info(f"Reading {member.filename} ({member.file_size} bytes) from the zip archive")
+        with archive.open(member) as raw:
+            yield io.TextIOWrapper(raw, encoding="utf-8", errors="replace")
+
+
+@profiled()
+def parse_chat(file_path: ChatSource, senders: Optional[SenderDictionary] = None) -> pd.DataFrame:
     """Parse a WhatsApp chat log into a DataFrame.
 
     Args:
-        file_path: Path to the chat log file
+        file_path: Path to the chat log file or zipped export, or a binary file object holding either
+        senders: Optional sender dictionary; when given, 'Sender' is encoded as a categorical of sender ids
 
     Returns:
-        DataFrame containing the parsed chat with columns 'Sender', 'Datetime', 'Message'
+        DataFrame containing the parsed chat with columns 'Sender', 'Datetime', 'Message' and 'Media'
+        (the type of attachment placeholders, missing for text messages)
     """
     parsed_data = []
-    with open(file_path, "r") as file:
+    media_codes = []
+    with open_chat(file_path) as file:
         for _, line in enumerate(file):
             parsed_line = parse_chat_line(line)
             if parsed_line:
                 parsed_data.append(parsed_line)
+                media_codes.append(media_code(parsed_line[2]))
 
     # Creating a DataFrame
     df = pd.DataFrame(parsed_data, columns=["Datetime", "Sender", "Message"])
+    df["Media"] = media_column(media_codes)
+    if senders is not None:
+        df["Sender"] = senders.encode(df["Sender"])
     return df
 
 
-def cleanup(df: pd.DataFrame) -> pd.DataFrame:
+@profiled()
+def parse_chat_tail(
+    file_path: Union[str, Path], offset: int = 0, senders: Optional[SenderDictionary] = None
+) -> Tuple[pd.DataFrame, int, int]:
+    """Parse the complete lines of a chat log from a byte offset on.
+
+    Used to follow an export that keeps growing: a trailing line without a newline may still be
+    being written, so it is left for the next call.
+
+    Args:
+        file_path: Path to the chat log file
+        offset: Byte offset of a line start to parse from, defaults to the start of the file
+        senders: Optional sender dictionary; when given, 'Sender' is encoded as a categorical of sender ids
+
+    Returns:
+        Tuple of (DataFrame with 'Datetime', 'Sender', 'Message' and 'Media'; byte offset of the first line
+        carrying the last parsed timestamp; byte offset after the last complete line)
+    """
+    parsed_data = []
+    media_codes = []
+    resume = end = offset
+    with open(file_path, "rb") as file:
+        file.seek(offset)
+        for raw_line in file:
+            if not raw_line.endswith(b"\n"):
+                break
+            parsed_line = parse_chat_line(raw_line.decode("utf-8", errors="replace"))
+            if parsed_line:
+                if not parsed_data or parsed_line[0] != parsed_data[-1][0]:
+                    resume = end
+                parsed_data.append(parsed_line)
+                media_codes.append(media_code(parsed_line[2]))
+            end += len(raw_line)
+
+    df = pd.DataFrame(parsed_data, columns=["Datetime", "Sender", "Message"])
+    df["Media"] = media_column(media_codes)
+    if senders is not None:
+        df["Sender"] = senders.encode(df["Sender"])
+    return df, resume, end
+
+
+@profiled()
+def cleanup(df: pd.DataFrame, scrub_pii: bool = False) -> pd.DataFrame:
     """Clean up the DataFrame by removing system messages and duplicates.
 
     Args:
         df: DataFrame containing message data
+        scrub_pii: Whether to replace phone numbers and emails in messages, defaults to False
 
     Returns:
-        Cleaned DataFrame
+        Cleaned DataFrame; when scrubbing, df.attrs["pii_counts"] holds the replacements per category
     """
     df = df.drop_duplicates(subset=["Datetime", "Sender", "Message"])
     df = df.sort_values(by="Datetime")
@@ -92,38 +224,61 @@ def cleanup(df: pd.DataFrame) -> pd.DataFrame:
     for message in system_messages:
         df = df[~df["Message"].str.contains(message)]
 
+    if scrub_pii:
+        df = df.copy()
+        df["Message"], counts = PIIScrubber().scrub(df["Message"])
+        df.attrs["pii_counts"] = counts
+
     logger.info(f"Cleaned DataFrame has {len(df)} messages")
     return df
 
 
+@profiled()
 def chat_to_df(
-    file_path: Path,
+    file_path: ChatSource,
     previous_df_path: Optional[Path] = None,
     group_name: Optional[str] = None,
+    scrub_pii: bool = False,
+    senders: Optional[SenderDictionary] = None,
 ) -> pd.DataFrame:
     """Convert a WhatsApp chat export to a DataFrame.
 
     Args:
-        file_path: Path to the chat export file
-        previous_df_path: Optional path to a previous DataFrame to merge with
+        file_path: Path to the chat export file (text or zip), or a binary file object holding one
+        previous_df_path: Optional path to a previous DataFrame to merge with: a pipe-delimited CSV, or a
+            Parquet file written by the CSV importer
         group_name: Optional name of the group to add as a column
+        scrub_pii: Whether to replace phone numbers and emails in messages, defaults to False
+        senders: Optional sender dictionary; when given, 'Sender' is encoded as a categorical of sender ids
 
     Returns:
         DataFrame containing the chat data
     """
-    file_path = Path(file_path)
-    assert file_path.exists(), f"File not found: {file_path}"
+    if isinstance(file_path, (str, Path)):
+        file_path = Path(file_path)
+        assert file_path.exists(), f"File not found: {file_path}"
 
-    df = parse_chat(file_path=file_path)
-    df = cleanup(df)
+    df = parse_chat(file_path=file_path, senders=senders)
+    # With a previous DataFrame, the merged messages are scrubbed once, below
+    df = cleanup(df, scrub_pii=scrub_pii and not previous_df_path)
 
     if previous_df_path:
-        previous_df = pd.read_csv(previous_df_path, sep="|")
-        previous_df["Datetime"] = pd.to_datetime(previous_df["Datetime"])
+        if Path(previous_df_path).suffix == ".parquet":
+            # Imported with src.core.importer: typed columns, nothing to parse
+            from src.core.importer import load_messages
+
+            previous_df = load_messages(previous_df_path)
+        else:
+            previous_df = pd.read_csv(previous_df_path, sep="|")
+            previous_df["Datetime"] = pd.to_datetime(previous_df["Datetime"])
         df = pd.concat([df, previous_df], ignore_index=True)
-        df = cleanup(df)
+        df = cleanup(df, scrub_pii=scrub_pii)
+        # Earlier exports saved without (or with a string) media column are classified again
+        df["Media"] = media_column(map(media_code, df["Message"].astype(str)))
+        if senders is not None:
+            df["Sender"] = senders.encode(df["Sender"])
 
     if group_name:
         logger.info(f"Adding group name {group_name} to the chat")
-        df["Group"] = group_name
-    return df 
\ No newline at end of file
+        df["Group"] = pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8), categories=[group_name])
+    return df
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import time
+import zipfile
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Set, Tuple, Union
+
+import pandas as pd
+from loguru import logger
+
+from src.core.store import MessageStore
+from src.core.utils import EXPORT_PATTERNS, chat_to_df, cleanup, parse_chat_tail
+
+# File name of the ingest manifest, kept in the store
+MANIFEST_NAME = "_watch.json"
+# Bytes at the start of an export that identify it
+HEAD_BYTES = 4096
+
+
+def _digest(path: Path, start: int, end: int) -> str:
+    """Hash a byte range of a file."""
+    with open(path, "rb") as file:
+        file.seek(start)
+        return hashlib.sha256(file.read(end - start)).hexdigest()
+
+
+class ExportWatcher:
+    """Ingests chat exports into a message store, reading only what changed since the last time.
+
+    A manifest in the store records, per export file, how far it was parsed, with hashes of its
+    first bytes and of its last ingested lines. An export that grew by appended lines only has its
+    tail parsed, starting from the first line of the last ingested timestamp so that messages
+    sharing that minute are replaced rather than duplicated. Anything else (a different or
+    rewritten export, or a zipped export, whose compressed bytes cannot be followed) is
+    re-ingested in full.
+    """
+
+    def __init__(self, store: MessageStore, on_ingest: Optional[Callable[[str, pd.DataFrame], None]] = None) -> None:
+        """Initialize the watcher and load its manifest.
+
+        Args:
+            store: Message store the exports are ingested into
+            on_ingest: Optional callback receiving the group and the messages of every delta stored,
+                e.g. to check them for spam as they arrive
+        """
+        self.store = store
+        self.on_ingest = on_ingest
+        self.manifest_path = store.root / MANIFEST_NAME
+        self.manifest: Dict[str, Dict[str, Union[int, str]]] = (
+            json.loads(self.manifest_path.read_text()) if self.manifest_path.exists() else {}
+        )
+
+    def _save_manifest(self) -> None:
+        """Write the manifest atomically."""
+        partial = self.manifest_path.with_name(f"{MANIFEST_NAME}.partial")
+        partial.write_text(json.dumps(self.manifest, indent=1))
+        partial.replace(self.manifest_path)
+
+    def _appended(self, path: Path, entry: Dict[str, Union[int, str]], size: int) -> bool:
+        """Check whether an export only had lines appended since it was last ingested.
+
+        Args:
+            path: Export file
+            entry: Manifest entry of the export
+            size: Current size of the file
+
+        Returns:
+            True if the ingested bytes are unchanged
+        """
+        if size < entry["end"]:
+            return False
+        head_end = min(HEAD_BYTES, entry["end"])
+        return (
+            _digest(path, 0, head_end) == entry["head"]
+            and _digest(path, entry["resume"], entry["end"]) == entry["tail"]
+        )
+
+    def ingest(self, path: Path) -> bool:
+        """Bring the store up to date with one export.
+
+        Args:
+            path: Export file; its stem names the group
+
+        Returns:
+            True if new messages were stored
+        """
+        key = str(path.resolve())
+        stat = path.stat()
+        entry = self.manifest.get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return False
+
+        group = path.stem
+        zipped = zipfile.is_zipfile(path)
+        if entry and not zipped and self._appended(path, entry, stat.st_size):
+            df, resume, end = parse_chat_tail(path, offset=entry["resume"])
+            logger.info(f"{path.name} grew by {end - entry['end']} bytes")
+            # Touched without new lines: the messages from resume on are stored already
+            df = cleanup(df) if end > entry["end"] else df.iloc[0:0]
+        else:
+            if zipped:
+                df, resume, end = chat_to_df(path), 0, stat.st_size
+            else:
+                # One pass yields both the messages and the offsets to resume from
+                df, resume, end = parse_chat_tail(path)
+                df = cleanup(df)
+            logger.info(f"{path.name} is new or was rewritten, ingesting {len(df)} messages")
+
+        if len(df):
+            self.store.write(df, group=group)
+            if self.on_ingest is not None:
+                self.on_ingest(group, df)
+        self.manifest[key] = {
+            "group": group,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "resume": resume,
+            "end": end,
+            "head": _digest(path, 0, min(HEAD_BYTES, end)),
+            "tail": _digest(path, resume, end),
+        }
+        self._save_manifest()
+        return len(df) > 0
+
+    def sync(self, paths: Iterable[Path]) -> Set[str]:
+        """Ingest a batch of exports.
+
+        Args:
+            paths: Export files
+
+        Returns:
+            Names of the groups that received new messages
+        """
+        return {path.stem for path in paths if path.exists() and self.ingest(path)}
+
+
+def _snapshot(directory: Path, patterns: Tuple[str, ...]) -> Dict[Path, Tuple[int, int]]:
+    """Map every matching file in a directory to its (size, mtime)."""
+    snapshot = {}
+    for path in (path for pattern in patterns for path in directory.glob(pattern)):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+def watch_exports(
+    directory: Union[str, Path],
+    patterns: Tuple[str, ...] = EXPORT_PATTERNS,
+    debounce: float = 2.0,
+    force_polling: bool = False,
+    poll_interval: float = 1.0,
+) -> Iterator[Set[Path]]:
+    """Yield batches of new or changed exports in a directory.
+
+    Uses file system notifications through watchfiles when it is installed, and polls file sizes
+    and modification times otherwise. Changes are debounced: a batch is only yielded once no
+    file has changed for `debounce` seconds, so a burst of copies triggers one recomputation.
+
+    Args:
+        directory: Directory to watch
+        patterns: Glob patterns of export files, defaults to text and zip exports
+        debounce: Seconds without changes before a batch is yielded, defaults to 2
+        force_polling: Whether to poll even when notifications are available, defaults to False
+        poll_interval: Seconds between polls, defaults to 1
+
+    Yields:
+        Sets of changed export paths
+    """
+    directory = Path(directory)
+    try:
+        import watchfiles
+    except ImportError:
+        watchfiles = None
+
+    if watchfiles is not None and not force_polling:
+        logger.info(f"Watching {directory} for {', '.join(patterns)} with file system notifications")
+        for changes in watchfiles.watch(
+            directory,
+            watch_filter=lambda change, path: (
+                change != watchfiles.Change.deleted and any(map(Path(path).match, patterns))
+            ),
+            # Yield once nothing changed for `debounce` seconds, or after ten times that while
+            # files keep changing
+            step=int(debounce * 1000),
+            debounce=int(debounce * 10_000),
+            recursive=False,
+        ):
+            yield {Path(path) for _, path in changes}
+        return
+
+    logger.info(f"Polling {directory} for {', '.join(patterns)} every {poll_interval}s")
+    previous = _snapshot(directory, patterns)
+    pending: Set[Path] = set()
+    last_change = time.monotonic()
+    while True:
+        time.sleep(poll_interval)
+        current = _snapshot(directory, patterns)
+        changed = {path for path, state in current.items() if previous.get(path) != state}
+        previous = current
+        if changed:
+            pending |= changed
+            last_change = time.monotonic()
+        elif pending and time.monotonic() - last_change >= debounce:
+            yield {path for path in pending if os.path.exists(path)}
+            pending = set()
@@ -0,0 +1,63 @@
+import gzip
+import hashlib
+from typing import Union
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from src.web.metrics import CACHE_LOOKUPS
+
+# Compressing smaller bodies costs more than it saves
+MIN_GZIP_SIZE = 512
+
+
+class CachedAsset:
+    """Response body rendered once at startup and served with an ETag and optional gzip.
+
+    Clients that send the ETag back in If-None-Match get an empty 304; clients that accept gzip
+    get the body compressed ahead of time, so serving the asset does no work per request.
+    """
+
+    def __init__(self, name: str, content: Union[str, bytes], media_type: str, max_age: int = 0) -> None:
+        """Encode, hash and compress the asset.
+
+        Args:
+            name: Asset name, used as the cache label in metrics
+            content: Body of the asset
+            media_type: Content type, e.g. "text/css"
+            max_age: Seconds clients may reuse the asset without revalidating, defaults to 0
+        """
+        self.name = name
+        self.body = content.encode() if isinstance(content, str) else content
+        self.media_type = media_type
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:16] + '"'
+        self.gzipped = gzip.compress(self.body, mtime=0) if len(self.body) >= MIN_GZIP_SIZE else None
+        self.headers = {
+            "ETag": self.etag,
+            "Cache-Control": f"public, max-age={max_age}" if max_age else "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+
+    @property
+    def version(self) -> str:
+        """Short content hash, for cache-busting query strings."""
+        return self.etag.strip('"')[:8]
+
+    def response(self, request: Request) -> Response:
+        """Serve the asset.
+
+        Args:
+            request: Incoming request
+
+        Returns:
+            304 if the client's copy is current, otherwise the (gzipped) body
+        """
+        if self.etag in request.headers.get("if-none-match", ""):
+            CACHE_LOOKUPS.inc(cache=self.name, result="hit")
+            return Response(status_code=304, headers=self.headers)
+        CACHE_LOOKUPS.inc(cache=self.name, result="miss")
+        if self.gzipped is not None and "gzip" in request.headers.get("accept-encoding", ""):
+            return Response(
+                self.gzipped, media_type=self.media_type, headers={**self.headers, "Content-Encoding": "gzip"}
+            )
+        return Response(self.body, media_type=self.media_type, headers=self.headers)
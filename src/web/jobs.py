@@ -0,0 +1,154 @@
+import hashlib
+import os
+import re
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+from loguru import logger
+
+from src.web.metrics import CACHE_LOOKUPS
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+# Results hold member names, so they are only kept as long as a download may still follow
+DEFAULT_MAX_AGE_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_JOBS = 200
+
+
+class ResultStore:
+    """On-disk store of analysis results shared by every worker process.
+
+    A job id is derived from the uploaded export and the analysis parameters, so re-uploading
+    the same export is served from disk, and whichever worker handles a download can find the
+    result written by another. Files are written to a temporary name and renamed into place, so
+    a reader never sees a partial result. Results older than max_age_seconds, and the oldest
+    beyond max_jobs, are deleted whenever a job is stored.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+        max_jobs: int = DEFAULT_MAX_JOBS,
+    ) -> None:
+        """Initialize the store.
+
+        Args:
+            directory: Directory for results, created if missing
+            max_age_seconds: Age after which a result is deleted, defaults to one day
+            max_jobs: Number of results kept, defaults to DEFAULT_MAX_JOBS
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_age_seconds = max_age_seconds
+        self.max_jobs = max_jobs
+
+    @staticmethod
+    def job_id(content: bytes, **params) -> str:
+        """Derive the job id of an analysis.
+
+        Args:
+            content: Uploaded export
+            **params: Analysis parameters
+
+        Returns:
+            32-character hex id
+        """
+        digest = hashlib.sha256(content)
+        for name, value in sorted(params.items()):
+            digest.update(f"\0{name}={value}".encode())
+        return digest.hexdigest()[:32]
+
+    def path(self, job_id: str, suffix: str) -> Path:
+        """Return the path of a job's result file.
+
+        Args:
+            job_id: Job id
+            suffix: File suffix, e.g. ".csv"
+
+        Returns:
+            Path inside the store
+
+        Raises:
+            ValueError: If the job id is malformed
+        """
+        if not JOB_ID_PATTERN.match(job_id):
+            raise ValueError(f"Invalid job id: {job_id!r}")
+        return self.directory / f"{job_id}{suffix}"
+
+    def csv_path(self, job_id: str) -> Optional[Path]:
+        """Return the CSV of a finished job.
+
+        Args:
+            job_id: Job id
+
+        Returns:
+            Path of the CSV, or None if the job is unknown
+        """
+        try:
+            path = self.path(job_id, ".csv")
+        except ValueError:
+            return None
+        return path if path.exists() else None
+
+    def load_page(self, job_id: str) -> Optional[str]:
+        """Return the rendered results page of a finished job.
+
+        Args:
+            job_id: Job id
+
+        Returns:
+            HTML of the results page, or None if the job has not run yet
+        """
+        path = self.path(job_id, ".html")
+        if path.exists():
+            CACHE_LOOKUPS.inc(cache="results", result="hit")
+            return path.read_text()
+        CACHE_LOOKUPS.inc(cache="results", result="miss")
+        return None
+
+    def save(self, job_id: str, csv: str, page: str) -> None:
+        """Store the results of a job.
+
+        The CSV is written before the page, since a stored page marks the job as finished.
+
+        Args:
+            job_id: Job id
+            csv: Results as CSV text
+            page: Rendered results page
+        """
+        for suffix, text in ((".csv", csv), (".html", page)):
+            path = self.path(job_id, suffix)
+            partial = path.with_name(f"{path.name}.{os.getpid()}.partial")
+            partial.write_text(text)
+            partial.replace(path)
+        logger.info(f"Stored results of job {job_id} in {self.directory}")
+        self.prune()
+
+    def prune(self) -> int:
+        """Delete expired results, and the oldest ones beyond max_jobs.
+
+        Returns:
+            Number of jobs deleted
+        """
+        files = {}
+        for path in self.directory.iterdir():
+            if JOB_ID_PATTERN.match(path.stem) and path.suffix in (".csv", ".html"):
+                try:
+                    files.setdefault(path.stem, []).append((path, path.stat().st_mtime))
+                except FileNotFoundError:  # Pruned by another worker
+                    continue
+        # A job is as old as its newest file
+        jobs = sorted(files, key=lambda job_id: max(mtime for _, mtime in files[job_id]), reverse=True)
+        cutoff = time.time() - self.max_age_seconds
+        expired = [
+            job_id
+            for rank, job_id in enumerate(jobs)
+            if rank >= self.max_jobs or max(mtime for _, mtime in files[job_id]) < cutoff
+        ]
+        for job_id in expired:
+            for path, _ in files[job_id]:
+                path.unlink(missing_ok=True)
+        if expired:
+            logger.info(f"Deleted {len(expired)} expired results from {self.directory}")
+        return len(expired)
@@ -1,73 +1,183 @@
+import asyncio
+import io
 import os
-from datetime import datetime
+import time
 from pathlib import Path
-from tempfile import NamedTemporaryFile
+from urllib.parse import urlencode
 
-from fasthtml.common import *
-from fasthtml.components import Head, Style
+# fasthtml.common also pulls in the database helpers (and with them pandas), so import only the
+# app class and the HTML components
+from fasthtml.components import (
+    H1,
+    A,
+    Body,
+    Button,
+    Div,
+    Form,
+    Head,
+    Html,
+    Input,
+    Label,
+    Link,
+    Meta,
+    Option,
+    P,
+    Select,
+    Span,
+    Table,
+    Tbody,
+    Td,
+    Th,
+    Thead,
+    Title,
+    Tr,
+    to_xml,
+)
+from fasthtml.core import FastHTML
 from loguru import logger
 from starlette.requests import Request
+from starlette.responses import FileResponse, HTMLResponse, JSONResponse
 
-from src.core.analysis import WhatsAppGroupAnalysis
-from src.core.utils import chat_to_df
+from src.core import profiling
+from src.web.assets import CachedAsset
+from src.web.jobs import DEFAULT_MAX_JOBS, ResultStore
+from src.web.metrics import ANALYSES_IN_PROGRESS, install, metrics_response
 
-# Configure logger
-logger.add("whatsapp_analyzer.log", rotation="1 MB", level="INFO")
+STATIC_DIR = Path(__file__).parent / "static"
+# Debug pages are only shown outside production (see `python wsgi.py --production`)
+DEBUG = os.environ.get("WHATSAPP_ENV", "development") != "production"
+# Results live on disk so that any worker can serve a job's download
+RESULTS = ResultStore(
+    os.environ.get("WHATSAPP_RESULTS_DIR", "temp"),
+    max_age_seconds=float(os.environ.get("WHATSAPP_RESULTS_MAX_AGE_HOURS", 24)) * 3600,
+    max_jobs=int(os.environ.get("WHATSAPP_RESULTS_MAX_JOBS", DEFAULT_MAX_JOBS)),
+)
+DEFAULT_DRAIN_TIMEOUT = 60.0
+# Full-text index searched by /search, built with `whatsapp-analyzer search-index` (or store-ingest/watch)
+SEARCH_INDEX = Path(os.environ.get("WHATSAPP_SEARCH_INDEX", "search.db"))
+SEARCH_PAGE_SIZE = 20
+# Result orders of src.core.search, not imported here so that pandas loads on the first request
+SEARCH_ORDERS = {"rank": "Best match", "newest": "Newest", "oldest": "Oldest"}
 
-# Initialize FastHTML app with debug mode
-app = FastHTML(debug=True)
 
-# Load CSS from file
-with open(Path(__file__).parent / "static" / "styles.css") as f:
-    FULL_CSS = f.read()
+def configure_logging():
+    """Log to a rotating file once the server starts, rather than on import."""
+    logger.add(os.environ.get("WHATSAPP_LOG_FILE", "whatsapp_analyzer.log"), rotation="1 MB", level="INFO")
 
 
-@rt("/")
-def get():
-    """Render the main page with the analysis form."""
-    return html(
-        head(
-            title("WhatsApp Group Analysis"),
-            meta(charset="utf-8"),
-            meta(name="viewport", content="width=device-width, initial-scale=1"),
-            Style(FULL_CSS),
-        ),
-        body(
-            div(
-                h1("WhatsApp Group Analysis"),
-                p("Upload a WhatsApp chat export to analyze group activity and identify inactive users."),
-                form(
-                    div(
-                        label("Chat Export File"),
-                        input(type="file", name="file", accept=".txt", required=True),
-                        class_="form-group",
-                    ),
-                    div(
-                        label("Window Days"),
-                        input(type="number", name="window_days", value="60", min="1", max="365", required=True),
-                        class_="form-group",
-                    ),
-                    div(
-                        label("Exclude Contacts"),
-                        input(type="checkbox", name="exclude_contacts"),
-                        class_="form-group",
+async def drain_analyses():
+    """On shutdown, wait for analyses still running in worker threads to finish."""
+    deadline = time.monotonic() + float(os.environ.get("WHATSAPP_DRAIN_TIMEOUT", DEFAULT_DRAIN_TIMEOUT))
+    while ANALYSES_IN_PROGRESS.value() > 0 and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    if ANALYSES_IN_PROGRESS.value() > 0:
+        logger.warning(f"Shutting down with {ANALYSES_IN_PROGRESS.value():.0f} analyses still running")
+
+
+# Initialize FastHTML app
+app = FastHTML(
+    debug=DEBUG,
+    on_startup=[configure_logging],
+    on_shutdown=[drain_analyses],
+    # Sessions are signed with WHATSAPP_SESSION_SECRET when set; otherwise FastHTML keeps a random
+    # key in .sesskey, which is git-ignored and must never be shared
+    secret_key=os.environ.get("WHATSAPP_SESSION_SECRET"),
+)
+rt = app.route
+install(app)
+
+# Styles are served once from memory with an ETag; pages link to them with a content hash
+STYLES = CachedAsset("styles.css", (STATIC_DIR / "styles.css").read_bytes(), "text/css", max_age=31536000)
+
+
+def page_head(page_title: str) -> Head:
+    """Build the head shared by every page.
+
+    Args:
+        page_title: Title of the page
+
+    Returns:
+        Head element
+    """
+    return Head(
+        Title(page_title),
+        Meta(charset="utf-8"),
+        Meta(name="viewport", content="width=device-width, initial-scale=1"),
+        Link(rel="stylesheet", href=f"/static/styles.css?v={STYLES.version}"),
+    )
+
+
+def back_button() -> A:
+    """Build the link back to the upload form."""
+    return A(
+        Span("←", cls="button-icon"),
+        Span("Back", cls="button-text"),
+        href="/",
+        cls="button-secondary back-button",
+    )
+
+
+INDEX_PAGE = CachedAsset(
+    "index",
+    to_xml(
+        Html(
+            page_head("WhatsApp Group Analysis"),
+            Body(
+                Div(
+                    H1("WhatsApp Group Analysis"),
+                    P(
+                        "Upload a WhatsApp chat export (.txt, or .zip with media) to analyze group activity and "
+                        "identify inactive users."
                     ),
-                    div(
-                        button("Analyze", type="submit"),
-                        class_="button-group",
+                    Form(
+                        Div(
+                            Label("Chat Export File"),
+                            Input(type="file", name="file", accept=".txt,.zip", required=True),
+                            cls="form-group",
+                        ),
+                        Div(
+                            Label("Window Days"),
+                            Input(type="number", name="window_days", value="60", min="1", max="365", required=True),
+                            cls="form-group",
+                        ),
+                        Div(
+                            Label("Exclude Contacts"),
+                            Input(type="checkbox", name="exclude_contacts"),
+                            cls="form-group",
+                        ),
+                        Div(
+                            Button("Analyze", type="submit"),
+                            cls="button-group",
+                        ),
+                        action="/analyze",
+                        method="post",
+                        enctype="multipart/form-data",
                     ),
-                    action="/analyze",
-                    method="post",
-                    enctype="multipart/form-data",
-                ),
-                class_="container",
-            )
-        ),
-    )
+                    cls="container",
+                )
+            ),
+        )
+    ),
+    "text/html; charset=utf-8",
+)
+
+
+@rt("/")
+def get(req: Request):
+    """Render the main page with the analysis form."""
+    return INDEX_PAGE.response(req)
+
+
+@rt("/static/styles.css", methods=["GET"])
+def styles(req: Request):
+    """Serve the stylesheet."""
+    return STYLES.response(req)
 
 
 def create_table_rows(results):
     """Create HTML table rows from analysis results."""
+    import pandas as pd
+
     rows = []
     for _, row in results.iterrows():
         cells = []
@@ -78,125 +188,227 @@ def create_table_rows(results):
                 value = row[col].strftime("%Y-%m-%d %H:%M:%S") if pd.notnull(row[col]) else "Unknown"
             else:
                 value = row[col]
-            cells.append(td(str(value)))
-        rows.append(tr(*cells))
+            cells.append(Td(str(value)))
+        rows.append(Tr(*cells))
     return rows
 
 
-@rt("/analyze", methods=["POST"])
-async def analyze(req):
-    """Handle the analysis form submission."""
-    try:
-        form = await req.form()
-        file = form["file"]
-        window_days = int(form["window_days"])
-        exclude_contacts = "exclude_contacts" in form
+def run_analysis(content: bytes, window_days: int, exclude_contacts: bool):
+    """Analyze an uploaded export; runs in a worker thread so the event loop stays responsive.
 
-        # Save uploaded file
-        with NamedTemporaryFile(delete=False, suffix=".txt") as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_path = Path(temp_file.name)
+    Args:
+        content: Uploaded chat export, as text or a zip with media
+        window_days: Number of days to consider for inactivity
+        exclude_contacts: Whether to exclude saved contacts
 
-        # Analyze the chat
-        df = chat_to_df(temp_path)
+    Returns:
+        DataFrame of the users inactive in the window
+    """
+    # The analysis pipeline is imported on the first analysis to keep startup fast
+    from src.core.analysis import WhatsAppGroupAnalysis
+    from src.core.utils import chat_to_df
+
+    with profiling.span("web.analyze") as request_span:
+        # Parsed straight from memory; a zipped export only has its chat log decompressed
+        df = chat_to_df(io.BytesIO(content))
         analysis = WhatsAppGroupAnalysis(df)
-        inactive_users = analysis.get_inactive_users(exclude_contacts=exclude_contacts)
-        message_counts = analysis.get_message_count_in_window(window_days=window_days)
-        result = pd.merge(inactive_users, message_counts, on="User", how="left")
-
-        # Clean up temp file
-        os.unlink(temp_path)
-
-        # Create download file
-        download_path = Path("temp") / f"analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        download_path.parent.mkdir(exist_ok=True)
-        result.to_csv(download_path, sep="|", index=False)
-
-        return html(
-            head(
-                title("Analysis Results"),
-                meta(charset="utf-8"),
-                meta(name="viewport", content="width=device-width, initial-scale=1"),
-                Style(FULL_CSS),
-            ),
-            body(
-                div(
-                    h1("Analysis Results"),
-                    p(f"Found {len(result)} inactive users in the chat."),
-                    div(
-                        table(
-                            thead(
-                                tr(
-                                    *[th(col.replace("_", " ").title()) for col in result.columns]
-                                )
-                            ),
-                            tbody(*create_table_rows(result)),
-                            class_="table",
+        result = analysis.get_inactive_users(exclude_contacts=exclude_contacts, windows=[window_days])
+        if request_span is not None:
+            request_span.rows_in, request_span.rows_out = len(df), len(result)
+    return result
+
+
+def results_page(result, job_id: str) -> str:
+    """Render the results page of a job.
+
+    Args:
+        result: DataFrame returned by run_analysis
+        job_id: Job id, used for the download link
+
+    Returns:
+        HTML of the page
+    """
+    return to_xml(
+        Html(
+            page_head("Analysis Results"),
+            Body(
+                Div(
+                    H1("Analysis Results"),
+                    P(f"Found {len(result)} inactive users in the chat."),
+                    Div(
+                        Table(
+                            Thead(Tr(*[Th(col.replace("_", " ").title()) for col in result.columns])),
+                            Tbody(*create_table_rows(result)),
+                            cls="table",
                         ),
-                        class_="table-container",
+                        cls="table-container",
                     ),
-                    div(
-                        a(
-                            span("⬇️", class_="button-icon"),
-                            span("Download Results", class_="button-text"),
-                            href="/downloadfile",
-                            class_="button-secondary download-button",
-                        ),
-                        a(
-                            span("←", class_="button-icon"),
-                            span("Back", class_="button-text"),
-                            href="/",
-                            class_="button-secondary back-button",
+                    Div(
+                        A(
+                            Span("⬇️", cls="button-icon"),
+                            Span("Download Results", cls="button-text"),
+                            href=f"/downloadfile/{job_id}",
+                            cls="button-secondary download-button",
                         ),
-                        class_="button-group",
+                        back_button(),
+                        cls="button-group",
                     ),
-                    class_="container",
+                    cls="container",
                 )
             ),
         )
+    )
+
+
+@rt("/analyze", methods=["POST"])
+async def analyze(req):
+    """Handle the analysis form submission."""
+    try:
+        form = await req.form()
+        content = await form["file"].read()
+        window_days = int(form["window_days"])
+        exclude_contacts = "exclude_contacts" in form
+
+        job_id = RESULTS.job_id(content, window_days=window_days, exclude_contacts=exclude_contacts)
+        page = RESULTS.load_page(job_id)
+        if page is None:
+            with ANALYSES_IN_PROGRESS.track():
+                result = await asyncio.to_thread(run_analysis, content, window_days, exclude_contacts)
+            page = results_page(result, job_id)
+            RESULTS.save(job_id, result.to_csv(sep="|", index=False), page)
+        return HTMLResponse(page)
     except Exception as e:
         logger.error(f"Error during analysis: {str(e)}")
         return error_response(str(e))
 
 
-@rt("/downloadfile", methods=["GET"])
-async def get(req: Request):
+@rt("/downloadfile/{job_id}", methods=["GET"])
+async def download(req: Request, job_id: str):
     """Handle file downloads."""
     try:
-        download_path = Path("temp") / f"analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        if not download_path.exists():
+        download_path = RESULTS.csv_path(job_id)
+        if download_path is None:
             return error_response("File not found", 404)
-        return FileResponse(download_path)
+        return FileResponse(download_path, filename=f"analysis_{job_id[:8]}.csv", media_type="text/csv")
     except Exception as e:
         logger.error(f"Error during file download: {str(e)}")
         return error_response(str(e))
 
 
+def search_form(params) -> Form:
+    """Build the search form, filled in with the current query parameters."""
+    order = params.get("order", "rank")
+    return Form(
+        Div(Label("Search"), Input(type="text", name="q", value=params.get("q", ""), required=True), cls="form-group"),
+        Div(Label("Group"), Input(type="text", name="group", value=params.get("group", "")), cls="form-group"),
+        Div(Label("Sender"), Input(type="text", name="sender", value=params.get("sender", "")), cls="form-group"),
+        Div(Label("Since"), Input(type="date", name="since", value=params.get("since", "")), cls="form-group"),
+        Div(Label("Until"), Input(type="date", name="until", value=params.get("until", "")), cls="form-group"),
+        Div(
+            Label("Order"),
+            Select(
+                *[Option(title, value=value, selected=value == order) for value, title in SEARCH_ORDERS.items()],
+                name="order",
+            ),
+            cls="form-group",
+        ),
+        Div(Button("Search", type="submit"), cls="button-group"),
+        action="/search",
+        method="get",
+    )
+
+
+@rt("/search", methods=["GET"])
+def search(req: Request):
+    """Search the message archive; add format=json for a JSON response."""
+    from datetime import date
+
+    from src.core.search import SearchIndex
+
+    params = req.query_params
+    query = params.get("q", "").strip()
+    if not query:
+        return HTMLResponse(
+            to_xml(Html(page_head("Search"), Body(Div(H1("Search"), search_form(params), cls="container"))))
+        )
+    try:
+        page = max(int(params.get("page", 1)), 1)
+        filters = dict(
+            groups=[params["group"]] if params.get("group") else None,
+            sender=params.get("sender") or None,
+            since=date.fromisoformat(params["since"]) if params.get("since") else None,
+            until=date.fromisoformat(params["until"]) if params.get("until") else None,
+        )
+        index = SearchIndex(SEARCH_INDEX, read_only=True)
+        try:
+            result = index.search(
+                query, order=params.get("order", "rank"), limit=SEARCH_PAGE_SIZE, page=page, **filters
+            )
+            total = index.count(query, **filters)
+        finally:
+            index.close()
+    except FileNotFoundError as e:
+        return error_response(str(e), 404)
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    result["Datetime"] = result["Datetime"].dt.strftime("%Y-%m-%d %H:%M:%S")
+    if params.get("format") == "json":
+        return JSONResponse({"total": total, "page": page, "results": result.to_dict(orient="records")})
+
+    def page_link(number: int, text: str) -> A:
+        return A(text, href=f"/search?{urlencode({**params, 'page': number})}", cls="button-secondary")
+
+    pages = [page_link(page - 1, "Previous")] if page > 1 else []
+    if page * SEARCH_PAGE_SIZE < total:
+        pages.append(page_link(page + 1, "Next"))
+    return HTMLResponse(
+        to_xml(
+            Html(
+                page_head("Search Results"),
+                Body(
+                    Div(
+                        H1("Search"),
+                        search_form(params),
+                        P(f"{total} matching messages, page {page}."),
+                        Div(
+                            Table(
+                                Thead(Tr(*[Th(col) for col in result.columns])),
+                                Tbody(*create_table_rows(result)),
+                                cls="table",
+                            ),
+                            cls="table-container",
+                        ),
+                        Div(*pages, back_button(), cls="button-group"),
+                        cls="container",
+                    )
+                ),
+            )
+        )
+    )
+
+
+@rt("/metrics", methods=["GET"])
+def metrics(req: Request):
+    """Expose request, upload and pipeline metrics for Prometheus."""
+    return metrics_response(req)
+
+
 def error_response(message: str, status_code: int = 500):
     """Return an error response page."""
-    return html(
-        head(
-            title("Error"),
-            meta(charset="utf-8"),
-            meta(name="viewport", content="width=device-width, initial-scale=1"),
-            Style(FULL_CSS),
-        ),
-        body(
-            div(
-                h1("Error"),
-                div(message, class_="error"),
-                div(
-                    a(
-                        span("←", class_="button-icon"),
-                        span("Back", class_="button-text"),
-                        href="/",
-                        class_="button-secondary back-button",
-                    ),
-                    class_="button-group",
+    return HTMLResponse(
+        to_xml(
+            Html(
+                page_head("Error"),
+                Body(
+                    Div(
+                        H1("Error"),
+                        Div(message, cls="error"),
+                        Div(back_button(), cls="button-group"),
+                        cls="container",
+                    )
                 ),
-                class_="container",
             )
         ),
         status_code=status_code,
-    ) 
\ No newline at end of file
+    )
@@ -0,0 +1,529 @@
+import atexit
+import bisect
+import copy
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Match
+
+from src.core.profiling import PROFILER, Span
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = tuple(1024 * 4**power for power in range(10))  # 1 KiB .. 256 MiB
+THROUGHPUT_BUCKETS = tuple(1000 * 2**power for power in range(12))  # 1k .. 2M rows per second
+# Seconds between the snapshots a worker writes for the others to aggregate
+FLUSH_INTERVAL = 5.0
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Format a label set in the Prometheus text format.
+
+    Args:
+        names: Label names
+        values: Label values
+        extra: Optional pre-formatted label appended last, e.g. 'le="0.5"'
+
+    Returns:
+        Label set including braces, or an empty string if there are no labels
+    """
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value in the Prometheus text format."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Base class for a metric family with optional labels."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        """Initialize the metric.
+
+        Args:
+            name: Metric name
+            documentation: Help text
+            labels: Label names
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        """Return the label values of a sample in label-name order.
+
+        Raises:
+            ValueError: If the label names do not match the metric's
+        """
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def snapshot(self) -> List[list]:
+        """Return the samples as JSON-serializable [label values, value] pairs."""
+        with self._lock:
+            return [[list(key), copy.deepcopy(value)] for key, value in self.values.items()]
+
+    def merge(self, snapshots: Iterable[List[list]], live: Iterable[bool]) -> Dict[Tuple[str, ...], Any]:
+        """Combine the snapshots of several processes into one set of samples.
+
+        Args:
+            snapshots: Snapshots of the metric, one per process
+            live: Whether each process is still running
+
+        Returns:
+            Values by label values, as held in self.values
+        """
+        raise NotImplementedError
+
+    def samples(self, values: Optional[Dict[Tuple[str, ...], Any]] = None) -> List[str]:
+        """Return the sample lines of the metric.
+
+        Args:
+            values: Optional values to render instead of the metric's own, e.g. merged ones
+        """
+        raise NotImplementedError
+
+    def render(self, values: Optional[Dict[Tuple[str, ...], Any]] = None) -> str:
+        """Render the metric family in the Prometheus text format.
+
+        Args:
+            values: Optional values to render instead of the metric's own, e.g. merged ones
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples(values))
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        """Initialize the counter; see Metric."""
+        super().__init__(name, documentation, labels)
+        self.values: Dict[Tuple[str, ...], float] = {} if labels else {(): 0.0}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increment the counter.
+
+        Args:
+            amount: Non-negative increment, defaults to 1
+            **labels: Label values
+        """
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def merge(self, snapshots: Iterable[List[list]], live: Iterable[bool]) -> Dict[Tuple[str, ...], float]:
+        """Add up the counts of every process, including exited ones, so the total never drops."""
+        merged: Dict[Tuple[str, ...], float] = {}
+        for snapshot in snapshots:
+            for key, value in snapshot:
+                merged[tuple(key)] = merged.get(tuple(key), 0.0) + value
+        return merged
+
+    def samples(self, values: Optional[Dict[Tuple[str, ...], float]] = None) -> List[str]:
+        """Return the sample lines of the counter."""
+        if values is None:
+            with self._lock:
+                values = dict(self.values)
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Gauge(Counter):
+    """Value that can go up and down, e.g. requests in flight."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), aggregate: str = "sum") -> None:
+        """Initialize the gauge.
+
+        Args:
+            name: Metric name
+            documentation: Help text
+            labels: Label names
+            aggregate: How the values of several worker processes combine, 'sum' (e.g. requests in
+                flight) or 'max'; either way only running processes count, defaults to 'sum'
+
+        Raises:
+            ValueError: If aggregate is neither 'sum' nor 'max'
+        """
+        if aggregate not in ("sum", "max"):
+            raise ValueError("aggregate must be 'sum' or 'max'")
+        super().__init__(name, documentation, labels)
+        self.aggregate = aggregate
+
+    def merge(self, snapshots: Iterable[List[list]], live: Iterable[bool]) -> Dict[Tuple[str, ...], float]:
+        """Sum or take the maximum of the values of the running processes."""
+        combine = max if self.aggregate == "max" else (lambda a, b: a + b)
+        merged: Dict[Tuple[str, ...], float] = {}
+        for snapshot, running in zip(snapshots, live, strict=True):
+            if not running:
+                continue
+            for key, value in snapshot:
+                merged[tuple(key)] = combine(merged[tuple(key)], value) if tuple(key) in merged else value
+        return merged
+
+    def value(self, **labels: str) -> float:
+        """Return the current value of the gauge.
+
+        Args:
+            **labels: Label values
+
+        Returns:
+            Current value, 0 if never set
+        """
+        return self.values.get(self._key(labels), 0.0)
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        """Decrement the gauge.
+
+        Args:
+            amount: Decrement, defaults to 1
+            **labels: Label values
+        """
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the gauge.
+
+        Args:
+            value: New value
+            **labels: Label values
+        """
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = value
+
+    @contextmanager
+    def track(self, **labels: str) -> Iterator[None]:
+        """Increment the gauge for the duration of a block."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(Metric):
+    """Distribution of observations in cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        """Initialize the histogram.
+
+        Args:
+            name: Metric name
+            documentation: Help text
+            labels: Label names
+            buckets: Sorted upper bounds of the buckets; +Inf is added automatically
+        """
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record an observation.
+
+        Args:
+            value: Observed value
+            **labels: Label values
+        """
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def merge(self, snapshots: Iterable[List[list]], live: Iterable[bool]) -> Dict[Tuple[str, ...], list]:
+        """Add up the bucket counts and sums of every process, including exited ones."""
+        merged: Dict[Tuple[str, ...], list] = {}
+        for snapshot in snapshots:
+            for key, (counts, total) in snapshot:
+                entry = merged.setdefault(tuple(key), [[0] * len(counts), 0.0])
+                entry[0] = [a + b for a, b in zip(entry[0], counts, strict=True)]
+                entry[1] += total
+        return merged
+
+    def samples(self, values: Optional[Dict[Tuple[str, ...], list]] = None) -> List[str]:
+        """Return the bucket, sum and count lines of the histogram."""
+        if values is None:
+            with self._lock:
+                values = {key: (list(counts), total) for key, (counts, total) in self.values.items()}
+        lines = []
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts, strict=True):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together by the /metrics endpoint.
+
+    Every worker process has its own registry. With a shared directory, each one writes a
+    snapshot of its values there (every FLUSH_INTERVAL seconds, when rendering and on exit), and
+    rendering merges the snapshots of all of them, so a scrape of any worker reports the whole
+    server: counters and histograms add up over every process that ever ran, gauges over the
+    running ones.
+    """
+
+    def __init__(self, directory: Optional[Union[str, Path]] = None) -> None:
+        """Initialize an empty registry.
+
+        Args:
+            directory: Optional directory shared by the worker processes of one server; it should
+                be emptied before they start (see wsgi.py). Without it, only this process is reported
+        """
+        self.metrics: Dict[str, Metric] = {}
+        self.directory = Path(directory) if directory else None
+        self._flusher: Optional[threading.Thread] = None
+
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric to the registry.
+
+        Args:
+            metric: Metric to add
+
+        Returns:
+            The metric, for assignment at module level
+
+        Raises:
+            ValueError: If a metric with the same name is already registered
+        """
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def write_snapshot(self) -> None:
+        """Write this process's values to the shared directory, atomically."""
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{os.getpid()}.json"
+        partial = path.with_name(f"{path.name}.partial")
+        partial.write_text(json.dumps({name: metric.snapshot() for name, metric in self.metrics.items()}))
+        partial.replace(path)
+
+    def start_flushing(self, interval: float = FLUSH_INTERVAL) -> None:
+        """Write snapshots in a background thread and on exit; does nothing without a directory.
+
+        Args:
+            interval: Seconds between snapshots, defaults to FLUSH_INTERVAL
+        """
+        if self.directory is None or self._flusher is not None:
+            return
+
+        def flush() -> None:
+            while True:
+                time.sleep(interval)
+                self.write_snapshot()
+
+        self._flusher = threading.Thread(target=flush, name="metrics-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.write_snapshot)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text format, merged over the worker processes."""
+        if self.directory is None:
+            return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+        self.write_snapshot()
+        snapshots, live = [], []
+        for path in sorted(self.directory.glob("*.json")):
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, json.JSONDecodeError):
+                continue
+            live.append(_running(int(path.stem)))
+        return (
+            "\n".join(
+                metric.render(metric.merge([snapshot.get(name, []) for snapshot in snapshots], live))
+                for name, metric in self.metrics.items()
+            )
+            + "\n"
+        )
+
+
+def _running(pid: int) -> bool:
+    """Check whether a process is still running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Set by wsgi.py when it starts several workers
+REGISTRY = MetricsRegistry(os.environ.get("WHATSAPP_METRICS_DIR"))
+
+REQUESTS = REGISTRY.register(
+    Counter("whatsapp_http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+)
+REQUEST_LATENCY = REGISTRY.register(
+    Histogram("whatsapp_http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+)
+REQUESTS_IN_PROGRESS = REGISTRY.register(Gauge("whatsapp_http_requests_in_progress", "HTTP requests being served"))
+UPLOAD_SIZE = REGISTRY.register(
+    Histogram("whatsapp_upload_size_bytes", "Size of uploaded chat exports", ("route",), buckets=SIZE_BUCKETS)
+)
+ANALYSES_IN_PROGRESS = REGISTRY.register(
+    Gauge("whatsapp_analyses_in_progress", "Chat analyses running or waiting for a worker")
+)
+CACHE_LOOKUPS = REGISTRY.register(
+    Counter("whatsapp_cache_requests_total", "Cache lookups by cache and result (hit/miss)", ("cache", "result"))
+)
+STARTUP_TIME = REGISTRY.register(
+    Gauge("whatsapp_startup_seconds", "Time to import and build the web app", aggregate="max")
+)
+STAGE_LATENCY = REGISTRY.register(
+    Histogram("whatsapp_stage_duration_seconds", "Duration of pipeline stages (parsing, analysis)", ("stage",))
+)
+STAGE_ROWS = REGISTRY.register(Counter("whatsapp_stage_rows_total", "Rows produced by pipeline stages", ("stage",)))
+PARSE_THROUGHPUT = REGISTRY.register(
+    Histogram(
+        "whatsapp_parse_rows_per_second",
+        "Messages parsed per second for each uploaded export",
+        buckets=THROUGHPUT_BUCKETS,
+    )
+)
+
+
+def observe_span(span: Span) -> None:
+    """Profiler listener recording pipeline stages.
+
+    Args:
+        span: Finished span
+    """
+    STAGE_LATENCY.observe(span.duration, stage=span.name)
+    if span.rows_out:
+        STAGE_ROWS.inc(span.rows_out, stage=span.name)
+        if span.name == "parse_chat" and span.duration > 0:
+            PARSE_THROUGHPUT.observe(span.rows_out / span.duration)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latency and upload sizes.
+
+    Requests are labelled with the matched route's path template rather than the raw path, so
+    that unknown URLs cannot blow up the number of time series.
+    """
+
+    def __init__(self, app) -> None:
+        """Wrap an ASGI app.
+
+        Args:
+            app: ASGI application
+        """
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        """Serve a request and record its metrics."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # Started in the worker serving requests, not in a parent process that only imported the app
+        REGISTRY.start_flushing()
+
+        route = _route_name(scope)
+        method = scope["method"]
+        status = {"code": 500}
+        if method == "POST":
+            content_length = dict(scope["headers"]).get(b"content-length")
+            if content_length and content_length.isdigit():
+                UPLOAD_SIZE.observe(int(content_length), route=route)
+
+        async def send_with_status(message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            with REQUESTS_IN_PROGRESS.track():
+                await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_LATENCY.observe(time.perf_counter() - start, method=method, route=route)
+            REQUESTS.inc(method=method, route=route, status=str(status["code"]))
+
+
+def _route_name(scope) -> str:
+    """Return the path template of the route matching a request.
+
+    Args:
+        scope: ASGI scope of the request
+
+    Returns:
+        Route path, or "other" if no route matches
+    """
+    for route in getattr(scope.get("app"), "routes", ()):
+        if route.matches(scope)[0] == Match.FULL:
+            return getattr(route, "path", "other")
+    return "other"
+
+
+def metrics_response(request: Optional[Request] = None) -> Response:
+    """Render the registry for a Prometheus scrape.
+
+    Args:
+        request: Incoming request, unused
+
+    Returns:
+        Plain-text response in the Prometheus exposition format
+    """
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+def install(app) -> None:
+    """Record metrics for an app: add the middleware and hook into the pipeline profiler.
+
+    Args:
+        app: Starlette (FastHTML) application, before it starts serving
+    """
+    app.add_middleware(MetricsMiddleware)
+    if observe_span not in PROFILER.listeners:
+        PROFILER.listeners.append(observe_span)
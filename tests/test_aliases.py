@@ -0,0 +1,73 @@
+import pandas as pd
+
+from src.core.aliases import AliasIndex, member_key
+
+LRM = "\u200e"
+
+
+def messages(rows) -> pd.DataFrame:
+    """Build a message DataFrame from (sender, message) pairs."""
+    return pd.DataFrame(rows, columns=["Sender", "Message"])
+
+
+def test_member_key():
+    assert member_key("+91 98765 43210") == member_key("@919876543210") == "tel:919876543210"
+    assert member_key("~ Rahul") == member_key("Rahul") == "name:Rahul"
+    # Case is kept: only an event links "Rahul" and "rahul"
+    assert member_key("rahul") != member_key("Rahul")
+
+
+def test_system_events_link_aliases():
+    index = AliasIndex.from_messages(
+        messages(
+            [
+                ("+91 98765 43210", f"{LRM}Carol joined using this group's invite link"),
+                ("Carol", "hi all"),
+                ("+1 555 010 0000", f"{LRM}Dave changed their phone number to +1 555 010 9999"),
+            ]
+        )
+    )
+    assert index.canonical("+91 98765 43210") == index.canonical("Carol")
+    # The member is labelled by name rather than by number
+    assert index.display_name(index.canonical("@919876543210")) == "Carol"
+    assert index.canonical("Dave") == index.canonical("+1 555 010 9999")
+
+
+def test_member_text_does_not_link_members():
+    index = AliasIndex.from_messages(
+        messages(
+            [
+                ("Alice", "the bus already left"),
+                ("Bob", "the bus already left"),
+                ("alice", "i am a different alice"),
+                ("+91 98765 43210", f"{LRM}Carol left"),
+            ]
+        )
+    )
+    assert index.canonical("Alice") != index.canonical("Bob")
+    assert index.canonical("Alice") != index.canonical("alice")
+    assert index.canonical("+91 98765 43210") == index.canonical("Carol")
+
+
+def test_group_attributed_events_are_not_linked():
+    # Exports attributing system messages to the group show one sender with many subjects
+    index = AliasIndex.from_messages(
+        messages(
+            [
+                ("Group", f"{LRM}Carol joined using this group's invite link"),
+                ("Group", f"{LRM}Dave joined using this group's invite link"),
+            ]
+        )
+    )
+    # Neither subject is linked to the group, or registered through it
+    assert index.canonical("Carol") is None and index.canonical("Dave") is None
+    assert len(index.members()) == 1
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = AliasIndex().add_aliases([("Carol", "+91 98765 43210"), ("Dave", "+1 555 010 0000")])
+    index.save(tmp_path / "aliases.json")
+    loaded = AliasIndex.load(tmp_path / "aliases.json")
+    assert loaded.canonical("@919876543210") == loaded.canonical("Carol")
+    assert loaded.canonical("Carol") != loaded.canonical("Dave")
+    assert loaded.display_name(loaded.canonical("+1 555 010 0000")) == "Dave"
@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_export
+from src.core.analysis import WhatsAppGroupAnalysis
+from src.core.utils import chat_to_df
+
+
+@pytest.fixture(scope="module")
+def messages(tmp_path_factory) -> pd.DataFrame:
+    """Parse a small synthetic export."""
+    path = tmp_path_factory.mktemp("exports") / "group.txt"
+    generate_export(path, n_messages=3000, n_members=150, days=200, seed=11)
+    return chat_to_df(path)
+
+
+def test_single_window_matches_default_report(messages):
+    analysis = WhatsAppGroupAnalysis(messages.copy())
+    expected = analysis.get_inactive_users()
+    actual = analysis.get_inactive_users(windows=[60])
+    assert len(actual) > 0 and actual["Inactive_60d"].all()
+    assert set(actual["User"]) == set(expected["User"])
+
+
+def test_multiple_windows_match_one_window_at_a_time(messages):
+    analysis = WhatsAppGroupAnalysis(messages.copy())
+    windows = [180, 30, 90]
+    report = analysis.get_inactive_users(windows=windows)
+    assert list(report.columns[-3:]) == ["Inactive_30d", "Inactive_90d", "Inactive_180d"]
+    for days in windows:
+        alone = analysis.get_inactive_users(windows=[days])
+        assert set(report.loc[report[f"Inactive_{days}d"], "User"]) == set(alone["User"])
+    # Inactive for 180 days implies inactive for 90, and for 90 implies 30
+    assert (report["Inactive_30d"] >= report["Inactive_90d"]).all()
+    assert (report["Inactive_90d"] >= report["Inactive_180d"]).all()
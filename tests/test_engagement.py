@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from src.core.scoring import EngagementTracker
+
+NAMES = ["Asha", "Ravi", "Meera"]
+
+
+def messages():
+    """Messages of three members over two months, with several sharing a minute."""
+    rng = np.random.default_rng(5)
+    offsets = np.sort(rng.integers(0, 60 * 24 * 60, size=500))
+    offsets[100:110] = offsets[100]
+    times = np.datetime64("2024-01-01T00:00") + offsets.astype("timedelta64[m]")
+    return rng.integers(-1, len(NAMES), size=len(times)), times
+
+
+def test_incremental_updates_match_one_pass():
+    codes, times = messages()
+    as_of = times[-1] + np.timedelta64(3, "D")
+    one_pass = EngagementTracker(decay_days=10)
+    one_pass.update(codes, times, NAMES, as_of=as_of)
+
+    incremental = EngagementTracker(decay_days=10)
+    # Exports overlap and are cut in the middle of a minute shared by several messages
+    for stop in (105, 300, len(times)):
+        incremental.update(codes[:stop], times[:stop], NAMES)
+    assert incremental.update(codes, times, NAMES) == 0
+
+    expected = one_pass.engagement()
+    actual = incremental.engagement(as_of)
+    assert set(actual) == set(expected)
+    for key, score in expected.items():
+        assert actual[key] == pytest.approx(score)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    codes, times = messages()
+    tracker = EngagementTracker(decay_days=7, model="half-life")
+    tracker.update(codes[:200], times[:200], NAMES)
+    tracker.save(tmp_path / "engagement.json")
+    loaded = EngagementTracker.load(tmp_path / "engagement.json")
+    tracker.update(codes, times, NAMES)
+    loaded.update(codes, times, NAMES)
+    assert loaded.engagement() == pytest.approx(tracker.engagement())
+
+
+def test_windowed_model_is_rejected():
+    with pytest.raises(ValueError):
+        EngagementTracker(model="windowed")
@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_export
+from src.core.engine import make_analysis, top_senders
+from src.core.utils import chat_to_df
+
+pytest.importorskip("duckdb")
+# The community stats script is run from its own directory and imports its neighbours directly
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "whatsapp-moderation"))
+from private_community_stats import get_top_senders  # noqa: E402
+
+
+@pytest.fixture(scope="module", params=["ios", "android"])
+def messages(request, tmp_path_factory) -> pd.DataFrame:
+    """Parse a small synthetic export of each platform's format."""
+    path = tmp_path_factory.mktemp("exports") / f"{request.param}.txt"
+    generate_export(path, n_messages=3000, n_members=150, platform=request.param, days=200, seed=7)
+    return chat_to_df(path)
+
+
+def analyses(df: pd.DataFrame):
+    """Build the same group's analysis on the pandas and the DuckDB engine."""
+    return make_analysis(df.copy(), engine="pandas"), make_analysis(df.copy(), engine="duckdb")
+
+
+def test_get_current_users_matches_pandas(messages):
+    expected, actual = (analysis.get_current_users() for analysis in analyses(messages))
+    pd.testing.assert_frame_equal(expected[0], actual[0])
+    assert expected[1] == actual[1]
+
+
+@pytest.mark.parametrize("windows", [None, [30, 90, 180]])
+def test_get_inactive_users_matches_pandas(messages, windows):
+    expected, actual = (analysis.get_inactive_users(windows=windows) for analysis in analyses(messages))
+    assert len(expected) > 0
+    pd.testing.assert_frame_equal(expected, actual)
+
+
+def test_get_message_count_in_window_matches_pandas(messages):
+    expected, actual = (analysis.get_message_count_in_window(30) for analysis in analyses(messages))
+    pd.testing.assert_frame_equal(expected, actual)
+
+
+@pytest.mark.parametrize("freq", ["W", "M"])
+def test_top_senders_matches_pandas(messages, freq):
+    expected = get_top_senders(messages[["Datetime", "Sender", "Message"]].copy(), freq, k=3)
+    actual = top_senders(messages, freq, k=3)
+    assert len(expected) > 0
+    pd.testing.assert_frame_equal(expected.reset_index(drop=True), actual, check_dtype=False, check_index_type=False)
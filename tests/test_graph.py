@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("scipy")
+
+from src.core.analysis import WhatsAppGroupAnalysis  # noqa: E402
+from src.core.graph import InteractionGraph  # noqa: E402
+
+
+def graph(weights=None) -> InteractionGraph:
+    """Two pairs talking among themselves (0-1 and 2-3), 2 mentioning 1, and 4 silent."""
+    minutes = np.array([0, 1, 2, 3, 60, 61, 62, 63])
+    times = np.datetime64("2024-01-01T09:00") + minutes.astype("timedelta64[m]")
+    codes = np.array([0, 1, 0, 1, 2, 3, 2, 3])
+    # The message in row 4, sent by 2, mentions 1
+    mentions = (np.array([4]), np.array([1]))
+    return InteractionGraph.from_messages(times, codes, 5, np.timedelta64(5, "m"), mentions=mentions, weights=weights)
+
+
+def test_replies_and_mentions():
+    edges = graph().edges().set_index(["Source", "Target"])
+    # 1 replied to 0 twice, 0 to 1 once; the hour-long pause separates the two conversations
+    assert edges.loc[(1, 0), "Replies"] == 2
+    assert edges.loc[(0, 1), "Replies"] == 1
+    assert edges.loc[(3, 2), "Replies"] == 2
+    assert edges.loc[(2, 1), ["Replies", "Mentions"]].tolist() == [0, 1]
+    assert len(edges) == 5
+
+
+def test_metrics():
+    interactions = graph(weights={"mentions": 0})
+    out_degree, in_degree, partners = interactions.degrees()
+    assert out_degree.tolist() == [1, 2, 1, 2, 0]
+    assert partners.tolist() == [1, 1, 1, 1, 0]
+    rank = interactions.pagerank()
+    assert rank.sum() == pytest.approx(1)
+    communities = interactions.communities()
+    assert communities[0] == communities[1] != communities[2] == communities[3]
+    assert communities[4] == -1
+    assert interactions.modularity(communities) == pytest.approx(0.5)
+    components = interactions.components()
+    assert components[0] == components[1] and components[0] != components[2]
+
+
+def test_analysis_graph_skips_system_messages():
+    df = pd.DataFrame(
+        {
+            "Datetime": pd.to_datetime(
+                ["2024-01-01 09:00", "2024-01-01 09:01", "2024-01-01 09:02", "2024-01-01 09:03"]
+            ),
+            "Sender": ["Asha", "System", "Ravi", "Asha"],
+            "Message": ["hello", "Ravi joined using this group's invite link", "hi Asha", "welcome Ravi"],
+        }
+    )
+    analysis = WhatsAppGroupAnalysis(df)
+    edges = analysis.get_interaction_graph(gap_minutes=5).edges()
+    names = analysis.senders.names
+    pairs = {(names[source], names[target]) for source, target in zip(edges["Source"], edges["Target"], strict=True)}
+    assert pairs == {("Asha", "Ravi")}
+
+
+def test_graph_without_interactions():
+    times = np.array(["2024-01-01T09:00", "2024-01-01T12:00"], dtype="datetime64[ns]")
+    interactions = InteractionGraph.from_messages(times, np.array([0, 1]), 2, np.timedelta64(5, "m"))
+    assert interactions.edges().empty
+    assert interactions.communities().tolist() == [-1, -1]
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+from loguru import logger
+
+pytest.importorskip("pyarrow")
+from src.core.importer import CANONICAL_COLUMNS, import_csvs, load_messages, read_messages_csv  # noqa: E402
+
+PIPE_CSV = """Datetime|Sender|Message
+2024-02-01 10:00:00|Asha|hello
+2024-02-01 10:05|Ravi|price is 10|20 per month
+not a time|Meera|dropped
+2024-02-31 09:00:00|Meera|no such day
+2024-02-01 09:00:00|Ravi
+2024-02-01T11:00:00|Meera|latest
+"""
+
+
+@pytest.fixture
+def warnings():
+    """Collect the warnings logged during a test."""
+    messages = []
+    sink = logger.add(messages.append, level="WARNING", format="{message}")
+    yield messages
+    logger.remove(sink)
+
+
+def test_bad_rows_are_dropped_and_counted(tmp_path, warnings):
+    path = tmp_path / "messages.csv"
+    path.write_text(PIPE_CSV)
+    df = read_messages_csv(path)
+    assert list(df.columns) == CANONICAL_COLUMNS
+    assert df["Sender"].tolist() == ["Asha", "Ravi", "Meera"]
+    # A delimiter inside a message is put back; the row is not lost
+    assert df["Message"].tolist() == ["hello", "price is 10|20 per month", "latest"]
+    assert (
+        df["Datetime"].tolist()
+        == pd.to_datetime(["2024-02-01 10:00:00", "2024-02-01 10:05:00", "2024-02-01 11:00:00"]).tolist()
+    )
+    assert [message.strip() for message in warnings] == [f"{path}: repaired 1 and dropped 3 malformed rows"]
+
+
+def test_layouts_without_sender(tmp_path):
+    path = tmp_path / "old.csv"
+    path.write_text("message,datetime\nhi,2024-01-01 08:00:00\nbad,yesterday\n")
+    df = read_messages_csv(path)
+    assert df["Message"].tolist() == ["hi"]
+    assert df["Sender"].isna().all()
+
+
+def test_missing_columns_are_rejected(tmp_path):
+    path = tmp_path / "broken.csv"
+    path.write_text("Time|Sender|Message\n2024-01-01 08:00:00|Asha|hi\n")
+    with pytest.raises(ValueError, match="Datetime"):
+        read_messages_csv(path)
+
+
+def test_import_and_load_round_trip(tmp_path):
+    path = tmp_path / "messages.csv"
+    path.write_text(PIPE_CSV)
+    (written,) = import_csvs([path], tmp_path / "parquet")
+    assert written == tmp_path / "parquet" / "messages.parquet"
+    assert not list(written.parent.glob("*.partial"))
+    pd.testing.assert_frame_equal(load_messages(written), load_messages(path))
+    assert len(load_messages(written)) == 3
@@ -0,0 +1,41 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip("starlette")
+
+from src.web.jobs import ResultStore  # noqa: E402
+
+
+def test_job_id_depends_on_content_and_parameters():
+    job_id = ResultStore.job_id(b"export", window_days=60, exclude_contacts=False)
+    assert job_id == ResultStore.job_id(b"export", exclude_contacts=False, window_days=60)
+    assert job_id != ResultStore.job_id(b"export", window_days=30, exclude_contacts=False)
+    assert job_id != ResultStore.job_id(b"other", window_days=60, exclude_contacts=False)
+
+
+def test_results_are_shared_through_the_directory(tmp_path):
+    job_id = ResultStore.job_id(b"export")
+    ResultStore(tmp_path).save(job_id, "User|Days\nAsha|90\n", "<p>done</p>")
+    # Another worker's store over the same directory
+    other = ResultStore(tmp_path)
+    assert other.load_page(job_id) == "<p>done</p>"
+    assert other.csv_path(job_id).read_text() == "User|Days\nAsha|90\n"
+    assert other.load_page(ResultStore.job_id(b"unknown")) is None
+    assert other.csv_path("../../etc/passwd") is None
+    assert not list(tmp_path.glob("*.partial"))
+
+
+def test_prune_deletes_expired_and_excess_jobs(tmp_path):
+    store = ResultStore(tmp_path, max_age_seconds=3600, max_jobs=2)
+    job_ids = [ResultStore.job_id(str(number).encode()) for number in range(4)]
+    now = time.time()
+    for age, job_id in zip((7200, 30, 20, 10), job_ids, strict=True):
+        for suffix in (".csv", ".html"):
+            path = store.path(job_id, suffix)
+            path.write_text("")
+            os.utime(path, (now - age, now - age))
+    # The first job expired, and the second is the oldest beyond max_jobs
+    assert store.prune() == 2
+    assert [store.csv_path(job_id) is not None for job_id in job_ids] == [False, False, True, True]
@@ -0,0 +1,34 @@
+import pytest
+
+from src.core.media import LRM, MEDIA_TYPES, media_code
+
+
+@pytest.mark.parametrize(
+    "message, media",
+    [
+        (f"{LRM}image omitted", "image"),
+        (f"{LRM}video omitted", "video"),
+        (f"{LRM}video note omitted", "video"),
+        (f"{LRM}audio omitted", "audio"),
+        (f"{LRM}sticker omitted", "sticker"),
+        (f"{LRM}GIF omitted", "gif"),
+        (f"{LRM}document omitted", "document"),
+        (f"{LRM}report.pdf • 3 pages document omitted", "document"),
+        (f"{LRM}Contact card omitted", "contact"),
+        ("<Media omitted>", "media"),
+        ("Location: https://maps.google.com/?q=12.97,77.59", "location"),
+        (f"{LRM}<attached: 00000012-PHOTO-2023-05-01-10-00-00.jpg>", "image"),
+        (f"{LRM}<attached: 00000013-AUDIO-2023-05-01-10-00-00.opus>", "audio"),
+        ("IMG-20230501-WA0001.jpg (file attached)", "image"),
+        ("VID-20230501-WA0002.mp4 (file attached)", "video"),
+        ("PTT-20230501-WA0003.opus (file attached)", "audio"),
+        ("notes.pdf (file attached)", "document"),
+    ],
+)
+def test_placeholders(message, media):
+    assert media_code(message) == MEDIA_TYPES.index(media)
+
+
+@pytest.mark.parametrize("message", ["see you at 5", "the video was omitted (sorry)", "<3"])
+def test_text_messages(message):
+    assert media_code(message) == -1
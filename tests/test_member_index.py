@@ -0,0 +1,27 @@
+import pandas as pd
+
+from src.core.analysis import WhatsAppGroupAnalysis, is_valid_user
+from src.core.member_index import MemberIndex
+
+
+def test_is_valid_user_rejects_parsing_artifacts():
+    assert is_valid_user("Asha Rao")
+    assert not is_valid_user("System")
+    assert not is_valid_user("A")
+    assert not is_valid_user("You changed this group's icon")
+    assert not is_valid_user("this is a whole sentence parsed as a sender")
+
+
+def test_ingest_skips_system_senders():
+    df = pd.DataFrame(
+        {
+            "Datetime": pd.to_datetime(["2024-01-01 09:00", "2024-01-02 09:00", "2024-01-03 09:00"]),
+            "Sender": ["Asha Rao", "System", "Ravi"],
+            "Message": ["hello", "Ravi joined using this group's invite link", "hi"],
+        }
+    )
+    index = MemberIndex()
+    index.ingest("group", WhatsAppGroupAnalysis(df))
+    assert index.resolve("System") is None
+    assert set(index.names.values()) == {"Asha Rao", "Ravi"}
+    assert index.activity[index.resolve("Asha Rao")]["group"][2] == 1
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from src.core.membership import MembershipTimeline
+
+T = np.datetime64
+
+
+def timeline() -> MembershipTimeline:
+    """Member 0 joins, leaves and rejoins, 1 leaves without joining, 2 only posts, 3 joins."""
+    events = pd.DataFrame(
+        {
+            "datetime": pd.to_datetime(["2024-01-05", "2024-01-10", "2024-01-20", "2024-01-15", "2024-01-25"]),
+            "user": [0, 0, 0, 1, 3],
+            "event_type": ["join", "leave", "join", "leave", "join"],
+        }
+    ).sort_values("datetime", kind="stable")
+    return MembershipTimeline.from_events(events, np.array([0, 1, 2, -1]), T("2024-01-01"))
+
+
+def test_intervals():
+    members = timeline()
+    assert members.intervals(0) == [(T("2024-01-05"), T("2024-01-10")), (T("2024-01-20"), None)]
+    # Leaving without a join event means the member was in the group from the start
+    assert members.intervals(1) == [(T("2024-01-01"), T("2024-01-15"))]
+    assert members.intervals(2) == [(T("2024-01-01"), None)]
+
+
+def test_as_of_queries_match_intervals():
+    members = timeline()
+    assert members.members_as_of("2024-01-07").tolist() == [0, 1, 2]
+    # Intervals are half-open: a member is gone at the time they leave
+    assert members.members_as_of("2024-01-10").tolist() == [1, 2]
+    assert members.members_as_of("2024-01-30").tolist() == [0, 2, 3]
+    for day in pd.date_range("2024-01-01", "2024-01-31"):
+        as_of = set(members.members_as_of(day).tolist())
+        assert as_of == {member for member in range(4) if members.is_member(member, day)}
+
+
+def test_daily_counts_match_as_of_queries():
+    members = timeline()
+    counts = members.daily_counts(end="2024-01-31")
+    assert counts.index[0] == pd.Timestamp("2024-01-01")
+    for day, count in counts.items():
+        end_of_day = day + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+        assert count == len(members.members_as_of(end_of_day))
@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+
+from src.web.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+def registry(directory=None) -> MetricsRegistry:
+    """Build a registry with one metric of each kind."""
+    metrics = MetricsRegistry(directory)
+    metrics.register(Counter("requests_total", "Requests", ("route",)))
+    metrics.register(Gauge("in_progress", "Requests in flight"))
+    metrics.register(Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0)))
+    return metrics
+
+
+def record(metrics: MetricsRegistry, requests: int, in_progress: int, latency: float) -> None:
+    """Record some activity in a registry."""
+    metrics.metrics["requests_total"].inc(requests, route="/")
+    metrics.metrics["in_progress"].set(in_progress)
+    metrics.metrics["latency_seconds"].observe(latency)
+
+
+def test_render_merges_worker_snapshots(tmp_path):
+    metrics = registry(tmp_path)
+    record(metrics, requests=1, in_progress=1, latency=0.05)
+    # Another running worker, and one that has exited
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    for pid, (requests, in_progress, latency) in {os.getppid(): (2, 3, 0.5), exited.pid: (4, 5, 5.0)}.items():
+        other = registry()
+        record(other, requests, in_progress, latency)
+        snapshot = {name: metric.snapshot() for name, metric in other.metrics.items()}
+        (tmp_path / f"{pid}.json").write_text(json.dumps(snapshot))
+
+    lines = metrics.render().splitlines()
+    # Counters and histograms add up over every worker, gauges over the running ones
+    assert 'requests_total{route="/"} 7' in lines
+    assert "in_progress 4" in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert "latency_seconds_count 3" in lines
+    assert (tmp_path / f"{os.getpid()}.json").exists()
+
+
+def test_render_without_directory_reports_this_process():
+    metrics = registry()
+    record(metrics, requests=2, in_progress=1, latency=0.5)
+    lines = metrics.render().splitlines()
+    assert 'requests_total{route="/"} 2' in lines
+    assert "latency_seconds_count 1" in lines
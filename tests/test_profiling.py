@@ -0,0 +1,55 @@
+import json
+
+import pandas as pd
+
+from src.core.profiling import Profiler
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler()
+
+    @profiler.profiled()
+    def stage(df: pd.DataFrame) -> pd.DataFrame:
+        return df
+
+    stage(pd.DataFrame({"a": [1, 2]}))
+    with profiler.span("block") as span:
+        assert span is None
+    assert profiler.spans == []
+
+
+def test_spans_record_rows_and_nesting(tmp_path):
+    profiler = Profiler()
+    profiler.enable(track_memory=True)
+
+    @profiler.profiled("filter")
+    def keep_even(df: pd.DataFrame) -> pd.DataFrame:
+        return df[df["a"] % 2 == 0]
+
+    with profiler.span("pipeline", rows_in=10) as outer:
+        result = keep_even(pd.DataFrame({"a": range(10)}))
+        outer.rows_out = len(result)
+    keep_even(pd.DataFrame({"a": range(4)}))
+    profiler.disable()
+
+    # Inner spans finish first
+    assert [span.name for span in profiler.spans] == ["filter", "pipeline", "filter"]
+    assert (profiler.spans[0].rows_in, profiler.spans[0].rows_out) == (10, 5)
+    report = profiler.report().set_index("Stage")
+    assert report.loc["filter", "Calls"] == 2
+    assert report.loc["pipeline", "Rows_Out"] == 5
+
+    profiler.dump(tmp_path / "trace.json")
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    assert [event["name"] for event in events] == ["filter", "pipeline", "filter"]
+    assert all(event["ph"] == "X" for event in events)
+
+
+def test_listeners_see_spans_while_disabled():
+    profiler = Profiler()
+    seen = []
+    profiler.listeners.append(seen.append)
+    with profiler.span("stage"):
+        pass
+    assert [span.name for span in seen] == ["stage"]
+    assert profiler.spans == []
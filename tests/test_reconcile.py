@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from src.core.reconcile import REPORT_COLUMNS, reconcile
+
+SENDERS = ["Asha", "Ravi", "Meera"]
+
+
+def history(n=200):
+    """The full history of a chat: one message a minute, a few repeating the same text."""
+    return pd.DataFrame(
+        {
+            "Datetime": pd.Timestamp("2024-05-01 09:00") + pd.to_timedelta(np.arange(n), "m"),
+            "Sender": [SENDERS[row % 3] for row in range(n)],
+            "Message": ["ok" if row % 10 == 0 else f"message {row}" for row in range(n)],
+        }
+    )
+
+
+def test_overlapping_snapshots_merge_to_the_full_history():
+    full = history()
+    # Three snapshots overlapping each other; the second saved with times one second late
+    first = full.iloc[:90]
+    second = full.iloc[60:150].assign(Datetime=lambda df: df["Datetime"] + pd.Timedelta(seconds=1))
+    third = full.iloc[120:]
+    merged, report = reconcile([("first", first), ("second", second), ("third", third)])
+
+    assert len(merged) == len(full)
+    assert merged["Message"].tolist() == full["Message"].tolist()
+    assert merged["Sender"].tolist() == full["Sender"].tolist()
+    assert merged["Snapshot"].value_counts().to_dict() == {"first": 90, "second": 60, "third": 50}
+
+    assert list(report.columns) == REPORT_COLUMNS
+    assert report["Snapshot"].tolist() == ["second", "third"]
+    assert report["Matched"].tolist() == [30, 30]
+    assert report["Unmatched"].tolist() == [0, 0]
+    assert report["Shift_Seconds"].tolist() == [1.0, -1.0]
+
+
+def test_reingested_snapshot_adds_nothing():
+    full = history(50)
+    merged, report = reconcile([("a", full), ("b", full)])
+    pd.testing.assert_frame_equal(merged.drop(columns="Snapshot"), full)
+    assert report["Matched"].tolist() == [50]
+
+
+def test_times_beyond_tolerance_do_not_match():
+    full = history(20)
+    late = full.assign(Datetime=full["Datetime"] + pd.Timedelta(seconds=5))
+    merged, report = reconcile([("a", full), ("b", late)], tolerance_seconds=2)
+    assert len(merged) == 40
+    assert report.empty
+
+
+def test_scrubbed_snapshot_without_senders_is_completed():
+    full = history(30)
+    full.loc[5, "Message"] = "call me on +91 98765 43210"
+    # An older snapshot saved without senders, phone numbers scrubbed and only first lines kept
+    older = full[["Datetime", "Message"]].copy()
+    older.loc[5, "Message"] = "call me on [PHONE REMOVED]"
+    full.loc[7, "Message"] = "first line\nsecond line"
+    older.loc[7, "Message"] = "first line"
+    merged, report = reconcile([("older", older), ("newer", full)])
+    assert len(merged) == 30
+    assert (merged["Snapshot"] == "older").all()
+    # Senders of the older snapshot's messages are filled in from the newer one
+    assert merged["Sender"].tolist() == full["Sender"].tolist()
+    assert report["Matched"].tolist() == [30]
+
+
+def test_gap_splits_overlap_ranges():
+    full = history(100)
+    # The second snapshot misses nothing, but the first lost a long stretch in the middle
+    first = pd.concat([full.iloc[:30], full.iloc[70:]])
+    merged, report = reconcile([("first", first), ("second", full)])
+    assert len(merged) == 100
+    assert report["Matched"].tolist() == [30, 30]
+    assert report["Start"].tolist() == [full["Datetime"].iloc[0], full["Datetime"].iloc[70]]
@@ -0,0 +1,102 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.core.removal import (
+    CANDIDATE_COLUMNS,
+    RemovalLog,
+    allowed_keys,
+    candidate_id,
+    export_chunks,
+    read_allow_list,
+    removal_candidates,
+)
+
+NOW = pd.Timestamp("2024-06-01 12:00")
+
+
+def report():
+    """Inactive members of a group, one of them under two spellings."""
+    return pd.DataFrame(
+        {
+            "Group": "Runners",
+            "User": ["Asha", "~ Ravi", "Ravi", "+91 98765 43210", "Meera"],
+            "Joining_Date": pd.Timestamp("2024-01-01"),
+            "Total_Messages_Sent": [3, 0, 0, 12, 1],
+            "Most_Recent_Message_Date": pd.to_datetime(["2024-03-01", None, None, "2024-02-01", "2024-03-01"]),
+            "Days_Since_Last_Message": [92.0, np.nan, np.nan, 121.0, 92.0],
+        }
+    )
+
+
+def test_candidates_are_ranked_and_flagged(tmp_path):
+    log = RemovalLog(tmp_path / "removal.jsonl")
+    candidates = removal_candidates(report(), log, now=NOW)
+    assert list(candidates.columns) == CANDIDATE_COLUMNS
+    # Never-posted first, then longest silent, then fewest messages; spellings share an id
+    assert candidates["User"].tolist() == ["~ Ravi", "+91 98765 43210", "Meera", "Asha"]
+    assert candidates["Rank"].tolist() == [1, 2, 3, 4]
+    assert candidate_id("Runners", "~ Ravi") == candidate_id("Runners", "Ravi")
+    assert len((tmp_path / "removal.jsonl").read_text().splitlines()) == 4
+
+    # A second run flags nobody again
+    removal_candidates(report(), log, now=NOW + pd.Timedelta(days=1))
+    assert len((tmp_path / "removal.jsonl").read_text().splitlines()) == 4
+
+
+def test_resume_skips_torn_line_and_actioned_members(tmp_path):
+    path = tmp_path / "removal.jsonl"
+    log = RemovalLog(path)
+    removal_candidates(report(), log, now=NOW)
+    log.mark([candidate_id("Runners", "Ravi")], "removed", when=NOW)
+    log.mark([candidate_id("Runners", "Meera")], "kept", when=NOW)
+    # A crash tore the last line of a batch
+    with open(path, "a") as file:
+        file.write(json.dumps({"id": candidate_id("Runners", "Asha"), "status": "removed"})[:20])
+
+    resumed = RemovalLog(path)
+    assert resumed.actioned() == {candidate_id("Runners", "Ravi"), candidate_id("Runners", "Meera")}
+    candidates = removal_candidates(report(), resumed, now=NOW)
+    assert candidates["User"].tolist() == ["+91 98765 43210", "Asha"]
+    # Flagging times survive the restart
+    assert (candidates["First_Flagged"] == NOW).all()
+
+    # Records appended after the torn line start on a line of their own
+    resumed.mark([candidate_id("Runners", "Asha")], "kept", when=NOW)
+    assert RemovalLog(path).status[candidate_id("Runners", "Asha")] == "kept"
+
+
+def test_grace_days(tmp_path):
+    log = RemovalLog(tmp_path / "removal.jsonl")
+    assert removal_candidates(report(), log, grace_days=7, now=NOW).empty
+    assert removal_candidates(report(), log, grace_days=7, now=NOW + pd.Timedelta(days=6)).empty
+    assert len(removal_candidates(report(), log, grace_days=7, now=NOW + pd.Timedelta(days=7))) == 4
+
+
+def test_allow_list_by_phone_number(tmp_path):
+    path = tmp_path / "allow.txt"
+    path.write_text("# Admins\n+919876543210\nMeera  # organizer\n\n")
+    assert read_allow_list(path) == ["+919876543210", "Meera"]
+    log = RemovalLog(tmp_path / "removal.jsonl")
+    candidates = removal_candidates(report(), log, allowed=allowed_keys(read_allow_list(path)), now=NOW)
+    assert candidates["User"].tolist() == ["~ Ravi", "Asha"]
+
+
+def test_unknown_status_is_rejected(tmp_path):
+    log = RemovalLog(tmp_path / "removal.jsonl")
+    with pytest.raises(ValueError):
+        log.mark(["abc"], "flagged")
+    with pytest.raises(ValueError):
+        log.append([{"id": "abc", "status": "banned", "time": NOW.isoformat()}])
+
+
+def test_export_chunks_replaces_stale_chunks(tmp_path):
+    candidates = removal_candidates(report(), RemovalLog(tmp_path / "removal.jsonl"), now=NOW)
+    first = export_chunks(candidates, tmp_path / "chunks", chunk_size=1)
+    assert [path.name for path in first] == [f"removal-000{number}.csv" for number in range(1, 5)]
+    second = export_chunks(candidates.head(3), tmp_path / "chunks", chunk_size=2)
+    assert sorted((tmp_path / "chunks").iterdir()) == second
+    chunks = [pd.read_csv(path, sep="|") for path in second]
+    assert pd.concat(chunks)["User"].tolist() == candidates["User"].head(3).tolist()
@@ -0,0 +1,47 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_export
+from src.core.store import MessageStore
+from src.core.utils import chat_to_df
+
+# The community stats script is run from its own directory and imports its neighbours directly
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "whatsapp-moderation"))
+from private_community_stats import ActivityStats, get_top_senders  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def stored(tmp_path_factory):
+    """Store a synthetic export, and keep its parsed messages to compare with."""
+    directory = tmp_path_factory.mktemp("rollup")
+    export = directory / "group.txt"
+    generate_export(export, n_messages=4000, n_members=120, days=150, seed=21)
+    messages = chat_to_df(export)[["Datetime", "Sender", "Message"]]
+    store = MessageStore(directory / "store")
+    store.write(messages, group="group")
+    return store, messages
+
+
+@pytest.mark.parametrize("freq", ["W", "M"])
+def test_top_senders_match_messages(stored, freq):
+    store, messages = stored
+    expected = get_top_senders(messages.copy(), freq, k=3).reset_index(drop=True)
+    pd.testing.assert_frame_equal(store.top_senders(freq, k=3).reset_index(drop=True), expected, check_dtype=False)
+
+
+def test_sender_stats_match_activity_stats(stored):
+    store, messages = stored
+    expected = ActivityStats(messages.copy()).compute_sender_stats()
+    actual = store.sender_stats()
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_freq=False, check_names=False)
+
+
+def test_daily_sizes_match_daily_messages(stored):
+    store, messages = stored
+    sizes = store.daily_sizes()
+    daily = store.daily_messages()
+    assert sizes["Messages"].sum() == len(messages)
+    assert sizes["wc"].tolist() == daily["wc"].tolist()
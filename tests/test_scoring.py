@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.core import scoring
+from src.core.analysis import WhatsAppGroupAnalysis
+
+
+def test_decay_models():
+    ages = np.array([0.0, 30.0, 60.0, np.inf])
+    np.testing.assert_allclose(scoring.decay(ages, "exponential", 30), [1, np.exp(-1), np.exp(-2), 0])
+    np.testing.assert_allclose(scoring.decay(ages, "half-life", 30), [1, 0.5, 0.25, 0])
+    np.testing.assert_allclose(scoring.decay(ages, "windowed", 60), [1, 0.5, 0, 0])
+    with pytest.raises(ValueError):
+        scoring.decay(ages, "linear", 30)
+    with pytest.raises(ValueError):
+        scoring.decay(ages, "exponential", 0)
+
+
+def test_activity_scores():
+    codes = np.array([0, 0, 1, -1, 0])
+    times = pd.to_datetime(["2024-01-01", "2024-01-31", "2024-01-31", "2024-01-31", "2024-03-01"]).to_numpy()
+    as_of = np.datetime64("2024-03-01")
+    scores, counts, days = scoring.activity_scores(codes, times, 3, as_of, "windowed", 60, reference_messages=1)
+    assert counts.tolist() == [3, 1, 0]
+    np.testing.assert_allclose(days, [0, 30, np.inf])
+    # Member 0: ages 60 (weight 0), 30 (0.5) and 0 (1); member 1: age 30
+    np.testing.assert_allclose(scores, [1.5, 0.5, 0])
+    scores, _, _ = scoring.activity_scores(codes, times, 3, as_of, "half-life", 30, reference_messages=1)
+    np.testing.assert_allclose(scores, [3, 0.5, 0])
+
+
+def test_rank_partial_matches_full_sort():
+    scores = np.random.default_rng(0).random(1000)
+    full = scoring.rank(scores)
+    np.testing.assert_array_equal(scoring.rank(scores, k=10), full[:10])
+    np.testing.assert_array_equal(scoring.rank(scores, k=10, largest=True), full[::-1][:10])
+    assert len(scoring.rank(scores, k=0)) == 0
+
+
+def test_calculate_activity_score_windowed_scores_unknown_users_zero():
+    df = pd.DataFrame(
+        {
+            "Datetime": pd.to_datetime(["2024-01-01", "2024-02-01", "2024-03-01"]),
+            "Sender": ["Asha", "Asha", "Ravi"],
+            "Message": ["hi", "hello", "hey"],
+        }
+    )
+    analysis = WhatsAppGroupAnalysis(df)
+    report = pd.DataFrame(
+        {
+            "User": ["Asha", "Ravi", "Someone else"],
+            "Total_Messages_Sent": [2, 1, 0],
+            "Days_Since_Last_Message": [29, 0, None],
+        }
+    )
+    scored = analysis.calculate_activity_score(report, decay_days=60, reference_messages=1, model="windowed")
+    scores = scored.set_index("User")["Activity_Score"]
+    assert scores["Someone else"] == 0
+    # Asha: ages 60 (weight 0) and 29; Ravi: age 0
+    assert scores["Asha"] == pytest.approx(1 - 29 / 60)
+    assert scores["Ravi"] == pytest.approx(1)
+    assert scored["Activity_Score"].is_monotonic_increasing
+    exponential = analysis.calculate_activity_score(report, decay_days=60, reference_messages=1)
+    assert exponential.set_index("User").loc["Ravi", "Activity_Score"] == pytest.approx(1)
@@ -0,0 +1,75 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from src.core.search import RESULT_COLUMNS, SearchIndex
+
+SENDERS = ["Asha", "~ Ravi", "+91 98765 43210"]
+
+
+@pytest.fixture
+def index(tmp_path):
+    """Index 60 messages of two groups over ten days, several sharing a minute."""
+    times = pd.Timestamp("2024-03-01 08:00") + pd.to_timedelta([(row // 6) * 1440 + row % 3 for row in range(60)], "m")
+    messages = pd.DataFrame(
+        {
+            "Group": ["Runners" if row % 2 else "Cyclists" for row in range(60)],
+            "Datetime": times,
+            "Sender": [SENDERS[row % 3] for row in range(60)],
+            "Message": [f"Meetup number {row} at the park" if row % 4 else f"Ride {row}" for row in range(60)],
+        }
+    )
+    index = SearchIndex(tmp_path / "search.db")
+    assert index.add(messages) == 60
+    yield index
+    index.close()
+
+
+def test_readding_messages_is_a_no_op(index):
+    assert index.add(pd.DataFrame({"Datetime": [], "Sender": [], "Message": []}), group="Runners") == 0
+    assert len(index) == 60
+    assert list(index.groups()) == ["Cyclists", "Runners"]
+
+
+@pytest.mark.parametrize("order", ["rank", "newest", "oldest"])
+def test_pages_cover_every_match_once(index, order):
+    total = index.count("meetup park")
+    assert total == 45
+    everything = index.search("meetup park", order=order, limit=100)
+    pages = [index.search("meetup park", order=order, limit=7, page=page) for page in range(1, 9)]
+    assert [len(page) for page in pages] == [7] * 6 + [3, 0]
+    paged = pd.concat(pages, ignore_index=True)
+    assert list(paged.columns) == RESULT_COLUMNS
+    pd.testing.assert_frame_equal(paged, everything)
+    assert not paged.duplicated().any()
+
+
+def test_time_orders(index):
+    newest = index.search("meetup", order="newest", limit=100)["Datetime"]
+    oldest = index.search("meetup", order="oldest", limit=100)["Datetime"]
+    assert newest.is_monotonic_decreasing
+    assert oldest.is_monotonic_increasing
+
+
+def test_filters_match_count(index):
+    filters = {"groups": ["Runners"], "sender": "Ravi", "since": date(2024, 3, 3), "until": date(2024, 3, 7)}
+    results = index.search("meetup", limit=100, **filters)
+    assert len(results) == index.count("meetup", **filters) > 0
+    assert set(results["Group"]) == {"Runners"}
+    assert set(results["Sender"]) == {"~ Ravi"}
+    assert results["Datetime"].min() >= pd.Timestamp("2024-03-03")
+    # Until is inclusive: the last day's messages are found
+    assert results["Datetime"].dt.date.max() == date(2024, 3, 7)
+
+
+def test_phone_number_sender_filter(index):
+    results = index.search("ride", sender="+919876543210", limit=100)
+    assert len(results) == index.count("ride", sender="+91 98765 43210") == 5
+
+
+def test_invalid_order_and_page(index):
+    with pytest.raises(ValueError):
+        index.search("meetup", order="alphabetical")
+    with pytest.raises(ValueError):
+        index.search("meetup", page=0)
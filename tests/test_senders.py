@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from src.core.senders import SenderDictionary, normalize_sender
+
+
+def test_normalize_sender_strips_marks_and_contact_prefix():
+    assert normalize_sender("\u200e~ Asha  Rao ") == "Asha Rao"
+    assert normalize_sender("+91 98765 43210") == "+91 98765 43210"
+
+
+def test_spellings_of_one_sender_share_an_id():
+    senders = SenderDictionary()
+    first = senders.intern("Asha Rao")
+    assert senders.intern("~ Asha Rao") == first
+    assert senders.intern("\u200eAsha Rao") == first
+    assert senders.intern("Ravi") == first + 1
+    assert senders.lookup("Asha Rao") == first
+    assert senders.lookup("Nobody") is None
+    # Seen once without being a saved contact
+    assert senders.unsaved_mask(np.array([first]))[0]
+
+
+def test_encode_shares_ids_across_frames():
+    senders = SenderDictionary()
+    first = senders.encode(pd.Series(["Asha", "Ravi", "Asha", None]))
+    second = senders.encode(pd.Series(["Ravi", "~ Asha", "Meera"], dtype="category"))
+    assert first.cat.codes.tolist() == [0, 1, 0, -1]
+    assert second.cat.codes.tolist() == [1, 0, 2]
+    assert list(second.cat.categories) == ["Asha", "Ravi", "Meera"]
+    assert senders.decode(np.array([2, 0])).tolist() == ["Meera", "Asha"]
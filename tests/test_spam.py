@@ -0,0 +1,87 @@
+import pandas as pd
+
+from src.core.spam import FLAG_COLUMNS, SpamDetector
+
+PROMO = "Join our crypto signals group for daily profits https://example.com/promo"
+
+
+def chat(rows, start="2024-01-01 09:00"):
+    """Build messages from (seconds after start, group, sender, message) rows."""
+    seconds, groups, senders, texts = zip(*rows, strict=True)
+    return pd.DataFrame(
+        {
+            "Group": list(groups),
+            "Datetime": pd.Timestamp(start) + pd.to_timedelta(list(seconds), unit="s"),
+            "Sender": list(senders),
+            "Message": list(texts),
+        }
+    )
+
+
+def flagged(flags, flag):
+    """List the (sender, count) of the rows of one kind of flag."""
+    rows = flags[flags["Flag"] == flag]
+    return list(zip(rows["Sender"], rows["Count"], strict=True))
+
+
+def test_flood_within_window():
+    detector = SpamDetector(window_seconds=60, flood_limit=4)
+    # Asha posts 4 messages within a minute, Ravi 4 messages a minute apart
+    rows = [(second, "A", "Asha", "ok") for second in (0, 10, 20, 30)]
+    rows += [(second, "A", "Ravi", "ok") for second in (0, 60, 120, 180)]
+    flags = detector.process(chat(rows))
+    assert list(flags.columns) == FLAG_COLUMNS
+    assert flagged(flags, "flood") == [("Asha", 4)]
+
+
+def test_repeats_of_near_duplicates():
+    detector = SpamDetector(repeat_limit=3)
+    rows = [
+        (0, "A", "Asha", PROMO),
+        (600, "A", "Asha", PROMO.upper() + "!!"),
+        (1200, "A", "Ravi", PROMO),
+        (1800, "A", "Asha", PROMO + " now"),
+        # Short replies repeat naturally and are never signed
+        (2400, "A", "Meera", "thanks"),
+        (2500, "A", "Meera", "thanks"),
+        (2600, "A", "Meera", "thanks"),
+    ]
+    flags = detector.process(chat(rows))
+    assert flagged(flags, "repeat") == [("Asha", 3)]
+    assert len(detector) == 4
+
+
+def test_cross_posts_between_groups():
+    detector = SpamDetector()
+    rows = [
+        (0, "A", "Asha", PROMO),
+        (60, "B", "Asha", PROMO),
+        (120, "C", "Ravi", PROMO),
+        (180, "C", "Meera", "Anyone going to the meetup on Saturday evening"),
+    ]
+    flags = detector.process(chat(rows))
+    assert flagged(flags, "cross_post") == [("Asha", 2), ("Ravi", 3)]
+
+
+def test_signatures_expire_after_horizon():
+    detector = SpamDetector(horizon_hours=1)
+    flags = detector.process(chat([(0, "A", "Asha", PROMO), (7200, "B", "Asha", PROMO)]))
+    assert flags.empty
+    assert len(detector) == 1
+
+
+def test_resumed_stream_matches_one_pass(tmp_path):
+    rows = [(row * 5, "AB"[row % 2], ["Asha", "Ravi"][row % 3 == 0], PROMO) for row in range(30)]
+    messages = chat(rows)
+    expected = SpamDetector(flood_limit=3).process(messages)
+    assert set(expected["Flag"]) == {"flood", "repeat", "cross_post"}
+
+    detector = SpamDetector(flood_limit=3)
+    first = detector.process(messages.iloc[:12])
+    detector.save(tmp_path / "spam.json")
+    resumed = SpamDetector.load(tmp_path / "spam.json")
+    # The second export overlaps the first; messages already checked are skipped
+    second = resumed.process(messages.iloc[5:])
+    actual = pd.concat([first, second], ignore_index=True)
+    pd.testing.assert_frame_equal(actual, expected)
+    assert resumed.process(messages).empty
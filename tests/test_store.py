@@ -0,0 +1,64 @@
+import pandas as pd
+from click.testing import CliRunner
+
+from benchmarks.synthetic import generate_export
+from src.cli.main import cli
+from src.core import store as store_module
+from src.core.store import MessageStore
+
+
+def export(start: str, periods: int) -> pd.DataFrame:
+    """Build an export with one message per day."""
+    times = pd.date_range(start, periods=periods, freq="D")
+    return pd.DataFrame(
+        {"Datetime": times, "Sender": [f"member {i % 5}" for i in range(periods)], "Message": times.strftime("%d %b")}
+    )
+
+
+def stored(store: MessageStore, group: str) -> pd.DataFrame:
+    """Read back every stored message of a group."""
+    frame = pd.concat([batch for _, batch in store.batches(groups=[group])], ignore_index=True)
+    return frame.sort_values("Datetime", ignore_index=True)
+
+
+def test_older_export_keeps_newer_messages(tmp_path):
+    store = MessageStore(tmp_path)
+    newer, older = export("2024-01-01", 90), export("2023-12-01", 45)
+    store.write(newer, "group")
+    store.write(older, "group")
+    expected = pd.concat([older, newer]).drop_duplicates("Datetime").sort_values("Datetime", ignore_index=True)
+    pd.testing.assert_frame_equal(stored(store, "group"), expected, check_dtype=False)
+
+
+def test_reimport_replaces_overlap(tmp_path):
+    store = MessageStore(tmp_path)
+    store.write(export("2024-01-01", 60), "group")
+    edited = export("2024-01-10", 10).assign(Message="edited")
+    store.write(edited, "group")
+    messages = stored(store, "group")
+    assert len(messages) == 60
+    in_span = messages["Datetime"].between(edited["Datetime"].min(), edited["Datetime"].max())
+    assert (messages.loc[in_span, "Message"] == "edited").all()
+    assert (messages.loc[~in_span, "Message"] != "edited").all()
+
+
+def test_analyze_store_matches_analyze_single(tmp_path, monkeypatch):
+    # Small row groups, so that partial aggregates of many row groups are merged
+    monkeypatch.setattr(store_module, "ROW_GROUP_SIZE", 100)
+    export = tmp_path / "group.txt"
+    generate_export(export, n_messages=5000, n_members=200, days=400, seed=9)
+    windows = ["-w", "30", "-w", "90", "-w", "180"]
+    runner = CliRunner()
+    for args in (
+        ["analyze-single", str(export), *windows, "-o", str(tmp_path / "single.csv")],
+        ["store-ingest", str(export), "--store", str(tmp_path / "store")],
+        ["analyze-store", str(tmp_path / "store"), *windows, "-o", str(tmp_path / "store.csv")],
+    ):
+        result = runner.invoke(cli, args, catch_exceptions=False)
+        assert result.exit_code == 0, result.output
+
+    single = pd.read_csv(tmp_path / "single.csv", sep="|")
+    stored = pd.read_csv(tmp_path / "store.csv", sep="|")
+    assert len(single) > 0
+    assert (stored.pop("Group") == "group").all()
+    pd.testing.assert_frame_equal(single, stored)
@@ -0,0 +1,42 @@
+import pandas as pd
+
+from benchmarks.synthetic import generate_export
+from src.core.store import MessageStore
+from src.core.utils import chat_to_df
+from src.core.watch import ExportWatcher
+
+
+def stored(store: MessageStore) -> pd.DataFrame:
+    """Read back every stored message, in a canonical order."""
+    frame = pd.concat([batch for _, batch in store.batches()], ignore_index=True)
+    return frame.sort_values(["Datetime", "Sender", "Message"], ignore_index=True)
+
+
+def test_incremental_ingest_matches_full_parse(tmp_path):
+    full = tmp_path / "full.txt"
+    generate_export(full, n_messages=2000, n_members=50, days=60, seed=3)
+    lines = full.read_bytes().splitlines(keepends=True)
+    export = tmp_path / "exports" / "group.txt"
+    export.parent.mkdir()
+
+    store = MessageStore(tmp_path / "store")
+    watcher = ExportWatcher(store)
+    # Grow the export in three appends, the last cut mid-line as if still being written
+    for stop in (len(lines) // 3, 2 * len(lines) // 3):
+        export.write_bytes(b"".join(lines[:stop]))
+        assert watcher.ingest(export)
+    export.write_bytes(b"".join(lines) + lines[0][:10])
+    watcher.ingest(export)
+
+    expected = chat_to_df(full)[["Datetime", "Sender", "Message"]]
+    expected = expected.sort_values(["Datetime", "Sender", "Message"], ignore_index=True)
+    pd.testing.assert_frame_equal(stored(store), expected, check_dtype=False)
+    assert watcher.manifest[str(export.resolve())]["end"] == len(b"".join(lines))
+
+
+def test_unchanged_export_is_skipped(tmp_path):
+    export = tmp_path / "group.txt"
+    generate_export(export, n_messages=200, n_members=10, days=10, seed=3)
+    watcher = ExportWatcher(MessageStore(tmp_path / "store"))
+    assert watcher.ingest(export)
+    assert not watcher.ingest(export)
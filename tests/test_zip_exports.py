@@ -0,0 +1,65 @@
+import io
+import zipfile
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_export
+from src.core.media import archive_media
+from src.core.utils import chat_to_df
+
+
+@pytest.fixture
+def export(tmp_path):
+    """Write a synthetic text export."""
+    path = tmp_path / "group.txt"
+    generate_export(path, n_messages=500, n_members=30, days=30, seed=4)
+    return path
+
+
+def zip_export(path, export, members):
+    """Zip an export as WhatsApp does, with _chat.txt and media next to it."""
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.write(export, "_chat.txt")
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return path
+
+
+def test_zip_matches_text_export(export, tmp_path):
+    # A larger text file next to _chat.txt must not be taken for the chat log
+    archive = zip_export(
+        tmp_path / "group.zip",
+        export,
+        {"notes.txt": "x" * (export.stat().st_size * 2), "00000012-PHOTO-2024-01-01.jpg": b"\xff" * 2048},
+    )
+    expected = chat_to_df(export)
+    pd.testing.assert_frame_equal(chat_to_df(archive), expected)
+    # Uploads are parsed from memory, zipped or not
+    pd.testing.assert_frame_equal(chat_to_df(io.BytesIO(archive.read_bytes())), expected)
+    pd.testing.assert_frame_equal(chat_to_df(io.BytesIO(export.read_bytes())), expected)
+    assert not list(tmp_path.glob("_chat.txt"))
+
+
+def test_largest_text_file_without_chat_member(export, tmp_path):
+    archive = tmp_path / "renamed.zip"
+    with zipfile.ZipFile(archive, "w") as zipped:
+        zipped.write(export, "WhatsApp Chat with group.txt")
+        zipped.writestr("readme.txt", "small")
+    pd.testing.assert_frame_equal(chat_to_df(archive), chat_to_df(export))
+
+
+def test_archive_media_reads_the_index_only(export, tmp_path):
+    archive = zip_export(tmp_path / "group.zip", export, {"PTT-20240101-WA0001.opus": b"\x00" * 4096})
+    media = archive_media(archive)
+    assert media["File"].tolist() == ["PTT-20240101-WA0001.opus"]
+    assert media["Media"].tolist() == ["audio"]
+    assert media["Bytes"].tolist() == [4096]
+
+
+def test_zip_without_chat_log_is_rejected(tmp_path):
+    archive = tmp_path / "media.zip"
+    with zipfile.ZipFile(archive, "w") as zipped:
+        zipped.writestr("photo.jpg", b"\xff")
+    with pytest.raises(ValueError):
+        chat_to_df(archive)
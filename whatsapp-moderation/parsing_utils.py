@@ -1,5 +1,6 @@
 import datetime
 import re
+import sys
 from pathlib import Path
 from typing import List, Tuple
 
@@ -7,6 +8,11 @@ import pandas as pd
 from loguru import logger
 from pydantic import BaseModel
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.core.pii import PIIScrubber  # noqa: E402
+
+PII_SCRUBBER = PIIScrubber(replacements={"phone": "[PHONE REMOVED]", "email": "[EMAIL REMOVED]"})
+
 
 class WhatsAppMessageExtractor(BaseModel):
     """
@@ -55,15 +61,7 @@ class WhatsAppMessageExtractor(BaseModel):
         Returns:
             Text with PII removed
         """
-        # Remove phone numbers
-        phone_pattern = re.compile(r"@\+?(\d[\d-]{7,}\d)")
-        no_phones = phone_pattern.sub("[PHONE REMOVED]", text)
-
-        # Remove email addresses
-        email_pattern = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b")
-        no_emails = email_pattern.sub("[EMAIL REMOVED]", no_phones)
-
-        return no_emails
+        return PII_SCRUBBER.scrub_text(text)
 
     def remove_actions(self, df: pd.DataFrame, remove_sender: bool = False) -> List[Tuple[str, datetime.datetime, str]]:
         """
@@ -9,6 +9,12 @@ from parsing_utils import WhatsAppMessageExtractor
 from rich import print
 from tqdm import tqdm
 
+try:
+    from src.core import engine as query_engine
+    from src.core.store import MessageStore
+except ImportError:  # Message stores and the duckdb engine need the src package on the path
+    MessageStore = query_engine = None
+
 
 def get_top_senders(df: pd.DataFrame, freq: str, k: int = 5) -> pd.DataFrame:
     """Get the top K senders per week or month.
@@ -27,6 +33,9 @@ def get_top_senders(df: pd.DataFrame, freq: str, k: int = 5) -> pd.DataFrame:
     if freq not in ["W", "M"]:
         raise ValueError("freq must be 'W' or 'M'")
 
+    if df.empty:
+        return pd.DataFrame(columns=["Sender", "Datetime", "Message"])
+
     # If 'Datetime' is not the index, set it as the index
     logger.info(f"Index name: {df.index.name}, type: {type(df.index)}")
     if df.index.name != "Datetime":
@@ -35,15 +44,13 @@ def get_top_senders(df: pd.DataFrame, freq: str, k: int = 5) -> pd.DataFrame:
         df.sort_index(inplace=True)  # Sort the DataFrame based on the index
         logger.info(f"Index name: {df.index.name}, type: {type(df.index)}")
 
-    resampled = df.groupby("Sender").resample(freq).count()
-    resampled.reset_index("Datetime", inplace=True)  # Reset only the 'Datetime' index
-    sorted_grouped = (
-        resampled["Message"]
-        .reset_index()
-        .sort_values(["Datetime", "Message"], ascending=[True, False])
-        .groupby("Datetime")
-    )
-    top_senders = sorted_grouped.head(k)
+    # The "M" alias is deprecated from pandas 2.2 on; the offset works on every version
+    rule = pd.offsets.MonthEnd() if freq == "M" else freq
+    counts = df.groupby("Sender").resample(rule)["Message"].count()
+    # Resampling fills the periods between a sender's first and last message with zero counts
+    counts = counts[counts > 0].reset_index()[["Sender", "Datetime", "Message"]]
+    counts = counts.sort_values(["Datetime", "Message", "Sender"], ascending=[True, False, True])
+    top_senders = counts.groupby("Datetime").head(k)
     return top_senders
 
 
@@ -132,29 +139,50 @@ class ActivityStats:
         return result_df
 
 
-def compute(readpath: Union[str, Path], k: int = 5) -> None:
+def compute(readpath: Union[str, Path], k: int = 5, engine: str = "pandas") -> None:
     """Compute community statistics from WhatsApp chat data.
 
     Args:
-        readpath: Path to the WhatsApp chat file
+        readpath: Path to the WhatsApp chat file, or to a message store directory (see src.core.store),
+            whose stats come from its daily rollups without reading any message
         k: Number of top senders to consider, defaults to 5
+        engine: "pandas" or "duckdb", which computes the top senders as one multi-threaded query
     """
     readpath = Path(readpath)
     assert readpath.exists(), f"File not found: {readpath}"
 
+    if readpath.is_dir():
+        if MessageStore is None:
+            raise ImportError("Reading a message store needs the src package on the path")
+        store = MessageStore(readpath)
+        for freq, period in (("W", "week"), ("M", "month")):
+            logger.info(f"Computing top senders per {period} from {readpath}")
+            print(f"Top {k} senders per {period}:\n{store.top_senders(freq, k=k)}")
+        logger.info("Computing sender statistics from the daily rollups")
+        print("Weekly sender stats:")
+        print(store.sender_stats())
+        return
+
     logger.info(f"Processing WhatsApp chat file: {readpath}")
     msg_extractor = WhatsAppMessageExtractor(file_path=readpath)
     messages = msg_extractor.extract_messages()
     df = pd.DataFrame(messages, columns=["Sender", "Datetime", "Message"])
 
+    if engine == "duckdb":
+        if query_engine is None:
+            raise ImportError("The duckdb engine needs the src package on the path")
+        top_senders = query_engine.top_senders
+    else:
+        top_senders = get_top_senders
+
     # Top K senders per week
     logger.info("Computing weekly top senders")
-    weekly_top_senders = get_top_senders(df, freq="W", k=k)
+    weekly_top_senders = top_senders(df, freq="W", k=k)
     print(f"Top {k} senders per week:\n{weekly_top_senders}")
 
     # Top K senders per month
     logger.info("Computing monthly top senders")
-    monthly_top_senders = get_top_senders(df, freq="M", k=k)
+    monthly_top_senders = top_senders(df, freq="M", k=k)
     print(f"Top {k} senders per month:\n{monthly_top_senders}")
 
     # Compute sender statistics
@@ -18,6 +18,27 @@ from loguru import logger
 from prompts import PROMPT_TEMPLATES
 from tqdm import tqdm
 
+try:
+    from src.core.profiling import span
+except ImportError:  # Running standalone from this directory, without the src package on the path
+    from contextlib import nullcontext
+
+    def span(name: str, rows_in: Union[int, None] = None) -> nullcontext:
+        """No-op stand-in for src.core.profiling.span."""
+        return nullcontext()
+
+
+try:
+    from src.core.store import MessageStore
+except ImportError:  # Message stores can only be read with the src package on the path
+    MessageStore = None
+
+try:
+    from src.core.importer import load_messages
+except ImportError:  # Without the src package only comma-delimited CSVs can be read
+    load_messages = None
+
+
 text_splitter = CharacterTextSplitter.from_tiktoken_encoder()
 
 
@@ -182,13 +203,22 @@ def generate_daily_df(csv_path: Union[str, Path]) -> pd.DataFrame:
     """Generate a DataFrame with daily message data.
 
     Args:
-        csv_path: Path to the CSV file containing message data
+        csv_path: Path to the CSV file containing message data (any delimiter and column order), a
+            Parquet file written by the CSV importer (see src.core.importer), or a message store
+            directory (see src.core.store), which is aggregated one row group at a time
 
     Returns:
         DataFrame with daily message data
     """
-    df = pd.read_csv(csv_path)
-    df["Datetime"] = pd.to_datetime(df["Datetime"])
+    if Path(csv_path).is_dir():
+        if MessageStore is None:
+            raise ImportError("Reading a message store needs the src package on the path")
+        return MessageStore(csv_path).daily_messages()
+    if load_messages is not None:
+        df = load_messages(csv_path)
+    else:
+        df = pd.read_csv(csv_path)
+        df["Datetime"] = pd.to_datetime(df["Datetime"])
     df["Date"] = df["Datetime"].dt.date
     daily_df = df.groupby("Date").agg({"Message": " \n ".join}).reset_index()
     daily_df["wc"] = daily_df["Message"].apply(lambda x: len(x.split()))
@@ -199,47 +229,56 @@ def generate_daily_summary(csv_path: Union[str, Path]) -> None:
     """Generate daily summaries from a CSV file containing message data.
 
     Args:
-        csv_path: Path to the CSV file containing message data
+        csv_path: Path to the CSV file containing message data, or to a message store directory
     """
     readpath = Path(csv_path).resolve()
     assert readpath.exists(), f"CSV file does not exist: {readpath}"
     write_dir = Path("../../content/ai/").resolve()
 
     logger.info(f"Processing CSV file: {readpath}")
-    daily_df = generate_daily_df(readpath)
+    if readpath.is_dir() and MessageStore is not None:
+        # A store sizes the work from its daily rollups before any message is read
+        sizes = MessageStore(readpath).daily_sizes()
+        logger.info(f"Summarising {len(sizes)} days: {sizes['wc'].sum()} words, {sizes['URLs'].sum()} links")
+    with span("summarisation.generate_daily_df"):
+        daily_df = generate_daily_df(readpath)
 
     # Generating the summary column
     logger.info("Generating summaries")
-    daily_df["Summary"] = daily_df["Message"].apply(summarize, args=(PROMPT_TEMPLATES["summary_template"],))
+    with span("summarisation.summaries", rows_in=len(daily_df)):
+        daily_df["Summary"] = daily_df["Message"].apply(summarize, args=(PROMPT_TEMPLATES["summary_template"],))
 
     # Generating the EndNote column
     logger.info("Extracting URLs and context")
-    daily_df["Endnote"] = (
-        daily_df["Message"]
-        .apply(extract_urls_context)
-        .apply(
-            lambda urls_context: "\n".join(
-                [summarize(message, PROMPT_TEMPLATES["link_context_template"]) for message in urls_context]
+    with span("summarisation.endnotes", rows_in=len(daily_df)):
+        daily_df["Endnote"] = (
+            daily_df["Message"]
+            .apply(extract_urls_context)
+            .apply(
+                lambda urls_context: "\n".join(
+                    [summarize(message, PROMPT_TEMPLATES["link_context_template"]) for message in urls_context]
+                )
             )
         )
-    )
 
     # Generating Title and Description Columns that can be passed to header method
     logger.info("Generating titles and descriptions")
     # We are avoiding the for loop with this intermediate column
-    daily_df["title_desc"] = daily_df["Summary"].apply(
-        summarize,
-        args=(
-            PROMPT_TEMPLATES["title_description_template"],
-            "map_reduce",
-        ),
-    )
+    with span("summarisation.titles", rows_in=len(daily_df)):
+        daily_df["title_desc"] = daily_df["Summary"].apply(
+            summarize,
+            args=(
+                PROMPT_TEMPLATES["title_description_template"],
+                "map_reduce",
+            ),
+        )
 
     # Generating page headers
     logger.info("Generating page headers")
     page_headers = []
-    for idx in tqdm(range(len(daily_df)), desc="Creating page headers"):
-        page_headers.append(make_page_header(daily_df.iloc[idx]))
+    with span("summarisation.page_headers", rows_in=len(daily_df)):
+        for idx in tqdm(range(len(daily_df)), desc="Creating page headers"):
+            page_headers.append(make_page_header(daily_df.iloc[idx]))
 
     # Dumping all the updates
     daily_df["page_headers"] = page_headers
@@ -249,11 +288,12 @@ def generate_daily_summary(csv_path: Union[str, Path]) -> None:
 
     # Using page headers to make pages
     logger.info("Writing pages to files")
-    for idx in tqdm(range(len(daily_df)), desc="Writing pages"):
-        page, file_name = make_page(daily_df.iloc[idx])
-        file_path = write_dir / file_name
-        with file_path.open("w") as f:
-            f.write(page)
+    with span("summarisation.write_pages", rows_in=len(daily_df)):
+        for idx in tqdm(range(len(daily_df)), desc="Writing pages"):
+            page, file_name = make_page(daily_df.iloc[idx])
+            file_path = write_dir / file_name
+            with file_path.open("w") as f:
+                f.write(page)
 
     logger.info(f"Completed processing. Files written to {write_dir}")
 
@@ -1,8 +1,76 @@
-from src.web.main import app
+import time
 
-if __name__ == "__main__":
-    import os
+_started = time.perf_counter()
+
+import os  # noqa: E402
+import tempfile  # noqa: E402
+from pathlib import Path  # noqa: E402
+
+import click  # noqa: E402
+from loguru import logger  # noqa: E402
+
+from src.web.main import DEFAULT_DRAIN_TIMEOUT, app  # noqa: E402
+from src.web.metrics import STARTUP_TIME  # noqa: E402
+
+startup_seconds = time.perf_counter() - _started
+STARTUP_TIME.set(startup_seconds)
+logger.info(f"Web app imported in {startup_seconds:.3f}s")
+
+# Every worker holds its own pandas and analysis state, so the CPU count is no guide: containers
+# report the host's CPUs while their memory limit fits only a few workers
+PRODUCTION_WORKERS = 2
 
+
+@click.command()
+@click.option("--host", default="0.0.0.0", show_default=True, help="Interface to bind")
+@click.option("--port", envvar="PORT", default=8000, show_default=True, help="Port to bind (env: PORT)")
+@click.option(
+    "--workers",
+    "-w",
+    envvar="WEB_CONCURRENCY",
+    type=int,
+    help=f"Worker processes (env: WEB_CONCURRENCY); defaults to {PRODUCTION_WORKERS} with --production, else 1",
+)
+@click.option(
+    "--production",
+    is_flag=True,
+    envvar="WHATSAPP_PRODUCTION",
+    help="Disable debug pages and run several worker processes",
+)
+@click.option(
+    "--graceful-timeout",
+    default=DEFAULT_DRAIN_TIMEOUT,
+    show_default=True,
+    help="Seconds to let in-flight analyses finish on shutdown",
+)
+def main(host: str, port: int, workers: int, production: bool, graceful_timeout: float):
+    """Serve the web app with uvicorn."""
     import uvicorn
-    port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port) 
\ No newline at end of file
+
+    if production:
+        # Worker processes re-import the app and pick these up from the environment
+        os.environ["WHATSAPP_ENV"] = "production"
+        app.debug = False
+    os.environ["WHATSAPP_DRAIN_TIMEOUT"] = str(graceful_timeout)
+    workers = workers or (PRODUCTION_WORKERS if production else 1)
+    if workers > 1:
+        # Workers merge their metrics through snapshots in a shared directory, so that a scrape of
+        # /metrics reports the whole server whichever worker answers it
+        metrics_dir = Path(os.environ.get("WHATSAPP_METRICS_DIR") or tempfile.mkdtemp(prefix="whatsapp-metrics-"))
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+        for stale in metrics_dir.glob("*.json"):
+            stale.unlink()
+        os.environ["WHATSAPP_METRICS_DIR"] = str(metrics_dir)
+    logger.info(f"Serving on {host}:{port} with {workers} worker(s), production={production}")
+    uvicorn.run(
+        "wsgi:app" if workers > 1 else app,
+        host=host,
+        port=port,
+        workers=workers,
+        timeout_graceful_shutdown=graceful_timeout,
+        access_log=not production,
+    )
+
+
+if __name__ == "__main__":
+    main()